@@ -0,0 +1,214 @@
+"""Peso ótimo de abate por molécula.
+
+Todas as moléculas ficam o mesmo número de dias no cocho, definido pelo peso
+final da referência (``pv_final``); os pesos das demais vêm desses dias. A
+decisão é, portanto, o dia de saída, expresso pelo peso final da referência
+(ou em dias, com ``pesos_por_dias``). Os candidatos formam mais um eixo de
+cenários e são avaliados de uma vez; a busca é depois refinada em torno do
+melhor ponto de cada molécula.
+
+Com GMD constante (o cálculo rápido) nenhum objetivo tem ótimo interior: o
+resultado cresce sem parar com os dias, e as medidas por dia ou por mês são
+dominadas pelo rendimento de carcaça já no primeiro dia. Com ``declinio`` (queda
+mensal do GMD) os candidatos são avaliados na simulação dia a dia
+(``diario.py``): o ganho de cada dia a mais cai até não pagar o custeio, e o
+``resultado_agio`` passa a ter um máximo. ``no_limite`` marca as moléculas
+cujo melhor ponto ficou num extremo da faixa, que não é um ótimo.
+
+Uso em lote (uma linha por lote × molécula na saída)::
+
+    python abate.py lotes.parquet abate.parquet --declinio 0.05 --processos 8
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import calculos
+import diario
+import paralelo
+
+# Objetivos que podem ser maximizados
+OBJETIVOS = {
+    "resultado_agio": "Resultado com Ágio (R$/Cab)",
+    "rentabilidade_mensal": "Rentabilidade Mensal",
+    "rentabilidade_mensal_agio": "Rentabilidade Mensal com Ágio",
+    "margem_diaria_agio": "Margem com Ágio por Dia de Cocho (R$/Cab/dia)",
+}
+
+
+def candidatos(entradas, variacao=0.3, pontos=41):
+    """Pesos finais da referência com o ganho de peso variando ±``variacao``.
+
+    Retorna um array com forma ``(*lotes, pontos)``.
+    """
+    pv_inicial = np.asarray(entradas["pv_inicial"], dtype=float)[..., np.newaxis]
+    pv_final = np.asarray(entradas["pv_final"], dtype=float)[..., np.newaxis]
+    return pv_inicial + (pv_final - pv_inicial) * np.linspace(1 - variacao, 1 + variacao, pontos)
+
+
+def pesos_por_dias(entradas, dias):
+    """Pesos finais da referência que correspondem a ``dias`` de cocho."""
+    pv_inicial = np.asarray(entradas["pv_inicial"], dtype=float)[..., np.newaxis]
+    gmd = np.asarray(entradas["gmd"], dtype=float)[..., np.newaxis]
+    return pv_inicial + gmd * np.asarray(dias, dtype=float)
+
+
+def avaliar(entradas, campos, custos=calculos.CUSTOS_PADRAO, fatores=None, declinio=0.0):
+    """``campos`` pelo cálculo rápido (GMD constante) ou, com ``declinio``, pela simulação dia a dia."""
+    if np.any(declinio):
+        resumo = diario.simular(**entradas, custos=custos, declinio=declinio, trajetorias=False, fatores=fatores)["resumo"]
+        return {campo: resumo[campo] for campo in campos}
+    return calculos.avaliar(dict(entradas, custos=custos, **(fatores or {})), campos)
+
+
+def curva(entradas, pesos, objetivo="resultado_agio", custos=calculos.CUSTOS_PADRAO, fatores=None, declinio=0.0):
+    """Objetivo, peso final e dias para cada candidato em ``pesos`` (último eixo).
+
+    Os arrays retornados têm forma ``(*lotes, candidatos, n_moleculas)``.
+    """
+    valores = {nome: np.asarray(valor, dtype=float)[..., np.newaxis] for nome, valor in entradas.items()}
+    valores["pv_final"] = pesos
+    return avaliar(valores, [objetivo, "peso_final", "dias"], np.asarray(custos, dtype=float)[..., np.newaxis, :],
+                    fatores, np.asarray(declinio, dtype=float)[..., np.newaxis])
+
+
+def _melhor(pesos, valores):
+    # Candidato de maior valor (NaN nunca é escolhido) e seus vizinhos na grade
+    indice = np.argmax(np.where(np.isnan(valores), -np.inf, valores), axis=-1)[..., np.newaxis]
+    ultimo = pesos.shape[-1] - 1
+    vizinhos = [np.take_along_axis(pesos, np.clip(indice + d, 0, ultimo), axis=-1)[..., 0] for d in (-1, 1)]
+    return np.take_along_axis(pesos, indice, axis=-1)[..., 0], vizinhos
+
+
+def otimizar(entradas, objetivo="resultado_agio", pesos=None, custos=calculos.CUSTOS_PADRAO,
+             refinamentos=2, com_curva=True, fatores=None, declinio=0.0):
+    """Peso final da referência que maximiza ``objetivo`` para cada molécula.
+
+    O padrão é o ``resultado_agio``, o único com máximo interior (com
+    ``declinio``); as medidas por dia ou por mês ficam no extremo da faixa.
+    ``pesos`` são os candidatos (padrão: ``candidatos(entradas)``). Depois da
+    varredura, cada refinamento repete a grade entre os vizinhos do melhor
+    ponto. Retorna arrays ``(*lotes, n_moleculas)``: ``pv_final`` (decisão),
+    ``peso_final`` e ``dias`` da molécula no ótimo, ``valor`` no ótimo,
+    ``valor_atual`` no ``pv_final`` informado, ``perda`` (quanto se deixa de
+    ganhar no peso atual) e ``no_limite`` (ótimo num extremo dos candidatos,
+    ou seja, o objetivo ainda melhora fora da faixa). Com ``com_curva``,
+    inclui a varredura em ``curva``. ``declinio`` (fração ao mês, por lote)
+    avalia os candidatos na simulação dia a dia.
+    """
+    if objetivo not in OBJETIVOS:
+        raise ValueError(f"Objetivo desconhecido: {objetivo}")
+    if pesos is None:
+        pesos = candidatos(entradas)
+    forma = np.broadcast_shapes(*(np.shape(valor) for valor in entradas.values()))
+    pesos = np.broadcast_to(np.asarray(pesos, dtype=float), forma + np.shape(pesos)[-1:])
+    varredura = curva(entradas, pesos, objetivo, custos, fatores, declinio)
+    n_moleculas = varredura[objetivo].shape[-1]
+
+    decisoes = []
+    for i in range(n_moleculas):
+        grade, valores = pesos, varredura[objetivo][..., i]
+        for _ in range(refinamentos):
+            _, (inferior, superior) = _melhor(grade, valores)
+            grade = inferior[..., np.newaxis] + (superior - inferior)[..., np.newaxis] * np.linspace(0, 1, pesos.shape[-1])
+            valores = curva(entradas, grade, objetivo, custos, fatores, declinio)[objetivo][..., i]
+        decisoes.append(_melhor(grade, valores)[0])
+
+    # Avalia cada molécula no seu ótimo (diagonal decisão × molécula)
+    decisao = np.stack(decisoes, axis=-1)
+    otimo = {campo: np.diagonal(valor, axis1=-2, axis2=-1)
+             for campo, valor in curva(entradas, decisao, objetivo, custos, fatores, declinio).items()}
+    atual = avaliar(dict(entradas), [objetivo], custos, fatores, declinio)[objetivo]
+
+    resultado = {
+        "pv_final": decisao,
+        "peso_final": otimo["peso_final"],
+        "dias": otimo["dias"],
+        "valor": otimo[objetivo],
+        "valor_atual": atual,
+        "perda": otimo[objetivo] - atual,
+        "no_limite": (decisao <= pesos.min(axis=-1)[..., np.newaxis]) | (decisao >= pesos.max(axis=-1)[..., np.newaxis]),
+    }
+    if com_curva:
+        resultado["curva"] = {"pv_final": pesos, "valores": varredura[objetivo],
+                              "peso_final": varredura["peso_final"], "dias": varredura["dias"]}
+    return resultado
+
+
+def _otimizar_lotes(pesos, objetivo, custos, refinamentos, fatores, declinio, **entradas):
+    # Parte da otimização em paralelo: alguns lotes
+    return otimizar(entradas, objetivo, pesos, custos, refinamentos, com_curva=False, fatores=fatores,
+                    declinio=declinio)
+
+
+def otimizar_tabela(tabela, objetivo="resultado_agio", variacao=0.3, pontos=41, refinamentos=2,
+                    custos=calculos.CUSTOS_PADRAO, moleculas=calculos.MOLECULAS, processos=1, fatores=None,
+                    declinio=0.0):
+    """Otimiza cada lote da tabela; uma linha por lote × molécula.
+
+    Com ``processos > 1`` os lotes são divididos entre processos (``paralelo.em_partes``).
+    """
+    # Só as tabelas precisam do pandas (via lotes); o app importa este módulo sem ele
+    import pandas as pd
+
+    import lotes
+
+    entradas = lotes.entradas_da_tabela(tabela)
+    n, n_moleculas = len(tabela), len(moleculas)
+    if processos > 1:
+        # Cada lote é otimizado sozinho, então dividir os lotes não muda o resultado
+        colunas = {nome: np.broadcast_to(np.asarray(valor, dtype=float), (n,)) for nome, valor in entradas.items()}
+        colunas["pesos"] = np.broadcast_to(candidatos(entradas, variacao, pontos), (n, pontos))
+        saidas = {campo: ((n_moleculas,), float) for campo in ("pv_final", "peso_final", "dias", "valor", "valor_atual", "perda")}
+        saidas["no_limite"] = ((n_moleculas,), bool)
+        otimo = paralelo.em_partes(_otimizar_lotes, n, colunas, saidas, processos=processos, fixos={
+            "objetivo": objetivo, "custos": custos, "refinamentos": refinamentos, "fatores": fatores,
+            "declinio": declinio})
+    else:
+        otimo = otimizar(entradas, objetivo, candidatos(entradas, variacao, pontos), custos, refinamentos,
+                         com_curva=False, fatores=fatores, declinio=declinio)
+    colunas = {coluna: np.repeat(tabela[coluna].to_numpy(), n_moleculas) for coluna in tabela.columns}
+    colunas["molecula"] = np.tile(np.asarray(moleculas, dtype=object), n)
+    nomes = {"pv_final": "pv_final_otimo", "peso_final": "peso_final_otimo", "dias": "dias_otimo",
+             "valor": "valor_otimo", "valor_atual": "valor_atual", "perda": "perda", "no_limite": "no_limite"}
+    for campo, coluna in nomes.items():
+        colunas[coluna] = np.broadcast_to(otimo[campo], (n, n_moleculas)).ravel()
+    return pd.DataFrame(colunas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Peso ótimo de abate para cada lote de um arquivo CSV ou Parquet.")
+    parser.add_argument("entrada", help="arquivo de lotes (.csv ou .parquet)")
+    parser.add_argument("saida", help="arquivo de saída (.csv ou .parquet)")
+    parser.add_argument("--objetivo", default="resultado_agio", choices=list(OBJETIVOS))
+    parser.add_argument("--variacao", type=float, default=0.3, help="variação relativa do ganho de peso na busca")
+    parser.add_argument("--declinio", type=float, default=0.0,
+                        help="queda do GMD (fração ao mês); acima de zero usa a simulação dia a dia")
+    parser.add_argument("--pontos", type=int, default=21, help="candidatos por varredura")
+    parser.add_argument("--refinamentos", type=int, default=3)
+    parser.add_argument("--tamanho-bloco", type=int, default=20_000)
+    parser.add_argument("--processos", type=int, default=paralelo.PROCESSOS_PADRAO,
+                        help=f"processos em paralelo (padrão: {paralelo.PROCESSOS_PADRAO})")
+    args = parser.parse_args(argv)
+
+    import lotes
+
+    inicio = time.perf_counter()
+    n_lotes = 0
+    escritor = lotes.EscritorBlocos(args.saida)
+    try:
+        for bloco in lotes.ler_blocos(args.entrada, args.tamanho_bloco):
+            escritor.gravar(otimizar_tabela(bloco, args.objetivo, args.variacao, args.pontos, args.refinamentos,
+                                            processos=args.processos, declinio=args.declinio))
+            n_lotes += len(bloco)
+    finally:
+        escritor.fechar()
+    segundos = time.perf_counter() - inicio
+    print(f"{n_lotes} lotes otimizados em {segundos:.2f} s ({n_lotes / max(segundos, 1e-9):,.0f} lotes/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,26 @@
+import datetime
 import streamlit as st
 import numpy as np
-import plotly.graph_objects as go
+
+import cache
+import calculos
+import catalogo
+import estilo
+import importacoes
+import sensibilidade
+import monte_carlo
+import paralelo
+import meta
+import abate
+import armazem
+import antecipacao
+import relatorios
+import diario
+import perfil
+
+# Perfil de execução por seção (opcional: ?perfil=1 ou ALAVANCAGEM_PERFIL=1)
+perfilador = perfil.Perfilador(perfil.ativo(st.query_params))
+perfilador.marco("Configuração e estilo")
 
 # Configuração da página
 st.set_page_config(
@@ -8,59 +28,110 @@ st.set_page_config(
     layout="wide"
 )
 
-# CSS personalizado
-st.markdown("""
-    <style>
-    .stApp {
-        background-color: #002A3B;
-    }
-    .main {
-        background-color: #f0f9ff;
-        border-radius: 15px;
-        padding: 20px;
-    }
-    .stTitle {
-        color: #2c5282;
-    }
-    .stHeader {
-        color: #234e52;
-    }
-    .metric-card {
-        background-color: white;
-        padding: 10px;
-        border-radius: 5px;
-        box-shadow: 0 1px 2px rgba(0,0,0,0.1);
-        margin: 5px 0;
-    }
-    .metric-value {
-        color: #2f855a;
-        font-size: 24px;
-        font-weight: bold;
-    }
-    div[data-testid="stVerticalBlock"] {
-        background-color: #f0f9ff;
-        border-radius: 15px;
-        padding: 20px;
-    }
-    .diferencial-value {
-        font-size: 20px;
-        font-weight: bold;
-        color: #464646ee;
-        text-align: left;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-def metric_card(title, value, prefix="", suffix=""):
-    return f"""
-    <div style="background-color: white; padding: 10px; border-radius: 5px; 
-                box-shadow: 0 1px 2px rgba(0,0,0,0.1); margin: 5px 0;">
-        <div style="font-size: 0.9em; color: #666;">{title}</div>
-        <div style="font-size: 1.1em; color: #2f855a; font-weight: bold;">
-            {prefix}{value:.2f}{suffix}
-        </div>
-    </div>
-    """
+# CSS personalizado (montado uma vez por processo em estilo.py)
+st.markdown(estilo.CSS, unsafe_allow_html=True)
+
+def desenhar(figura, **opcoes):
+    # Gráficos e tabelas passam por importacoes.py: o pandas é carregado só quando
+    # uma tabela precisa dele, sem correr junto com o plotly de outra sessão
+    with importacoes.usando_plotly():
+        st.plotly_chart(figura, **opcoes)
+
+
+def mostrar_tabela(dados, **opcoes):
+    importacoes.pandas()
+    st.dataframe(dados, **opcoes)
+
+
+def exibir_metricas(colunas, rotulo, campo, formato="{:.2f}", fator=1, inicio=0):
+    # Uma métrica por molécula, cada uma na sua coluna
+    for coluna, molecula in list(zip(colunas, moleculas))[inicio:]:
+        with coluna:
+            st.metric(rotulo.format(molecula), formato.format(resultados[molecula][campo] * fator))
+
+def configurar_distribuicao(nome, valor):
+    # Widgets para escolher a distribuição de uma entrada incerta (None = valor fixo)
+    tipo = st.selectbox(
+        calculos.ENTRADAS[nome],
+        ["Fixo", "Normal", "Triangular", "Empírica"],
+        index=1,
+        key=f"mc_tipo_{nome}"
+    )
+    if tipo == "Normal":
+        return {
+            "tipo": "normal",
+            "media": st.number_input("Média", value=float(valor), key=f"mc_media_{nome}"),
+            "desvio": st.number_input("Desvio padrão", min_value=0.0, value=float(valor) * 0.05, key=f"mc_desvio_{nome}"),
+        }
+    if tipo == "Triangular":
+        distribuicao = {
+            "tipo": "triangular",
+            "minimo": st.number_input("Mínimo", value=float(valor) * 0.9, key=f"mc_minimo_{nome}"),
+            "moda": st.number_input("Moda", value=float(valor), key=f"mc_moda_{nome}"),
+            "maximo": st.number_input("Máximo", value=float(valor) * 1.1, key=f"mc_maximo_{nome}"),
+        }
+        try:
+            monte_carlo.validar_distribuicao(distribuicao)
+        except ValueError as erro:
+            st.error(str(erro))
+            return None
+        return distribuicao
+    if tipo == "Empírica":
+        texto = st.text_area("Valores observados (separados por vírgula)", value=f"{valor}", key=f"mc_amostras_{nome}")
+        try:
+            amostras = [float(v) for v in texto.replace(";", ",").split(",") if v.strip()]
+        except ValueError:
+            st.error("Valores inválidos na lista de observações.")
+            return None
+        return {"tipo": "empirica", "amostras": amostras} if amostras else None
+    return None
+
+@st.cache_resource
+def cache_compartilhado():
+    # Uma única instância por processo, compartilhada por todas as sessões
+    return cache.CacheLRU()
+
+@st.cache_resource
+def fila_relatorios():
+    # Fila de relatórios do processo; as imagens dos gráficos vão para o cache compartilhado
+    return relatorios.Fila(memoria=cache_compartilhado())
+
+@st.cache_resource
+def antecipador_vizinhos():
+    # Pré-cálculo dos vizinhos do cenário atual, no cache compartilhado
+    return antecipacao.Antecipador(cache_compartilhado())
+
+@st.cache_resource
+def armazem_cenarios():
+    # Uma conexão por processo com o banco de cenários (protegida por trava)
+    return armazem.Armazem()
+
+# Chave do widget de cada entrada do motor
+CHAVES_ENTRADAS = {
+    "pv_inicial": "pv_inicial",
+    "pv_final": "pv_final",
+    "gmd": "gmd",
+    "rendimento_carcaca": "rendimento_carcaca",
+    "consumo_pv_percentual": "consumo_pv_percentual",
+    "custeio": "custeio_mol1_1",
+    "valor_venda_arroba": "valor_venda_arroba_1",
+    "agio_percentual": "agio_percentual_1",
+}
+
+def carregar_cenario(cenario_id):
+    # Callback do botão: preenche os widgets antes da próxima execução do script
+    cenario = armazem_cenarios().carregar(cenario_id)
+    st.session_state["moleculas"] = [molecula for molecula in cenario["moleculas"][1:] if molecula in calculos.MOLECULAS[1:]]
+    for molecula, custo in zip(cenario["moleculas"], cenario["custos"]):
+        st.session_state[f"custo_tabela_{molecula}"] = float(custo)
+    for nome, valor in cenario["entradas"].items():
+        # Pesos são inteiros na interface
+        padrao = calculos.ENTRADAS_PADRAO[nome]
+        st.session_state[CHAVES_ENTRADAS[nome]] = int(round(valor)) if isinstance(padrao, int) else float(valor)
+    declinio = cenario["opcoes"].get("declinio_gmd")
+    st.session_state["modo_diario"] = declinio is not None
+    if declinio is not None:
+        st.session_state["declinio_gmd"] = float(declinio)
 
 # Título da aplicação
 st.title("🚀 Calculadora de Alavancagem")
@@ -68,8 +139,16 @@ st.title("🚀 Calculadora de Alavancagem")
 # Fecha o container arredondado
 st.markdown('</div>', unsafe_allow_html=True)
 
-# Definir variáveis globais
-moleculas = ["FOSBOVI CONF. PLUS", "FOSBOVI CONF. PRIME", "FOSBOVI CONF. PRIME 5.0"]
+# Moléculas comparadas: a base do catálogo (referência) e as escolhidas
+selecionadas = st.multiselect(
+    "Moléculas comparadas",
+    calculos.MOLECULAS[1:],
+    default=calculos.MOLECULAS[1:],
+    key="moleculas"
+)
+produtos = catalogo.selecionar(calculos.CATALOGO, selecionadas)
+moleculas = produtos["nome"]
+fatores_moleculas = catalogo.fatores(produtos)
 
 # Dicionários para armazenar os valores
 precos = {}
@@ -77,14 +156,12 @@ consumos = {}
 custos = {} 
 diferenciais = {}
 
+perfilador.marco("Tabela de produtos")
+
 # Container de Produtos
 with st.container():
     # Cabeçalho
-    st.markdown("""
-        <div class="produto-header">
-            <h3 style="margin:0">Diferencial Tecnológico</h3>
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(estilo.CABECALHO_PRODUTOS, unsafe_allow_html=True)
     
     # Grid de inputs
     st.markdown('<div class="produto-grid">', unsafe_allow_html=True)
@@ -103,47 +180,40 @@ with st.container():
         st.markdown('<div class="produto-label">Diferencial Tecnológico (R$/cab/dia)</div>', unsafe_allow_html=True)
     
     # Inputs para cada molécula
-    for molecula in moleculas:
+    for i, molecula in enumerate(moleculas):
         cols = st.columns([2, 0.8, 0.8, 0.8, 2])
         
         with cols[0]:
             st.markdown(f'<div class="input-field">{molecula}</div>', unsafe_allow_html=True)
         with cols[1]:
-            valor_inicial = 4.90 if molecula == "FOSBOVI CONF. PLUS" else (6.48 if molecula == "FOSBOVI CONF. PRIME" else 8.68)
             precos[molecula] = st.number_input(
                 f"Preço de {molecula}",
                 min_value=0.0,
-                value=valor_inicial,
+                value=float(produtos["preco"][i]),
                 step=0.1,
                 key=f"preco_tabela_{molecula}",
                 label_visibility="collapsed"
             )
         with cols[2]:
-            valor_consumo = 250 if molecula == "FOSBOVI CONF. PLUS" else (290 if molecula == "FOSBOVI CONF. PRIME" else 260)
             consumos[molecula] = st.number_input(
                 f"Consumo de {molecula}",
                 min_value=0,
-                value=valor_consumo,
+                value=int(produtos["consumo"][i]),
                 step=1,
                 key=f"consumo_tabela_{molecula}",
                 label_visibility="collapsed"
             )
         with cols[3]:
-            valor_custo = 1.23 if molecula == "FOSBOVI CONF. PLUS" else (1.88 if molecula == "FOSBOVI CONF. PRIME" else 2.26)
-            custos[molecula] = valor_custo  # Armazenar custo no dicionário de custos
-            st.number_input(
+            custos[molecula] = st.number_input(  # Armazenar custo no dicionário de custos
                 f"Custo de {molecula}",
                 min_value=0.0,
-                value=valor_custo,
+                value=float(produtos["custo"][i]),
                 step=0.01,
                 key=f"custo_tabela_{molecula}",
                 label_visibility="collapsed"
             )
         with cols[4]:
-            if molecula == "FOSBOVI CONF. PLUS":
-                diferencial_tecnologico = 0.00
-            else:
-                diferencial_tecnologico = custos[molecula] - custos["FOSBOVI CONF. PLUS"]
+            diferencial_tecnologico = custos[molecula] - custos[moleculas[0]]
             diferenciais[molecula] = diferencial_tecnologico  # Armazenar diferencial tecnológico
             st.markdown(f'<div class="diferencial-value">{diferencial_tecnologico:.2f}</div>', unsafe_allow_html=True)
     
@@ -151,7 +221,15 @@ with st.container():
     st.markdown('</div>', unsafe_allow_html=True)  # Fecha produto-container
 
 # Organização em abas
-tab1, tab2 = st.tabs(["📝 Entrada de Dados", "📊 Resultados"])
+perfilador.marco("Entradas")
+
+# As abas guardam qual está aberta, para que o conteúdo das demais não seja construído
+tab1, tab2, tab3, tab4, tab5, tab6, tab7, tab8 = st.tabs(
+    ["📝 Entrada de Dados", "📊 Resultados", "🔥 Sensibilidade", "🎲 Risco", "🎯 Meta", "⚖️ Peso de Abate", "🐄 Rebanho",
+     "📅 Histórico"],
+    key="aba",
+    on_change="rerun"
+)
 
 with tab1:
     # Entrada de dados em colunas
@@ -161,95 +239,41 @@ with tab1:
         st.subheader("Dados do Animal")
         
         # Inputs básicos
-        pv_inicial = st.number_input("Peso Vivo Inicial (Kg/Cab)", min_value=0, value=390, step=1)
+        pv_inicial = st.number_input("Peso Vivo Inicial (Kg/Cab)", min_value=0, value=calculos.ENTRADAS_PADRAO["pv_inicial"], step=antecipacao.PASSOS["pv_inicial"], key="pv_inicial")
         
         # Criar linha para GMD
-        gmd_col1, gmd_col2, gmd_col3 = st.columns(3)
-        
-        with gmd_col1:
-            gmd = st.number_input("GMD (kg/dia)", min_value=0.0, value=1.551, step=0.001)
-        with gmd_col2:
-            gmd_mol2 = gmd * 1.077 * 1.02
-            st.metric("GMD FOSBOVI CONF. PRIME (kg/dia)", f"{gmd_mol2:.3f}")
-        with gmd_col3:
-            gmd_mol3 = gmd * 1.118 * 1.02
-            st.metric("GMD FOSBOVI CONF. PRIME 5.0 (kg/dia)", f"{gmd_mol3:.3f}")
+        gmd_cols = st.columns(len(moleculas))
+        with gmd_cols[0]:
+            gmd = st.number_input("GMD (kg/dia)", min_value=0.0, value=calculos.ENTRADAS_PADRAO["gmd"], step=antecipacao.PASSOS["gmd"], key="gmd")
         
         # Criar linha para rendimento de carcaça
-        rendimento_col1, rendimento_col2, rendimento_col3 = st.columns(3)
-        
-        with rendimento_col1:
-            rendimento_carcaca = st.number_input("Rendimento de Carcaça (%)", min_value=0.0, value=54.89, step=0.01)
-        with rendimento_col2:
-            rendimento_carcaca_mol2 = rendimento_carcaca * 1.009
-            st.metric("Rendimento Carcaça FOSBOVI CONF. PRIME (%)", f"{rendimento_carcaca_mol2:.2f}")
-        with rendimento_col3:
-            rendimento_carcaca_mol3 = rendimento_carcaca * 1.0264
-            st.metric("Rendimento Carcaça FOSBOVI CONF. PRIME 5.0 (%)", f"{rendimento_carcaca_mol3:.2f}")
+        rendimento_cols = st.columns(len(moleculas))
+        with rendimento_cols[0]:
+            rendimento_carcaca = st.number_input("Rendimento de Carcaça (%)", min_value=0.0, value=calculos.ENTRADAS_PADRAO["rendimento_carcaca"], step=antecipacao.PASSOS["rendimento_carcaca"], key="rendimento_carcaca")
         
         # Criar linha para pesos finais
-        pv_final_col1, pv_final_col2, pv_final_col3 = st.columns(3)
-        
-        with pv_final_col1:
-            pv_final = st.number_input("Peso Vivo Final (Kg/Cab)", min_value=0, value=560, step=1)
-        
-        # Calcular dias e pesos finais das outras moléculas
-        dias = (pv_final - pv_inicial) / gmd
-        pv_final_mol2 = pv_inicial + (gmd_mol2 * dias)
-        pv_final_mol3 = pv_inicial + (gmd_mol3 * dias)
-        
-        with pv_final_col2:
-            st.metric("PV Final FOSBOVI CONF. PRIME (Kg/Cab)", f"{pv_final_mol2:.1f}")
-        with pv_final_col3:
-            st.metric("PV Final FOSBOVI CONF. PRIME 5.0 (Kg/Cab)", f"{pv_final_mol3:.1f}")
+        pv_final_cols = st.columns(len(moleculas))
+        with pv_final_cols[0]:
+            pv_final = st.number_input("Peso Vivo Final (Kg/Cab)", min_value=0, value=calculos.ENTRADAS_PADRAO["pv_final"], step=antecipacao.PASSOS["pv_final"], key="pv_final")
     
         # Criar linha para pesos vivos finais em arrobas
-        pv_final_arroba_col1, pv_final_arroba_col2, pv_final_arroba_col3 = st.columns(3)
-        
-        with pv_final_arroba_col1:
-            st.metric("PV Final FOSBOVI CONF. PLUS (@/Cab)", f"{pv_final * rendimento_carcaca / 100 / 15:.2f}")
-        with pv_final_arroba_col2:
-            st.metric("PV Final FOSBOVI CONF. PRIME (@/Cab)", f"{pv_final_mol2 * rendimento_carcaca_mol2 / 100 / 15:.2f}")
-        with pv_final_arroba_col3:
-            st.metric("PV Final FOSBOVI CONF. PRIME 5.0 (@/Cab)", f"{pv_final_mol3 * rendimento_carcaca_mol3 / 100 / 15:.2f}")
+        pv_final_arroba_cols = st.columns(len(moleculas))
+
+        # Simulação dia a dia (opcional): GMD declinante e consumo pelo peso de cada dia
+        diario_cols = st.columns(3)
+        with diario_cols[0]:
+            modo_diario = st.toggle("Simulação dia a dia", key="modo_diario")
+        with diario_cols[1]:
+            declinio_gmd = st.number_input("Queda do GMD (% ao mês)", min_value=0.0, max_value=50.0, value=0.0,
+                                           step=0.5, key="declinio_gmd", disabled=not modo_diario)
     
     # Criar linha para consumo em %PV
-    consumo_pv_col1, consumo_pv_col2, consumo_pv_col3 = st.columns(3)
-    
-    with consumo_pv_col1:
-        consumo_pv_mol1 = st.number_input("Consumo (%PV) para FOSBOVI CONF. PLUS", min_value=0.0, value=2.31, step=0.01) / 100
-
-    # Definir o consumo em porcentagem do peso vivo para cada molécula
-    consumo_pv = {
-        "FOSBOVI CONF. PLUS": consumo_pv_mol1,
-        "FOSBOVI CONF. PRIME": consumo_pv_mol1 * 1.045,
-        "FOSBOVI CONF. PRIME 5.0": consumo_pv_mol1 * 1.045
-    }
-
-    # Exibir consumo em %PV
-    # with consumo_pv_col1:
-    #     st.metric("Consumo (%PV) FOSBOVI CONF. PLUS", f"{consumo_pv['FOSBOVI CONF. PLUS']*100:.2f}%")
-    with consumo_pv_col2:
-        st.metric("Consumo (%PV) FOSBOVI CONF. PRIME", f"{consumo_pv['FOSBOVI CONF. PRIME']*100:.2f}%")
-    with consumo_pv_col3:
-        st.metric("Consumo (%PV) FOSBOVI CONF. PRIME 5.0", f"{consumo_pv['FOSBOVI CONF. PRIME 5.0']*100:.2f}%")
-
-    # Calcular o consumo MS (Kg/Cab/dia) para cada molécula
-    consumo_ms = {
-        "FOSBOVI CONF. PLUS": consumo_pv["FOSBOVI CONF. PLUS"] * np.mean([pv_inicial, pv_final]),
-        "FOSBOVI CONF. PRIME": consumo_pv["FOSBOVI CONF. PRIME"] * np.mean([pv_inicial, pv_final_mol2]),
-        "FOSBOVI CONF. PRIME 5.0": consumo_pv["FOSBOVI CONF. PRIME 5.0"] * np.mean([pv_inicial, pv_final_mol3])
-    }
-
-    # Exibir consumo MS
-    consumo_ms_col1, consumo_ms_col2, consumo_ms_col3 = st.columns(3)
-    
-    with consumo_ms_col1:
-        st.metric("Consumo MS FOSBOVI CONF. PLUS (Kg/Cab/dia)", f"{consumo_ms['FOSBOVI CONF. PLUS']:.2f}")
-    with consumo_ms_col2:
-        st.metric("Consumo MS FOSBOVI CONF. PRIME (Kg/Cab/dia)", f"{consumo_ms['FOSBOVI CONF. PRIME']:.2f}")
-    with consumo_ms_col3:
-        st.metric("Consumo MS FOSBOVI CONF. PRIME 5.0 (Kg/Cab/dia)", f"{consumo_ms['FOSBOVI CONF. PRIME 5.0']:.2f}")
+    consumo_pv_cols = st.columns(len(moleculas))
+    with consumo_pv_cols[0]:
+        consumo_pv_percentual = st.number_input(f"Consumo (%PV) para {moleculas[0]}", min_value=0.0, value=calculos.ENTRADAS_PADRAO["consumo_pv_percentual"], step=antecipacao.PASSOS["consumo_pv_percentual"], key="consumo_pv_percentual")
+
+    # Linha para consumo MS
+    consumo_ms_cols = st.columns(len(moleculas))
 
 # Parâmetros principais em container separado
 st.markdown("---")
@@ -258,483 +282,722 @@ st.subheader("Parâmetros Financeiros")
 finance_col1, finance_col2, finance_col3 = st.columns(3)
 
 with finance_col1:
-    valor_venda_arroba = st.number_input("Valor de Venda da arroba (R$/@)", min_value=0.0, value=340.0, step=0.1, key="valor_venda_arroba_1")
+    valor_venda_arroba = st.number_input("Valor de Venda da arroba (R$/@)", min_value=0.0, value=calculos.ENTRADAS_PADRAO["valor_venda_arroba"], step=antecipacao.PASSOS["valor_venda_arroba"], key="valor_venda_arroba_1")
 with finance_col2:
-    agio_percentual = st.number_input("Ágio para Animal Magro (%)", min_value=0.0, value=5.0, step=0.1, key="agio_percentual_1")
+    agio_percentual = st.number_input("Ágio para Animal Magro (%)", min_value=0.0, value=calculos.ENTRADAS_PADRAO["agio_percentual"], step=antecipacao.PASSOS["agio_percentual"], key="agio_percentual_1")
+
+params_cols = st.columns(len(moleculas))
+with params_cols[0]:
+    custeio_mol1 = st.number_input(f"Custeio (R$/Cab/dia) {moleculas[0]}", min_value=0.0, value=calculos.ENTRADAS_PADRAO["custeio"], step=antecipacao.PASSOS["custeio"], key="custeio_mol1_1")
+
+perfilador.marco("Cálculo")
+
+# Calcular todos os resultados de uma vez
+entradas = {
+    "pv_inicial": pv_inicial,
+    "pv_final": pv_final,
+    "gmd": gmd,
+    "rendimento_carcaca": rendimento_carcaca,
+    "consumo_pv_percentual": consumo_pv_percentual,
+    "custeio": custeio_mol1,
+    "valor_venda_arroba": valor_venda_arroba,
+    "agio_percentual": agio_percentual,
+}
+custos_moleculas = [custos[molecula] for molecula in moleculas]
+
+# Cenários repetidos (entre execuções e sessões) vêm do cache; nos demais,
+# o avaliador da sessão recalcula só o que depende das entradas alteradas
+if "avaliador" not in st.session_state:
+    st.session_state["avaliador"] = calculos.AvaliadorIncremental()
+avaliador = st.session_state["avaliador"]
+
+memoria = cache_compartilhado()
+chave = cache.chave_cenario(entradas, custos_moleculas, moleculas, *(("diario", declinio_gmd) if modo_diario else ()))
+# Entradas em edição: seus vizinhos são antecipados ao fim da execução (ver antecipacao.py)
+alteradas = antecipacao.editadas(st.session_state.get("entradas_anteriores"), entradas)
+if alteradas:
+    st.session_state["entradas_editadas"] = alteradas
+    if not modo_diario:
+        antecipador_vizinhos().registrar(chave)
+st.session_state["entradas_anteriores"] = dict(entradas)
+
+if modo_diario:
+    # Com o GMD caindo depressa o peso final pode nunca ser atingido: o resumo seria só NaN
+    try:
+        diario.verificar(entradas["pv_inicial"], entradas["pv_final"], entradas["gmd"], declinio_gmd / 100)
+    except ValueError as erro:
+        st.error(str(erro))
+        st.stop()
+    simulacao = memoria.obter(("diario", chave), lambda: diario.simular(
+        custos=custos_moleculas, declinio=declinio_gmd / 100, fatores=fatores_moleculas, **entradas
+    ))
+    resultados = memoria.obter(("resultados", chave), lambda: calculos.resultados_por_molecula(
+        simulacao["resumo"], moleculas
+    ))
+else:
+    resultados = memoria.obter(("resultados", chave), lambda: calculos.resultados_por_molecula(
+        avaliador.calcular(custos=custos_moleculas, fatores=fatores_moleculas, **entradas), moleculas
+    ))
+
+perfilador.marco("Métricas")
+
+with tab1:
+    # Valores derivados das moléculas PRIME
+    exibir_metricas(gmd_cols, "GMD {} (kg/dia)", "gmd", "{:.3f}", inicio=1)
+    exibir_metricas(rendimento_cols, "Rendimento Carcaça {} (%)", "rendimento", inicio=1)
+    exibir_metricas(pv_final_cols, "PV Final {} (Kg/Cab)", "peso_final", "{:.1f}", inicio=1)
+    exibir_metricas(pv_final_arroba_cols, "PV Final {} (@/Cab)", "pv_final_arroba")
+    exibir_metricas(consumo_pv_cols, "Consumo (%PV) {}", "consumo_pv", "{:.2f}%", fator=100, inicio=1)
+    exibir_metricas(consumo_ms_cols, "Consumo MS {} (Kg/Cab/dia)", "consumo_ms")
+
 with finance_col3:
-    custo_animal_magro = (valor_venda_arroba * (1 + agio_percentual/100)) * (pv_inicial/30)
-    st.metric("Custo do Animal Magro (R$/cab)", f"R$ {custo_animal_magro:.2f}")
-
-params_col1, params_col2, params_col3 = st.columns(3)
-
-with params_col1:
-    custeio_mol1 = st.number_input("Custeio (R$/Cab/dia) FOSBOVI CONF. PLUS", min_value=0.0, value=15.0, step=0.01, key="custeio_mol1_1")
-with params_col2:
-    custeio_mol2 = consumo_ms["FOSBOVI CONF. PRIME"] / consumo_ms["FOSBOVI CONF. PLUS"] * custeio_mol1
-    st.metric("Custeio (R$/Cab/dia) FOSBOVI CONF. PRIME", f"{custeio_mol2:.2f}")
-with params_col3:
-    custeio_mol3 = consumo_ms["FOSBOVI CONF. PRIME 5.0"] / consumo_ms["FOSBOVI CONF. PLUS"] * custeio_mol1
-    st.metric("Custeio (R$/Cab/dia) FOSBOVI CONF. PRIME 5.0", f"{custeio_mol3:.2f}")
-
-# Calcular Custeio Final
-custeio_final_col1, custeio_final_col2, custeio_final_col3 = st.columns(3)
-
-with custeio_final_col1:
-    custeio_final_mol1 = diferenciais["FOSBOVI CONF. PLUS"] + custeio_mol1
-    st.metric("Custeio Final (R$/Cab/dia) FOSBOVI CONF. PLUS", f"{custeio_final_mol1:.2f}")
-with custeio_final_col2:
-    custeio_final_mol2 = diferenciais["FOSBOVI CONF. PRIME"] + custeio_mol2
-    st.metric("Custeio Final (R$/Cab/dia) FOSBOVI CONF. PRIME", f"{custeio_final_mol2:.2f}")
-with custeio_final_col3:
-    custeio_final_mol3 = diferenciais["FOSBOVI CONF. PRIME 5.0"] + custeio_mol3
-    st.metric("Custeio Final (R$/Cab/dia) FOSBOVI CONF. PRIME 5.0", f"{custeio_final_mol3:.2f}")
-
-
-# Calcular valores para cada molécula
-resultados = {}
-
-for idx, molecula in enumerate(moleculas):
-    # Cálculos básicos
-    consumo_pv_atual = consumo_pv[molecula]
-    
-    if idx == 0:  # FOSBOVI CONF. PLUS
-        peso_final_atual = pv_final
-        gmd_atual = gmd
-        rendimento_atual = rendimento_carcaca
-    elif idx == 1:  # FOSBOVI CONF. PRIME
-        peso_final_atual = pv_final_mol2
-        gmd_atual = gmd_mol2
-        rendimento_atual = rendimento_carcaca * 1.009
-    else:  # FOSBOVI CONF. PRIME 5.0
-        peso_final_atual = pv_final_mol3
-        gmd_atual = gmd_mol3
-        rendimento_atual = rendimento_carcaca * 1.0264
-    
-    # Cálculos derivados
-    dias = (peso_final_atual - pv_inicial) / gmd_atual
-    consumo_ms_atual = consumo_pv_atual * np.mean([pv_inicial, peso_final_atual])
-    arrobas = ((peso_final_atual * rendimento_atual/100)/15) - (pv_inicial/30)
-    
-    # Cálculos financeiros
-    custeio_atual = custeio_mol1 if idx == 0 else (consumo_ms_atual / resultados["FOSBOVI CONF. PLUS"]["consumo_ms"]) * custeio_mol1
-    diferencial_tec = 0 if idx == 0 else diferenciais[molecula]
-    custeio_final = custeio_atual + diferencial_tec
-    
-    custo_periodo = custeio_final * dias
-    valor_arrobas = valor_venda_arroba * arrobas
-    
-    resultado = valor_arrobas - custo_periodo - custo_animal_magro
-    
-    # Armazenar resultados
-    resultados[molecula] = {
-        "consumo_pv": consumo_pv_atual,
-        "consumo_ms": consumo_ms_atual,
-        "peso_final": peso_final_atual,
-        "gmd": gmd_atual,
-        "dias": dias,
-        "rendimento": rendimento_atual,
-        "arrobas": arrobas,
-        "custeio": custeio_atual,
-        "custeio_final": custeio_final,
-        "resultado": resultado,
-        "rentabilidade_periodo": resultado/(valor_venda_arroba * peso_final_atual),
-        "rentabilidade_mensal": ((1 + resultado/(valor_venda_arroba * peso_final_atual))**(1/(dias/30.4))) - 1,
-        "eficiencia_biologica": (consumo_ms_atual * dias) / arrobas
-    }
-    
-    if idx > 0:
-        resultados[molecula].update({
-            "arrobas_adicionais": arrobas - resultados["FOSBOVI CONF. PLUS"]["arrobas"],
-            "receita_adicional": (arrobas - resultados["FOSBOVI CONF. PLUS"]["arrobas"]) * valor_venda_arroba,
-            "custo_adicional": custo_periodo - resultados["FOSBOVI CONF. PLUS"]["custeio_final"] * dias,
-            "incremento_lucro_adicional": resultado - resultados["FOSBOVI CONF. PLUS"]["resultado"],
-            "custo_arroba_adicional": (custo_periodo - resultados["FOSBOVI CONF. PLUS"]["custeio_final"] * dias) / 
-                                    (arrobas - resultados["FOSBOVI CONF. PLUS"]["arrobas"])
-        })
+    st.metric("Custo do Animal Magro (R$/cab)", f"R$ {resultados[moleculas[0]]['custo_animal_magro']:.2f}")
+
+exibir_metricas(params_cols, "Custeio (R$/Cab/dia) {}", "custeio", inicio=1)
+exibir_metricas(st.columns(len(moleculas)), "Custeio Final (R$/Cab/dia) {}", "custeio_final")
 
 # Custo da arroba produzida
-custo_arroba_col1, custo_arroba_col2, custo_arroba_col3 = st.columns(3)
-
-with custo_arroba_col1:
-    custo_arroba_mol1 = (custeio_final_mol1 * dias) / resultados["FOSBOVI CONF. PLUS"]["arrobas"]
-    st.metric("Custo da Arroba FOSBOVI CONF. PLUS (R$/@)", f"{custo_arroba_mol1:.2f}")
-with custo_arroba_col2:
-    custo_arroba_mol2 = (custeio_final_mol2 * dias) / resultados["FOSBOVI CONF. PRIME"]["arrobas"]
-    st.metric("Custo da Arroba FOSBOVI CONF. PRIME (R$/@)", f"{custo_arroba_mol2:.2f}")
-with custo_arroba_col3:
-    custo_arroba_mol3 = (custeio_final_mol3 * dias) / resultados["FOSBOVI CONF. PRIME 5.0"]["arrobas"]
-    st.metric("Custo da Arroba FOSBOVI CONF. PRIME 5.0 (R$/@)", f"{custo_arroba_mol3:.2f}")
+exibir_metricas(st.columns(len(moleculas)), "Custo da Arroba {} (R$/@)", "custo_arroba")
 
 # Custeio no período da arroba produzida
-custeio_periodo_col1, custeio_periodo_col2, custeio_periodo_col3 = st.columns(3)
-
-with custeio_periodo_col1:
-    custeio_periodo_mol1 = custeio_final_mol1 * dias
-    st.metric("Custeio no Período FOSBOVI CONF. PLUS (R$/Cab)", f"{custeio_periodo_mol1:.2f}")
-with custeio_periodo_col2:
-    custeio_periodo_mol2 = custeio_final_mol2 * dias
-    st.metric("Custeio no Período FOSBOVI CONF. PRIME (R$/Cab)", f"{custeio_periodo_mol2:.2f}")
-with custeio_periodo_col3:
-    custeio_periodo_mol3 = custeio_final_mol3 * dias
-    st.metric("Custeio no Período FOSBOVI CONF. PRIME 5.0 (R$/Cab)", f"{custeio_periodo_mol3:.2f}")
+exibir_metricas(st.columns(len(moleculas)), "Custeio no Período {} (R$/Cab)", "custeio_periodo")
 
 # Valor das arrobas produzidas
-valor_arrobas_col1, valor_arrobas_col2, valor_arrobas_col3 = st.columns(3)
-
-with valor_arrobas_col1:
-    valor_arrobas_mol1 = valor_venda_arroba * resultados["FOSBOVI CONF. PLUS"]["arrobas"]
-    st.metric("Valor das Arrobas Produzidas FOSBOVI CONF. PLUS (R$/Cab)", f"{valor_arrobas_mol1:.2f}")
-with valor_arrobas_col2:
-    valor_arrobas_mol2 = valor_venda_arroba * resultados["FOSBOVI CONF. PRIME"]["arrobas"]
-    st.metric("Valor das Arrobas Produzidas FOSBOVI CONF. PRIME (R$/Cab)", f"{valor_arrobas_mol2:.2f}")
-with valor_arrobas_col3:
-    valor_arrobas_mol3 = valor_venda_arroba * resultados["FOSBOVI CONF. PRIME 5.0"]["arrobas"]
-    st.metric("Valor das Arrobas Produzidas FOSBOVI CONF. PRIME 5.0 (R$/Cab)", f"{valor_arrobas_mol3:.2f}")
+exibir_metricas(st.columns(len(moleculas)), "Valor das Arrobas Produzidas {} (R$/Cab)", "valor_arrobas")
 
 # Resultado (R$/cab)
-resultado_col1, resultado_col2, resultado_col3 = st.columns(3)
-
-with resultado_col1:
-    resultado_mol1 = valor_arrobas_mol1 - custeio_periodo_mol1
-    st.metric("Resultado FOSBOVI CONF. PLUS (R$/Cab)", f"{resultado_mol1:.2f}")
-with resultado_col2:
-    resultado_mol2 = valor_arrobas_mol2 - custeio_periodo_mol2
-    st.metric("Resultado FOSBOVI CONF. PRIME (R$/Cab)", f"{resultado_mol2:.2f}")
-with resultado_col3:
-    resultado_mol3 = valor_arrobas_mol3 - custeio_periodo_mol3
-    st.metric("Resultado FOSBOVI CONF. PRIME 5.0 (R$/Cab)", f"{resultado_mol3:.2f}")
+exibir_metricas(st.columns(len(moleculas)), "Resultado {} (R$/Cab)", "resultado_arrobas")
 
 # Resultado com ágio
-resultado_agio_col1, resultado_agio_col2, resultado_agio_col3 = st.columns(3)
-
-with resultado_agio_col1:
-    resultado_agio_mol1 = (pv_final * rendimento_carcaca / 100 / 15) * valor_venda_arroba - custo_animal_magro - custeio_periodo_mol1
-    st.metric("Resultado com Ágio FOSBOVI CONF. PLUS (R$/Cab)", f"{resultado_agio_mol1:.2f}")
-with resultado_agio_col2:
-    resultado_agio_mol2 = (pv_final_mol2 * rendimento_carcaca_mol2 / 100 / 15) * valor_venda_arroba - custo_animal_magro - custeio_periodo_mol2
-    st.metric("Resultado com Ágio FOSBOVI CONF. PRIME (R$/Cab)", f"{resultado_agio_mol2:.2f}")
-with resultado_agio_col3:
-    resultado_agio_mol3 = (pv_final_mol3 * rendimento_carcaca_mol3 / 100 / 15) * valor_venda_arroba - custo_animal_magro - custeio_periodo_mol3
-    st.metric("Resultado com Ágio FOSBOVI CONF. PRIME 5.0 (R$/Cab)", f"{resultado_agio_mol3:.2f}")
+exibir_metricas(st.columns(len(moleculas)), "Resultado com Ágio {} (R$/Cab)", "resultado_agio")
 
 # Rentabilidade no período
-rentabilidade_periodo_col1, rentabilidade_periodo_col2, rentabilidade_periodo_col3 = st.columns(3)
-
-with rentabilidade_periodo_col1:
-    pv_final_arroba_mol1 = pv_final * rendimento_carcaca / 100 / 15
-    rentabilidade_periodo_agio_mol1 = resultado_agio_mol1 / (valor_venda_arroba * pv_final_arroba_mol1)
-    st.metric("Rentabilidade no Período FOSBOVI CONF. PLUS (%)", f"{rentabilidade_periodo_agio_mol1 * 100:.2f}%")
-with rentabilidade_periodo_col2:
-    pv_final_arroba_mol2 = pv_final_mol2 * rendimento_carcaca_mol2 / 100 / 15
-    rentabilidade_periodo_agio_mol2 = resultado_agio_mol2 / (valor_venda_arroba * pv_final_arroba_mol2)
-    st.metric("Rentabilidade no Período FOSBOVI CONF. PRIME (%)", f"{rentabilidade_periodo_agio_mol2 * 100:.2f}%")
-with rentabilidade_periodo_col3:
-    pv_final_arroba_mol3 = pv_final_mol3 * rendimento_carcaca_mol3 / 100 / 15
-    rentabilidade_periodo_agio_mol3 = resultado_agio_mol3 / (valor_venda_arroba * pv_final_arroba_mol3)
-    st.metric("Rentabilidade no Período FOSBOVI CONF. PRIME 5.0 (%)", f"{rentabilidade_periodo_agio_mol3 * 100:.2f}%")
+exibir_metricas(st.columns(len(moleculas)), "Rentabilidade no Período {} (%)", "rentabilidade_periodo_agio", "{:.2f}%", fator=100)
 
 # Rentabilidade mensal
-rentabilidade_mensal_col1, rentabilidade_mensal_col2, rentabilidade_mensal_col3 = st.columns(3)
-
-with rentabilidade_mensal_col1:
-    rentabilidade_mensal_mol1 = ((1 + rentabilidade_periodo_agio_mol1)**(1/(dias/30.4))) - 1
-    st.metric("Rentabilidade Mensal FOSBOVI CONF. PLUS (%)", f"{rentabilidade_mensal_mol1 * 100:.2f}%")
-with rentabilidade_mensal_col2:
-    rentabilidade_mensal_mol2 = ((1 + rentabilidade_periodo_agio_mol2)**(1/(dias/30.4))) - 1
-    st.metric("Rentabilidade Mensal FOSBOVI CONF. PRIME (%)", f"{rentabilidade_mensal_mol2 * 100:.2f}%")
-with rentabilidade_mensal_col3:
-    rentabilidade_mensal_mol3 = ((1 + rentabilidade_periodo_agio_mol3)**(1/(dias/30.4))) - 1
-    st.metric("Rentabilidade Mensal FOSBOVI CONF. PRIME 5.0 (%)", f"{rentabilidade_mensal_mol3 * 100:.2f}%")
+exibir_metricas(st.columns(len(moleculas)), "Rentabilidade Mensal {} (%)", "rentabilidade_mensal_agio", "{:.2f}%", fator=100)
 
 # Insights principais
 insight_col1, insight_col2, insight_col3 = st.columns(3)
 
-with insight_col1:
-    st.metric("GDC FOSBOVI CONF. PLUS (KG/DIA)", f"{(((pv_final * rendimento_carcaca/100)) - (pv_inicial/2))/resultados['FOSBOVI CONF. PLUS']['dias']:.3f}")
-    st.metric("GDC FOSBOVI CONF. PRIME (KG/DIA)", f"{(((pv_final_mol2 * rendimento_carcaca_mol2/100)) - (pv_inicial/2))/resultados['FOSBOVI CONF. PRIME']['dias']:.3f}")
-    st.metric("GDC FOSBOVI CONF. PRIME 5.0 (KG/DIA)", f"{(((pv_final_mol3 * rendimento_carcaca_mol3/100)) - (pv_inicial/2))/resultados['FOSBOVI CONF. PRIME 5.0']['dias']:.3f}")
+exibir_metricas([insight_col1] * len(moleculas), "GDC {} (KG/DIA)", "gdc", "{:.3f}")
+exibir_metricas([insight_col2] * len(moleculas), "Arrobas Produzidas {} (@/Cab)", "arrobas")
+exibir_metricas([insight_col3] * len(moleculas), "Eficiência Biológica {} (kgMS/@)", "eficiencia_biologica")
 
-with insight_col2:
-    st.metric("Arrobas Produzidas FOSBOVI CONF. PLUS (@/Cab)", f"{resultados['FOSBOVI CONF. PLUS']['arrobas']:.2f}")
-    st.metric("Arrobas Produzidas FOSBOVI CONF. PRIME (@/Cab)", f"{resultados['FOSBOVI CONF. PRIME']['arrobas']:.2f}")
-    st.metric("Arrobas Produzidas FOSBOVI CONF. PRIME 5.0 (@/Cab)", f"{resultados['FOSBOVI CONF. PRIME 5.0']['arrobas']:.2f}")
+perfilador.marco("Aba Resultados")
 
-
-with insight_col3:
-    st.metric("Eficiência Biológica FOSBOVI CONF. PLUS (kgMS/@)", f"{resultados['FOSBOVI CONF. PLUS']['eficiencia_biologica']:.2f}")
-    st.metric("Eficiência Biológica FOSBOVI CONF. PRIME (kgMS/@)", f"{resultados['FOSBOVI CONF. PRIME']['eficiencia_biologica']:.2f}")
-    st.metric("Eficiência Biológica FOSBOVI CONF. PRIME 5.0 (kgMS/@)", f"{resultados['FOSBOVI CONF. PRIME 5.0']['eficiencia_biologica']:.2f}")
-    
-
-# Tab 2 - Resultados
+# Tab 2 - Resultados (construída só quando a aba está aberta)
 with tab2:
-    st.header("📈 Análise Comparativa", divider='rainbow')
-    
-    # Seção 1: Cards de Indicadores em colunas
-    st.subheader("Indicadores de Performance")
-    
-    # Criar 5 colunas para os indicadores
-    col_gmd, col_rend, col_gdc, col_efic, col_arr = st.columns(5)
-    
-    # GMD
-    with col_gmd:
-        st.markdown("""
-            <div style="background-color: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                <h4 style="color: #2c5282; margin-bottom: 10px;">GMD (Kg/dia)</h4>
-        """, unsafe_allow_html=True)
-        
-        for molecula in moleculas:
-            st.markdown(metric_card(
-                f"{molecula}", 
-                resultados[molecula]['gmd'],
-                suffix=" kg/dia"
-            ), unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    # Rendimento de Carcaça
-    with col_rend:
-        st.markdown("""
-            <div style="background-color: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                <h4 style="color: #2c5282; margin-bottom: 10px;">Rendimento de Carcaça</h4>
-        """, unsafe_allow_html=True)
-        
-        for molecula in moleculas:
-            st.markdown(metric_card(
-                f"{molecula}", 
-                resultados[molecula]['rendimento'],
-                suffix=" %"
-            ), unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
-    # GDC
-    with col_gdc:
-        st.markdown("""
-            <div style="background-color: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                <h4 style="color: #2c5282; margin-bottom: 10px;">GDC (Kg/dia)</h4>
-        """, unsafe_allow_html=True)
-        
-        for molecula in moleculas:
-            gdc = (((resultados[molecula]['peso_final'] * resultados[molecula]['rendimento']/100)) - 
-                   (pv_inicial/2))/resultados[molecula]['dias']
-            st.markdown(metric_card(
-                f"{molecula}", 
-                gdc,
-                suffix=" kg/dia"
-            ), unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+    if tab2.open:
+        # Plotly só é importado quando uma aba com gráficos é aberta
+        import graficos
+
+        st.header("📈 Análise Comparativa", divider='rainbow')
     
-    # Eficiência Biológica
-    with col_efic:
-        st.markdown("""
-            <div style="background-color: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                <h4 style="color: #2c5282; margin-bottom: 10px;">Eficiência Biológica</h4>
-        """, unsafe_allow_html=True)
-        
-        for molecula in moleculas:
-            st.markdown(metric_card(
-                f"{molecula}", 
-                resultados[molecula]['eficiencia_biologica'],
-                suffix=" kgMS/@"
-            ), unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
+        # Seção 1: Cards de Indicadores em colunas
+        st.subheader("Indicadores de Performance")
     
-    # Arrobas Adicionais
-    with col_arr:
-        st.markdown("""
-            <div style="background-color: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
-                <h4 style="color: #2c5282; margin-bottom: 10px;">Arrobas Adicionais</h4>
-        """, unsafe_allow_html=True)
-        
-        for molecula in moleculas:
-            valor = resultados[molecula].get('arrobas_adicionais', 0)
-            st.markdown(metric_card(
-                f"{molecula}", 
-                valor,
-                suffix=" @/cab"
-            ), unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-
-    st.markdown("---")
-
-    # Seção 2: Gráficos
-    st.markdown("---")
-    st.subheader("Análise Comparativa")
-
-    # b) Incremento Lucro Adicional (R$/cab)
-    col1, col2 = st.columns(2)
-    with col1:
-        fig_lucro = go.Figure()
-        lucros = [0]  # Molécula 1 é referência
-        incrementos = [0]  # Para armazenar os percentuais
-        
-        # Calcula os incrementos percentuais
-        resultado_base = resultado_agio_mol1
-        if resultado_base < 0:
-            incremento_mol2 = (resultado_agio_mol2 / resultado_base - 1) * -1 * 100
-            incremento_mol3 = (resultado_agio_mol3 / resultado_base - 1) * -1 * 100
-        else:
-            incremento_mol2 = (resultado_agio_mol2 / resultado_base - 1) * 100
-            incremento_mol3 = (resultado_agio_mol3 / resultado_base - 1) * 100
-        incrementos.extend([incremento_mol2, incremento_mol3])
-        
-        # Adiciona os valores de incremento em R$
-        for molecula in moleculas[1:]:
-            lucros.append(resultados[molecula]['incremento_lucro_adicional'])
-        
-        # Adiciona as barras
-        fig_lucro.add_trace(go.Bar(
-            x=moleculas,
-            y=lucros,
-            name='Incremento Lucro Adicional',
-            marker_color='rgb(71, 135, 198)'  # Azul claro
-        ))
-
-        # Adiciona anotações para os valores em R$ e percentual no meio das barras
-        for i, (valor, percentual) in enumerate(zip(lucros, incrementos)):
-            if valor != 0:  # Apenas para valores não zero
-                fig_lucro.add_annotation(
-                    x=moleculas[i],
-                    y=valor/2,  # Posição do valor em R$
-                    text=f"+R$ {abs(valor):.2f}<br>(+{abs(percentual):.0f}%)",  # Valor em R$ e percentual
-                    showarrow=False,
-                    font=dict(size=14, color='white'),
-                    align='center'
+        for coluna, (titulo, campo, sufixo) in zip(st.columns(len(relatorios.CARTOES)), relatorios.CARTOES):
+            with coluna:
+                st.markdown(estilo.cabecalho_indicador(titulo), unsafe_allow_html=True)
+                for molecula in moleculas:
+                    st.markdown(estilo.cartao_metrica(molecula, resultados[molecula][campo], sufixo=sufixo),
+                                unsafe_allow_html=True)
+                st.markdown("</div>", unsafe_allow_html=True)
+
+        st.markdown("---")
+
+        # Seção 2: Gráficos
+        st.markdown("---")
+        st.subheader("Análise Comparativa")
+
+        figuras = memoria.obter(("figuras", chave),
+                                lambda: graficos.congelar(graficos.figuras_comparativas(resultados, moleculas)))
+
+        # b) Incremento Lucro Adicional (R$/cab)
+        col1, col2 = st.columns(2)
+        with col1:
+            desenhar(figuras["incremento_lucro"], use_container_width=True, key="plot_incremento_lucro_adicional")
+
+        # c) Custo x Receita Adicional
+        with col2:
+            desenhar(figuras["custo_receita"], use_container_width=True, key="plot_custo_receita")
+
+
+        # d) Performance: Arrobas x Custo
+        col1, col2 = st.columns(2)
+        with col1:
+            desenhar(figuras["performance"], use_container_width=True, key="plot_performance")
+
+        # f) Sensibilidade local: o que mais move o indicador, com cada entrada a ±X% (modelo sem simulação diária)
+        if not modo_diario:
+            st.subheader("Sensibilidade Local")
+            tornado_col1, tornado_col2 = st.columns(2)
+            with tornado_col1:
+                campo_tornado = st.selectbox("Indicador", sensibilidade.CAMPOS_TORNADO,
+                                             format_func=calculos.INDICADORES.get, key="tornado_campo")
+            with tornado_col2:
+                variacao_tornado = st.number_input("Variação das entradas (±%)", min_value=1, max_value=50, value=10,
+                                                   step=1, key="tornado_variacao")
+            # Todas as entradas e custos das moléculas deslocados numa chamada só ao motor
+            tornado = memoria.obter(("tornado", chave, variacao_tornado), lambda: sensibilidade.tornado(
+                entradas, variacao_tornado / 100, custos=custos_moleculas, fatores=fatores_moleculas
+            ))
+            # Nos incrementos a referência é sempre zero
+            indices_tornado = range(1 if campo_tornado in calculos.CAMPOS_INCREMENTAIS else 0, len(moleculas))
+            percentual = campo_tornado.startswith("rentabilidade")
+            rotulos_tornado = {nome: meta.rotulo_variavel(nome, moleculas) for nome in tornado["nomes"]}
+            figuras_tornado = memoria.obter(
+                ("figuras_tornado", chave, variacao_tornado, campo_tornado),
+                lambda: graficos.congelar({i: graficos.figura_tornado(
+                    tornado, campo_tornado, i, moleculas[i], rotulos_tornado, 100 if percentual else 1,
+                    'p.p.' if percentual else 'R$/cab'
+                ) for i in indices_tornado})
+            )
+            for coluna, i in zip(st.columns(len(indices_tornado)), indices_tornado):
+                with coluna:
+                    desenhar(figuras_tornado[i], use_container_width=True, key=f"plot_tornado_{i}")
+            with st.expander("Variação do indicador por 1% da variável"):
+                mostrar_tabela({
+                    "Variável": list(rotulos_tornado.values()),
+                    **{f"{moleculas[i]} (%)": tornado[campo_tornado]["elasticidade"][:, i] for i in indices_tornado},
+                    **{f"{moleculas[i]} ({'p.p.' if percentual else 'R$/cab'})":
+                       tornado[campo_tornado]["semielasticidade"][:, i] * (1 if percentual else 0.01)
+                       for i in indices_tornado},
+                }, hide_index=True)
+                st.caption("Elasticidade (%): variação percentual do indicador, relativa ao valor base em módulo; "
+                           "fica vazia onde o base é zero. Nas colunas em p.p. ou R$/cab, a variação absoluta, "
+                           "que não depende do valor base.")
+
+        # e) Trajetórias da simulação dia a dia
+        if modo_diario:
+            st.subheader("Trajetórias Diárias")
+            trajetorias = memoria.obter(("figuras_trajetorias", chave),
+                                        lambda: graficos.congelar(graficos.figuras_trajetorias(simulacao["trajetorias"], moleculas)))
+            for coluna, (campo, figura) in zip(st.columns(len(trajetorias)), trajetorias.items()):
+                with coluna:
+                    desenhar(figura, use_container_width=True, key=f"plot_trajetoria_{campo}")
+
+# Tab 3 - Sensibilidade
+@st.fragment
+def aba_sensibilidade(entradas, custos_moleculas):
+    import graficos
+
+    # Fragmento: mudar os eixos ou a faixa reexecuta só esta aba
+    st.header("🔥 Análise de Sensibilidade", divider='rainbow')
+
+    nomes_entradas = list(calculos.ENTRADAS)
+    sens_col1, sens_col2, sens_col3 = st.columns(3)
+
+    # Eixos da varredura (faixa padrão de ±20% em torno do cenário atual)
+    with sens_col1:
+        eixo_x = st.selectbox("Eixo X", nomes_entradas, index=nomes_entradas.index("valor_venda_arroba"),
+                              format_func=calculos.ENTRADAS.get, key="sens_eixo_x")
+        min_x = st.number_input("Mínimo X", value=float(entradas[eixo_x]) * 0.8, key=f"sens_min_x_{eixo_x}")
+        max_x = st.number_input("Máximo X", value=float(entradas[eixo_x]) * 1.2, key=f"sens_max_x_{eixo_x}")
+    with sens_col2:
+        eixo_y = st.selectbox("Eixo Y", nomes_entradas, index=nomes_entradas.index("gmd"),
+                              format_func=calculos.ENTRADAS.get, key="sens_eixo_y")
+        min_y = st.number_input("Mínimo Y", value=float(entradas[eixo_y]) * 0.8, key=f"sens_min_y_{eixo_y}")
+        max_y = st.number_input("Máximo Y", value=float(entradas[eixo_y]) * 1.2, key=f"sens_max_y_{eixo_y}")
+    with sens_col3:
+        campo_sens = st.selectbox("Indicador", list(calculos.INDICADORES),
+                                  format_func=calculos.INDICADORES.get, key="sens_campo")
+        pontos = st.number_input("Pontos por eixo", min_value=10, max_value=500, value=200, step=10, key="sens_pontos")
+
+    if eixo_x == eixo_y:
+        st.warning("Escolha entradas diferentes para os eixos X e Y.")
+    else:
+        # Incrementos da referência são sempre zero, então ela é omitida
+        exibidas = list(enumerate(moleculas))[1 if campo_sens in calculos.CAMPOS_INCREMENTAIS else 0:]
+        if not exibidas:
+            st.info("Selecione ao menos uma molécula para comparar com a referência.")
+
+        def construir_figuras():
+            valores_x = np.linspace(min_x, max_x, pontos)
+            valores_y = np.linspace(min_y, max_y, pontos)
+            grade = sensibilidade.varredura(entradas, eixo_x, valores_x, eixo_y, valores_y, custos=custos_moleculas,
+                                            fatores=fatores_moleculas)
+            return graficos.congelar({
+                i: graficos.figura_sensibilidade(
+                    valores_x, valores_y, grade[campo_sens][..., i], entradas[eixo_x], entradas[eixo_y], molecula,
+                    calculos.ENTRADAS[eixo_x], calculos.ENTRADAS[eixo_y], calculos.INDICADORES[campo_sens]
                 )
-
-        fig_lucro.update_layout(
-            title='Incremento Lucro Adicional (R$/cab)',
-            yaxis_title='R$/cab',
-            showlegend=False
+                for i, molecula in exibidas
+            })
+
+        # Varredura e figuras (com a grade já reduzida) ficam no cache compartilhado
+        chave_sens = cache.chave_cenario(entradas, custos_moleculas, moleculas, eixo_x, min_x, max_x,
+                                         eixo_y, min_y, max_y, pontos, campo_sens)
+        figuras_sens = memoria.obter(("figuras_sensibilidade", chave_sens), construir_figuras)
+        for coluna, (i, molecula) in zip(st.columns(max(len(exibidas), 1)), exibidas):
+            with coluna:
+                desenhar(figuras_sens[i], use_container_width=True, key=f"plot_sensibilidade_{i}")
+
+perfilador.marco("Aba Sensibilidade")
+
+with tab3:
+    if tab3.open:
+        aba_sensibilidade(entradas, custos_moleculas)
+
+# Tab 4 - Risco (Monte Carlo)
+@st.fragment
+def aba_risco(entradas, custos_moleculas):
+    import graficos
+
+    # Fragmento: configurar distribuições e simular reexecuta só esta aba
+    st.header("🎲 Simulação de Risco", divider='rainbow')
+
+    # Distribuições das entradas incertas
+    distribuicoes = {}
+    mc_cols = st.columns(3)
+    for coluna, nome in zip(mc_cols, ["gmd", "rendimento_carcaca", "valor_venda_arroba"]):
+        with coluna:
+            distribuicao = configurar_distribuicao(nome, entradas[nome])
+            if distribuicao is not None:
+                distribuicoes[nome] = distribuicao
+
+    mc_col1, mc_col2, mc_col3 = st.columns(3)
+    with mc_col1:
+        n_sorteios = st.number_input("Número de sorteios", min_value=1000, value=100_000, step=10_000, key="mc_n_sorteios")
+    with mc_col2:
+        semente = st.number_input("Semente", min_value=0, value=42, step=1, key="mc_semente")
+    with mc_col3:
+        simular = st.button("Simular", key="mc_simular", use_container_width=True)
+
+    # Os resultados ficam na sessão e valem enquanto os parâmetros não mudarem
+    parametros_mc = repr((entradas, moleculas, custos_moleculas, distribuicoes, n_sorteios, semente))
+    if simular:
+        # Blocos divididos entre processos; se o usuário mexer em algo no meio, o Streamlit
+        # interrompe o script na próxima atualização da barra e os blocos pendentes são cancelados
+        barra = st.progress(0.0, text="Simulando...")
+        simulacao = monte_carlo.simular(
+            entradas, distribuicoes, n_sorteios=n_sorteios, semente=semente, custos=custos_moleculas,
+            fatores=fatores_moleculas, processos=paralelo.PROCESSOS_PADRAO,
+            progresso=lambda feitos, total: barra.progress(feitos / total, text=f"Simulando... bloco {feitos} de {total}")
         )
-        
-        st.plotly_chart(fig_lucro, use_container_width=True, key="plot_incremento_lucro_adicional")
-
-    # c) Custo x Receita Adicional
-    with col2:
-        fig_custoReceita = go.Figure()
-
-        receitas = [0]  # Molécula 1 é referência
-        custos = [0]    # Molécula 1 é referência
-        for molecula in moleculas[1:]:
-            receitas.append(resultados[molecula]['receita_adicional'])
-            custos.append(resultados[molecula]['custo_adicional'])
-
-        # Calcula as variações percentuais (Mol 3 em relação à Mol 2)
-        var_receita = ((receitas[2] / receitas[1]) - 1) * 100 if receitas[1] != 0 else 0
-        var_custo = ((custos[2] / custos[1]) - 1) * 100 if custos[1] != 0 else 0
-
-        # Barra para Receita Adicional
-        fig_custoReceita.add_trace(go.Bar(
-            x=moleculas,
-            y=receitas,
-            name='Receita Adicional',
-            text=[
-                "",  # Mol 1
-                f"R$ {abs(receitas[1]):.2f}",  # Mol 2
-                f"R$ {abs(receitas[2]):.2f}<br>({var_receita:.1f}%)"  # Mol 3 com variação
-            ],
-            textposition='inside',
-            textfont=dict(size=14, color='white'),
-            insidetextanchor='middle',
-            marker_color='rgb(71, 135, 198)'  # Azul claro
+        barra.empty()
+        st.session_state["monte_carlo"] = (parametros_mc, dict(simulacao, moleculas=moleculas))
+
+    if "monte_carlo" not in st.session_state:
+        st.info("Configure as distribuições e clique em Simular.")
+    else:
+        parametros_simulados, simulacao = st.session_state["monte_carlo"]
+        if parametros_simulados != parametros_mc:
+            st.warning("Os parâmetros mudaram desde a última simulação. Clique em Simular para atualizar.")
+        moleculas_mc = simulacao["moleculas"]
+
+        st.subheader("Resultado com Ágio (R$/Cab)")
+        for i, coluna in enumerate(st.columns(len(moleculas_mc))):
+            with coluna:
+                st.markdown(f"**{moleculas_mc[i]}**")
+                for q in monte_carlo.PERCENTIS:
+                    st.metric(f"P{q}", f"R$ {simulacao['percentis'][q][i]:.2f}")
+                st.metric("Probabilidade de Prejuízo", f"{simulacao['prob_prejuizo'][i] * 100:.1f}%")
+                if i > 0:
+                    st.metric(f"Probabilidade de Superar {moleculas_mc[0]}",
+                              f"{simulacao['prob_supera_referencia'][i] * 100:.1f}%")
+
+        # Distribuição acumulada nos histogramas (tamanho fixo, independente dos sorteios);
+        # a simulação é determinística, então os parâmetros identificam a figura
+        fig_mc = memoria.obter(("figura_monte_carlo", parametros_simulados), lambda: graficos.congelar(
+            graficos.figura_distribuicao(
+                simulacao["histograma"], moleculas_mc,
+                f"Distribuição do Resultado com Ágio ({simulacao['n_sorteios']:,} sorteios)"
+            )
         ))
-
-        # Barra para Custo Adicional
-        fig_custoReceita.add_trace(go.Bar(
-            x=moleculas,
-            y=custos,
-            name='Custo Adicional',
-            text=[
-                "",  # Mol 1
-                f"R$ {abs(custos[1]):.2f}",  # Mol 2
-                f"R$ {abs(custos[2]):.2f}<br>({var_custo:.1f}%)"  # Mol 3 com variação
-            ],
-            textposition='inside',
-            textfont=dict(size=14, color='white'),
-            insidetextanchor='middle',
-            marker_color='rgb(35, 67, 98)'  # Azul escuro
+        desenhar(fig_mc, use_container_width=True, key="plot_monte_carlo")
+
+perfilador.marco("Aba Risco")
+
+with tab4:
+    if tab4.open:
+        aba_risco(entradas, custos_moleculas)
+
+# Tab 5 - Busca de meta
+@st.fragment
+def aba_meta(entradas, custos_moleculas, consumos_moleculas, precos_moleculas):
+    # Fragmento: escolher variável, indicador e alvo reexecuta só esta aba
+    st.header("🎯 Busca de Meta", divider='rainbow')
+
+    variaveis = [("precos", i) for i in range(len(moleculas))] + [("custos", i) for i in range(len(moleculas))]
+    variaveis += ["valor_venda_arroba", "gmd", "custeio"]
+    meta_col1, meta_col2, meta_col3 = st.columns(3)
+    with meta_col1:
+        variavel = st.selectbox("Variável a resolver", variaveis, index=len(moleculas) - 1,
+                                format_func=meta.rotulo_variavel, key="meta_variavel")
+    with meta_col2:
+        campo_meta = st.selectbox("Indicador", list(calculos.INDICADORES),
+                                  index=list(calculos.INDICADORES).index("incremento_lucro_adicional"),
+                                  format_func=calculos.INDICADORES.get, key="meta_campo")
+    with meta_col3:
+        alvo = st.number_input("Alvo do indicador", value=0.0, step=0.01, format="%.4f", key="meta_alvo")
+
+    atual = float(meta.valor_atual(entradas, variavel, custos_moleculas, consumos_moleculas, precos_moleculas))
+    st.caption(f"Valor atual de {meta.rotulo_variavel(variavel)}: {atual:.4f}")
+
+    # Incrementos da referência são sempre zero, então ela é omitida
+    resolvidas = list(enumerate(moleculas))[1 if campo_meta in calculos.CAMPOS_INCREMENTAIS else 0:]
+    if not resolvidas:
+        st.info("Selecione ao menos uma molécula para comparar com a referência.")
+    for coluna, (i, molecula) in zip(st.columns(max(len(resolvidas), 1)), resolvidas):
+        with coluna:
+            solucao = meta.resolver(entradas, variavel, campo_meta, alvo, molecula=i,
+                                    custos=custos_moleculas, consumos=consumos_moleculas, fatores=fatores_moleculas,
+                                    precos=precos_moleculas)
+            st.markdown(f"**{molecula}**")
+            if solucao["convergiu"]:
+                valor = float(solucao["valor"])
+                st.metric(meta.rotulo_variavel(variavel), f"{valor:.4f}", delta=f"{valor - atual:+.4f}")
+            else:
+                st.metric(meta.rotulo_variavel(variavel), "Sem solução")
+
+perfilador.marco("Aba Meta")
+
+with tab5:
+    if tab5.open:
+        aba_meta(entradas, custos_moleculas, [consumos[molecula] for molecula in moleculas],
+                 [precos[molecula] for molecula in moleculas])
+
+# Tab 6 - Peso ótimo de abate
+@st.fragment
+def aba_abate(entradas, custos_moleculas):
+    import graficos
+
+    # Fragmento: mudar o objetivo ou a faixa reexecuta só esta aba
+    st.header("⚖️ Peso Ótimo de Abate", divider='rainbow')
+
+    abate_col1, abate_col2, abate_col3, abate_col4 = st.columns(4)
+    with abate_col1:
+        objetivo = st.selectbox("Objetivo", list(abate.OBJETIVOS), index=0,
+                                format_func=abate.OBJETIVOS.get, key="abate_objetivo")
+    with abate_col2:
+        # Com GMD constante não há ótimo interior: os candidatos vão para a simulação dia a dia
+        declinio = st.number_input("Queda do GMD (% ao mês)", min_value=0.0, max_value=50.0, value=5.0, step=0.5,
+                                   key="abate_declinio")
+    with abate_col3:
+        variacao = st.number_input("Variação do ganho de peso (%)", min_value=5, max_value=90, value=30,
+                                   step=5, key="abate_variacao")
+    with abate_col4:
+        eixo = st.radio("Eixo do gráfico", ["Peso final (Kg/Cab)", "Dias de cocho"], horizontal=True, key="abate_eixo")
+
+    chave_abate = cache.chave_cenario(entradas, custos_moleculas, moleculas, objetivo, variacao, declinio)
+    otimo = memoria.obter(("abate", chave_abate), lambda: abate.otimizar(
+        entradas, objetivo, abate.candidatos(entradas, variacao / 100), custos=custos_moleculas,
+        fatores=fatores_moleculas, declinio=declinio / 100
+    ))
+    percentual = objetivo.startswith("rentabilidade")
+    formatar = (lambda v: f"{v * 100:.2f}%") if percentual else (lambda v: f"R$ {v:.2f}")
+
+    for i, coluna in enumerate(st.columns(len(moleculas))):
+        with coluna:
+            st.markdown(f"**{moleculas[i]}**")
+            if otimo["no_limite"][i]:
+                # Ponto no extremo da faixa: não é um ótimo, e a diferença para o peso atual só mede a faixa
+                st.metric("Melhor Peso na Faixa (Kg/Cab)", f"{otimo['peso_final'][i]:.1f}")
+                st.metric("Dias de Cocho", f"{otimo['dias'][i]:.0f}")
+                st.metric(abate.OBJETIVOS[objetivo], formatar(otimo["valor"][i]))
+                continue
+            st.metric("Peso Final Ótimo (Kg/Cab)", f"{otimo['peso_final'][i]:.1f}")
+            st.metric("Dias de Cocho", f"{otimo['dias'][i]:.0f}")
+            ganho = f"{otimo['perda'][i] * 100:+.2f} p.p." if percentual else f"R$ {otimo['perda'][i]:+.2f}"
+            st.metric(abate.OBJETIVOS[objetivo], formatar(otimo["valor"][i]), delta=f"{ganho} sobre o peso atual")
+    if otimo["no_limite"].any():
+        st.warning("Sem ótimo na faixa pesquisada para "
+                   f"{', '.join(m for m, limite in zip(moleculas, otimo['no_limite']) if limite)}: o objetivo "
+                   "ainda melhora fora dela. Ótimos interiores aparecem com o resultado com ágio e queda do GMD.")
+
+    # Curva do objetivo e custo de sair do ótimo (x marca o ponto de saída atual)
+    def construir_figuras():
+        atual = abate.avaliar(entradas, ["peso_final", "dias"], custos_moleculas, fatores_moleculas, declinio / 100)
+        return graficos.congelar(graficos.figuras_abate(
+            otimo["curva"], otimo, atual, "peso_final" if eixo.startswith("Peso") else "dias",
+            100 if percentual else 1, moleculas, eixo, abate.OBJETIVOS[objetivo] + (" (%)" if percentual else "")
         ))
 
-        fig_custoReceita.update_layout(
-            title='Custo x Receita Adicional',
-            yaxis_title='R$/cab',
-            showlegend=True,
-            barmode='group',
-            uniformtext=dict(mode='hide', minsize=10)
+    figuras_abate = memoria.obter(("figuras_abate", chave_abate, eixo), construir_figuras)
+    curva_col1, curva_col2 = st.columns(2)
+    with curva_col1:
+        desenhar(figuras_abate["curva"], use_container_width=True, key="plot_abate_curva")
+    with curva_col2:
+        desenhar(figuras_abate["desvio"], use_container_width=True, key="plot_abate_desvio")
+
+perfilador.marco("Aba Peso de Abate")
+
+with tab6:
+    if tab6.open:
+        aba_abate(entradas, custos_moleculas)
+
+# Tab 7 - Carteira de lotes do cliente
+@st.fragment
+def aba_rebanho(entradas, custos_moleculas):
+    pd = importacoes.pandas()
+    import lotes
+    import rebanho
+
+    # Fragmento: trocar o agrupamento ou as moléculas reexecuta só esta aba
+    st.header("🐄 Rebanho", divider='rainbow')
+    arquivo = st.file_uploader("Tabela de lotes (CSV ou Parquet)", type=["csv", "parquet"], key="rebanho_arquivo")
+    st.caption(f"Uma linha por lote com o número de cabeças (coluna `{rebanho.COLUNA_CABECAS}`). Colunas com os nomes "
+               f"das entradas ({', '.join(calculos.ENTRADAS)}) substituem os valores do cenário; as demais servem "
+               "para agrupar (baia, fornecedor, raça...).")
+    if arquivo is None:
+        st.info("Envie a tabela de lotes do cliente para ver o impacto no rebanho.")
+        return
+
+    try:
+        tabela = memoria.obter(("rebanho_tabela", arquivo.file_id),
+                               lambda: pd.concat(lotes.ler_blocos(arquivo), ignore_index=True))
+    except ValueError as erro:
+        st.error(str(erro))
+        return
+
+    grupos = [coluna for coluna in tabela.columns if coluna not in calculos.ENTRADAS and coluna != rebanho.COLUNA_CABECAS]
+    rebanho_col1, rebanho_col2, rebanho_col3 = st.columns(3)
+    with rebanho_col1:
+        por = st.multiselect("Agrupar por", grupos, key="rebanho_por")
+    with rebanho_col2:
+        de = st.selectbox("Molécula atual", moleculas, index=0, key="rebanho_de")
+    with rebanho_col3:
+        para = st.selectbox("Molécula proposta", moleculas, index=len(moleculas) - 1, key="rebanho_para")
+
+    # Somas por grupo em cache; o total do rebanho sai delas, sem reavaliar os lotes
+    try:
+        somas = memoria.obter(
+            ("rebanho", arquivo.file_id, cache.chave_cenario(entradas, custos_moleculas, moleculas, por)),
+            lambda: rebanho.somar(tabela, por, entradas, custos_moleculas, moleculas, fatores_moleculas)
         )
-
-        st.plotly_chart(fig_custoReceita, use_container_width=True, key="plot_custo_receita")
-
-
-    # d) Performance: Arrobas x Custo
-    col1, col2 = st.columns(2)
-    with col1:
-        fig_performance = go.Figure()
-
-        # Preparar dados
-        arrobas_base = [7.49] * 3  # 7.49 para todas as moléculas
-        arrobas_adicionais = [0]  # Mol 1
-        for mol in moleculas[1:]:
-            arrobas_adicionais.append(resultados[mol]['arrobas_adicionais'])
-        
-        # Calcular custo da arroba adicional
-        custos_arroba = [0]  # Primeiro valor igual ao da molécula 2
-        custos_arroba.extend([
-            resultados[mol]['custo_adicional'] / resultados[mol]['arrobas_adicionais'] 
-            if resultados[mol]['arrobas_adicionais'] != 0 else 0 
-            for mol in moleculas[1:]
-        ])
-
-        # Barra para Arrobas Base
-        fig_performance.add_trace(go.Bar(
-            x=moleculas,
-            y=arrobas_base,
-            name='Arrobas Base (@/cab)',
-            text=[f"{valor:.2f}" for valor in arrobas_base],
-            textposition='inside',
-            textfont=dict(size=14, color='white'),
-            insidetextanchor='middle',
-            marker_color='rgb(71, 135, 198)'  # Azul claro
-        ))
-
-        # Barra para Arrobas Adicionais
-        fig_performance.add_trace(go.Bar(
-            x=moleculas,
-            y=arrobas_adicionais,
-            name='Arrobas Adicionais (@/cab)',
-            text=[f"{valor:.2f}" if valor > 0 else "" for valor in arrobas_adicionais],
-            textposition='inside',
-            textfont=dict(size=14, color='white'),
-            insidetextanchor='middle',
-            marker_color='rgb(35, 67, 98)'  # Azul escuro
-        ))
-
-        # Adicionar linha de custo
-        fig_performance.add_trace(go.Scatter(
-            x=moleculas,
-            y=custos_arroba,
-            name='Custo @+ (R$/@)',
-            mode='lines+markers+text',
-            line=dict(color='orange', width=2),
-            marker=dict(size=10, color='orange'),
-            text=[f"R${custo:.2f}" for custo in custos_arroba],
-            textposition='top center',
-            textfont=dict(size=14, color='black'),
-            yaxis='y2',
-            showlegend=False
-        ))
-
-        fig_performance.update_layout(
-            title='Performance',
-            yaxis_title='Arrobas (@/cab)',
-            yaxis2=dict(
-                title='Custo @+ (R$/@)',
-                overlaying='y',
-                side='right'
-            ),
-            showlegend=True,
-            barmode='stack',
-            uniformtext=dict(mode='hide', minsize=10)
+    except ValueError as erro:
+        st.error(str(erro))
+        return
+    total = rebanho.impacto(rebanho.finalizar(rebanho.reagrupar([somas])), de, para).iloc[0]
+
+    total_col1, total_col2, total_col3, total_col4 = st.columns(4)
+    with total_col1:
+        st.metric("Lotes", f"{int(total['lotes']):,}")
+    with total_col2:
+        st.metric("Cabeças", f"{total[rebanho.COLUNA_CABECAS]:,.0f}")
+    with total_col3:
+        st.metric("Impacto no Resultado (R$)", f"R$ {total['resultado']:,.2f}")
+    with total_col4:
+        st.metric("Impacto por Cabeça (R$/Cab)", f"R$ {total['resultado_por_cabeca']:,.2f}",
+                  delta=f"{total['arrobas']:+,.1f} @ no rebanho")
+
+    agregado = rebanho.finalizar(somas)
+    if por:
+        st.subheader("Impacto por grupo")
+        mostrar_tabela(rebanho.impacto(agregado, de, para, por), hide_index=True)
+    with st.expander("Totais e médias por molécula"):
+        mostrar_tabela(agregado, hide_index=True)
+
+perfilador.marco("Aba Rebanho")
+
+with tab7:
+    if tab7.open:
+        aba_rebanho(entradas, custos_moleculas)
+
+# Tab 8 - Backtest com a série histórica da arroba
+@st.fragment
+def aba_historico(entradas, custos_moleculas):
+    importacoes.pandas()
+    import graficos
+    import historico
+
+    # Fragmento: enviar outra série reexecuta só esta aba
+    st.header("📅 Histórico de Preços", divider='rainbow')
+    arquivo = st.file_uploader("Série de preços (CSV ou Parquet)", type=["csv", "parquet"], key="historico_arquivo")
+    st.caption(f"Colunas `{historico.COLUNA_DATA}` e `{historico.COLUNA_ARROBA}` (R$/@) e, opcionalmente, "
+               f"`{historico.COLUNA_MAGRO}` (R$/@ da reposição). Um lote do cenário atual entra em cada data e é "
+               "vendido pela arroba do dia da saída; o valor de venda da entrada de dados não é usado.")
+    if arquivo is None:
+        st.info("Envie a série histórica de preços para simular a escolha da molécula no passado.")
+        return
+
+    # O preço de venda vem da série: não entra na chave
+    cenario = {nome: valor for nome, valor in entradas.items() if nome != "valor_venda_arroba"}
+    chave_historico = ("historico", arquivo.file_id, cache.chave_cenario(cenario, custos_moleculas, moleculas))
+    try:
+        precos = memoria.obter(("historico_precos", arquivo.file_id), lambda: historico.carregar(arquivo))
+        simulacao = memoria.obter(chave_historico, lambda: historico.simular(precos, cenario, custos_moleculas,
+                                                                             fatores_moleculas))
+    except ValueError as erro:
+        st.error(str(erro))
+        return
+
+    indicadores = historico.resumo(simulacao, moleculas)
+    st.caption(f"{len(simulacao['entrada']):,} lotes com entrada de {simulacao['entrada'][0]} a "
+               f"{simulacao['entrada'][-1]} e {simulacao['dias'].max()} dias de cocho.")
+    for i, coluna in enumerate(st.columns(len(moleculas))):
+        linha = indicadores.iloc[i]
+        with coluna:
+            st.markdown(f"**{moleculas[i]}**")
+            st.metric("Margem Média (R$/Cab)", f"R$ {linha['margem_media']:,.2f}",
+                      delta=f"{linha['prejuizo'] * 100:.0f}% dos lotes com prejuízo", delta_color="off")
+            if i > 0:
+                st.metric(f"Vitórias sobre {moleculas[0]}", f"{linha['vitorias'] * 100:.1f}%",
+                          delta=f"R$ {linha['vantagem_media']:+,.2f}/cab em média")
+                st.metric("Queda Máxima da Vantagem Acumulada", f"R$ {linha['queda_maxima_vantagem']:,.2f}")
+
+    figuras_historico = memoria.obter(("figuras_historico",) + chave_historico[1:], lambda: graficos.congelar(
+        graficos.figuras_historico(simulacao, moleculas)
+    ))
+    desenhar(figuras_historico["resultado"], use_container_width=True, key="plot_historico_resultado")
+    if len(moleculas) > 1:
+        desenhar(figuras_historico["vantagem"], use_container_width=True, key="plot_historico_vantagem")
+    with st.expander("Indicadores por molécula"):
+        mostrar_tabela(indicadores, hide_index=True)
+    with st.expander("Por ano de entrada"):
+        mostrar_tabela(historico.por_ano(simulacao, moleculas), hide_index=True)
+
+perfilador.marco("Aba Histórico")
+
+with tab8:
+    if tab8.open:
+        aba_historico(entradas, custos_moleculas)
+
+perfilador.marco("Cenários salvos")
+
+# Cenários salvos (banco local, ver armazem.py)
+with st.sidebar:
+    st.header("💾 Cenários")
+    cliente = st.text_input("Cliente", key="cenario_cliente").strip()
+    nome_cenario = st.text_input("Nome do cenário", key="cenario_nome").strip()
+    if st.button("Salvar cenário", key="cenario_salvar", disabled=not cliente):
+        cenario_id = armazem_cenarios().salvar(
+            entradas, resultados, moleculas, custos_moleculas, cliente=cliente, nome=nome_cenario,
+            opcoes={"declinio_gmd": declinio_gmd} if modo_diario else None
+        )
+        st.success(f"Cenário #{cenario_id} salvo.")
+
+    salvos = {cenario["id"]: cenario for cenario in armazem_cenarios().listar(cliente or None, limite=50)}
+    if salvos:
+        escolhido = st.selectbox(
+            "Cenários salvos", list(salvos),
+            format_func=lambda i: f"#{i} {salvos[i]['nome'] or 'sem nome'} · {salvos[i]['cliente']} ({salvos[i]['data'][:10]})",
+            key="cenario_escolhido"
+        )
+        st.button("Carregar cenário", key="cenario_carregar", on_click=carregar_cenario, args=(escolhido,))
+
+    if st.toggle("Ranking de cenários", key="cenario_ranking"):
+        campo_ranking = st.selectbox("Indicador", list(calculos.INDICADORES), format_func=calculos.INDICADORES.get,
+                                     key="ranking_campo")
+        molecula_ranking = st.selectbox("Molécula", calculos.MOLECULAS, index=len(calculos.MOLECULAS) - 1,
+                                        key="ranking_molecula")
+        ranking = armazem_cenarios().ranking(campo_ranking, molecula_ranking, 50, cliente or None)
+        mostrar_tabela(
+            [
+                {"Cenário": cenario["id"], "Cliente": cenario["cliente"], "Nome": cenario["nome"],
+                 "Data": cenario["data"][:10], calculos.INDICADORES[campo_ranking]: cenario["valor"]}
+                for cenario in ranking
+            ],
+            hide_index=True
         )
 
-        st.plotly_chart(fig_performance, use_container_width=True, key="plot_performance")
+perfilador.marco("Relatórios")
+
+# Relatórios em Excel/PDF: gerados em segundo plano, a execução só acompanha o progresso
+def painel_relatorios(acompanhando):
+    fila = fila_relatorios()
+    trabalhos = [fila.estado(trabalho_id) for trabalho_id in st.session_state.get("relatorios", [])]
+    for trabalho in reversed([trabalho for trabalho in trabalhos if trabalho is not None][-5:]):
+        if trabalho["estado"] == "pronto":
+            st.download_button(f"⬇️ {trabalho['nome']}", trabalho["dados"], file_name=trabalho["nome"],
+                               mime=relatorios.FORMATOS[trabalho["formato"]][1], on_click="ignore",
+                               key=f"relatorio_{trabalho['id']}")
+        elif trabalho["estado"] == "erro":
+            st.error(f"{trabalho['nome']}: {trabalho['erro']}")
+        else:
+            st.progress(trabalho["progresso"], text=f"{trabalho['nome']}: {trabalho['mensagem']}")
+    if acompanhando and not fila.pendentes(st.session_state.get("relatorios", [])):
+        # Terminou: uma execução completa troca o acompanhamento pelos botões de download
+        st.rerun()
+
+with st.sidebar:
+    st.header("📄 Relatórios")
+    formato = st.radio("Formato", list(relatorios.FORMATOS), format_func=lambda f: relatorios.FORMATOS[f][0],
+                       horizontal=True, key="relatorio_formato")
+    escolhidos = st.multiselect("Cenários salvos no relatório", list(salvos),
+                                format_func=lambda i: f"#{i} {salvos[i]['nome'] or 'sem nome'} · {salvos[i]['cliente']}",
+                                key="relatorio_cenarios")
+    rel_col1, rel_col2 = st.columns(2)
+    with rel_col1:
+        atual = st.button("Cenário atual", key="relatorio_atual")
+    with rel_col2:
+        salvos_escolhidos = st.button("Cenários salvos", key="relatorio_salvos", disabled=not escolhidos)
+    if atual or salvos_escolhidos:
+        if atual:
+            cenarios_relatorio = [{
+                "id": None, "cliente": cliente, "nome": nome_cenario,
+                "data": datetime.datetime.now().isoformat(timespec="seconds"),
+                "entradas": entradas, "moleculas": moleculas, "custos": custos_moleculas,
+                "opcoes": {"declinio_gmd": declinio_gmd} if modo_diario else {}, "resultados": resultados,
+            }]
+        else:
+            cenarios_relatorio = [armazem_cenarios().carregar(cenario_id) for cenario_id in escolhidos]
+        st.session_state.setdefault("relatorios", []).append(fila_relatorios().enviar(cenarios_relatorio, formato))
+
+    # Com relatórios pendentes o painel se atualiza sozinho a cada segundo
+    acompanhando = fila_relatorios().pendentes(st.session_state.get("relatorios", []))
+    st.fragment(painel_relatorios, run_every=1.0 if acompanhando else None)(acompanhando)
+
+perfilador.marco("Antecipação")
+
+# Vizinhos das entradas em edição, calculados em segundo plano para o próximo clique
+if not modo_diario:
+    antecipador_vizinhos().pedir(entradas, st.session_state.get("entradas_editadas", []), custos_moleculas, moleculas,
+                                 fatores_moleculas, figuras=tab2.open)
+
+perfilador.marco("Administração")
+
+# Painel de administração (?admin=1 na URL)
+if st.query_params.get("admin") == "1":
+    with st.sidebar:
+        st.header("⚙️ Administração")
+        st.subheader("Cache de cálculos")
+        estatisticas = memoria.estatisticas()
+        st.metric("Taxa de acerto", f"{estatisticas['taxa_acerto'] * 100:.1f}%")
+        adm_col1, adm_col2 = st.columns(2)
+        with adm_col1:
+            st.metric("Acertos", estatisticas["acertos"])
+            st.metric("Entradas", f"{estatisticas['entradas']} / {estatisticas['max_entradas']}")
+        with adm_col2:
+            st.metric("Falhas", estatisticas["falhas"])
+            st.metric("Descartes", estatisticas["descartes"])
+        st.metric("Memória", f"{estatisticas['bytes'] / 2**20:.2f} / {estatisticas['limite_bytes'] / 2**20:.0f} MB")
+        if st.button("Limpar cache", key="adm_limpar_cache"):
+            memoria.limpar()
+        st.subheader("Antecipação")
+        antecipados = antecipador_vizinhos().estatisticas()
+        st.metric("Taxa de acerto", f"{antecipados['taxa_acerto'] * 100:.1f}%")
+        ant_col1, ant_col2 = st.columns(2)
+        with ant_col1:
+            st.metric("Acertos", antecipados["acertos"])
+            st.metric("Calculados", antecipados["calculados"])
+        with ant_col2:
+            st.metric("Falhas", antecipados["falhas"])
+            st.metric("Descartados", antecipados["descartados"])
+        if antecipados["erros"]:
+            st.warning(f"{antecipados['erros']} pedido(s) com erro; último: {antecipados['ultimo_erro']}")
+
+# Perfil da execução
+if perfilador.ativo:
+    secoes = perfilador.finalizar()
+    st.session_state["perfil_historico"] = perfil.registrar(st.session_state.get("perfil_historico"), secoes)
+    historico = st.session_state["perfil_historico"]
+
+    with st.sidebar.expander("⏱️ Perfil da execução"):
+        mostrar_tabela(
+            [
+                {"Seção": nome, "Tempo (ms)": segundos * 1000, "Elementos": elementos, "Widgets": widgets, "Bytes": bytes_}
+                for nome, segundos, elementos, widgets, bytes_ in secoes
+            ],
+            hide_index=True
+        )
+        st.caption(f"Histórico da sessão ({len(historico)} execuções)")
+        mostrar_tabela(
+            [
+                {"Seção": nome, "p50 (ms)": p50, "p95 (ms)": p95}
+                for nome, (p50, p95) in perfil.percentis(historico).items()
+            ],
+            hide_index=True
+        )
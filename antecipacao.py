@@ -0,0 +1,199 @@
+"""Pré-cálculo especulativo dos vizinhos do cenário atual.
+
+Quase toda interação é um clique no ``step`` de um ``st.number_input``. Ao fim
+de cada execução, os ±k passos das entradas que o usuário está editando são
+avaliados numa thread de fundo, numa única chamada vetorizada do motor, e
+guardados no cache compartilhado com as mesmas chaves que o app usa
+(``("resultados", chave)`` e, com a aba de resultados aberta,
+``("figuras", chave)``). O clique seguinte encontra o cenário pronto.
+
+Configuração por variáveis de ambiente:
+
+* ``ALAVANCAGEM_ANTECIPACAO``: passos por lado (padrão 2; 0 desliga);
+* ``ALAVANCAGEM_ANTECIPACAO_MAX``: teto de cenários por pedido (padrão 16);
+* ``ALAVANCAGEM_ANTECIPACAO_CARGA``: carga por CPU acima da qual os pedidos
+  são descartados (padrão 0.75); eles também são descartados enquanto houver
+  mais de ``ALAVANCAGEM_ANTECIPACAO_EXECUCOES`` execuções de script em curso.
+
+Só o pedido mais recente espera na fila: um pedido novo substitui o anterior,
+cujo cenário o usuário já deixou para trás.
+"""
+
+import os
+import threading
+
+import numpy as np
+
+import cache
+import calculos
+
+PASSOS_PADRAO = int(os.environ.get("ALAVANCAGEM_ANTECIPACAO", 2))
+MAX_CENARIOS_PADRAO = int(os.environ.get("ALAVANCAGEM_ANTECIPACAO_MAX", 16))
+CARGA_MAXIMA_PADRAO = float(os.environ.get("ALAVANCAGEM_ANTECIPACAO_CARGA", 0.75))
+MAX_EXECUCOES_PADRAO = int(os.environ.get("ALAVANCAGEM_ANTECIPACAO_EXECUCOES", 1))
+
+# Passo de cada entrada na interface (o ``step`` do number_input)
+PASSOS = {
+    "pv_inicial": 1,
+    "pv_final": 1,
+    "gmd": 0.001,
+    "rendimento_carcaca": 0.01,
+    "consumo_pv_percentual": 0.01,
+    "custeio": 0.01,
+    "valor_venda_arroba": 0.1,
+    "agio_percentual": 0.1,
+}
+
+# Chaves antecipadas lembradas para medir acertos
+MAX_LEMBRADAS = 4096
+
+
+def editadas(anteriores, entradas):
+    """Entradas cujo valor mudou desde a execução anterior."""
+    if anteriores is None:
+        return []
+    return [nome for nome in entradas if anteriores.get(nome) != entradas[nome]]
+
+
+def vizinhos(entradas, nomes, passos=PASSOS_PADRAO, max_cenarios=MAX_CENARIOS_PADRAO):
+    """Cenários a ±1..``passos`` passos de cada entrada de ``nomes`` (os mais próximos primeiro)."""
+    cenarios = []
+    for distancia in range(1, passos + 1):
+        for nome in nomes:
+            passo = PASSOS[nome]
+            # Arredonda como o widget: o valor seguinte a 1.551 é 1.552, não 1.5519999999999998
+            casas = max(0, -int(np.floor(np.log10(passo))))
+            for sinal in (1, -1):
+                valor = round(entradas[nome] + sinal * distancia * passo, casas)
+                if valor >= 0:
+                    cenarios.append(dict(entradas, **{nome: type(entradas[nome])(valor)}))
+    return cenarios[:max_cenarios]
+
+
+def _execucoes_em_curso():
+    # Threads de execução de script do Streamlit ainda vivas
+    return sum(1 for thread in threading.enumerate() if thread.name.startswith("ScriptRunner.scriptThread"))
+
+
+class Antecipador:
+    """Calcula em segundo plano os vizinhos do cenário atual e os guarda no cache."""
+
+    def __init__(self, memoria, passos=PASSOS_PADRAO, max_cenarios=MAX_CENARIOS_PADRAO,
+                 carga_maxima=CARGA_MAXIMA_PADRAO, max_execucoes=MAX_EXECUCOES_PADRAO):
+        self.memoria = memoria
+        self.passos = passos
+        self.max_cenarios = max_cenarios
+        self.carga_maxima = carga_maxima
+        self.max_execucoes = max_execucoes
+        self._condicao = threading.Condition()
+        self._pendente = None
+        self._thread = None
+        self._antecipadas = {}
+        self.pedidos = 0
+        self.calculados = 0
+        self.descartados = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.erros = 0
+        self.ultimo_erro = None
+
+    @property
+    def ativo(self):
+        return self.passos > 0 and self.max_cenarios > 0
+
+    def sobrecarregado(self):
+        """Se há execuções de script em curso demais ou a carga da máquina passou do limite."""
+        if _execucoes_em_curso() > self.max_execucoes:
+            return True
+        if hasattr(os, "getloadavg"):
+            return os.getloadavg()[0] / (os.cpu_count() or 1) > self.carga_maxima
+        return False
+
+    def registrar(self, chave):
+        """Conta o cenário novo ``chave`` como acerto (foi antecipado) ou falha."""
+        with self._condicao:
+            if self._antecipadas.pop(chave, False) and ("resultados", chave) in self.memoria:
+                self.acertos += 1
+            else:
+                self.falhas += 1
+
+    def pedir(self, entradas, nomes, custos, moleculas, fatores=None, figuras=False):
+        """Enfileira os vizinhos de ``entradas`` nas entradas ``nomes`` (não bloqueia)."""
+        if not self.ativo or not nomes:
+            return
+        if figuras:
+            # Importado na thread de quem pede, com o sys.path do app
+            import graficos
+        pedido = (dict(entradas), list(nomes), list(custos), list(moleculas), fatores, figuras)
+        with self._condicao:
+            if self._pendente is not None:
+                self.descartados += 1
+            self._pendente = pedido
+            self.pedidos += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._trabalhar, name="antecipacao", daemon=True)
+                self._thread.start()
+            self._condicao.notify()
+
+    def _trabalhar(self):
+        while True:
+            with self._condicao:
+                while self._pendente is None:
+                    self._condicao.wait()
+                pedido, self._pendente = self._pendente, None
+            if self.sobrecarregado():
+                with self._condicao:
+                    self.descartados += 1
+                continue
+            try:
+                self._calcular(*pedido)
+            except Exception as erro:
+                # Um pedido que falha não pode parar a thread: os seguintes seguem na fila
+                with self._condicao:
+                    self.erros += 1
+                    self.ultimo_erro = repr(erro)
+
+    def _calcular(self, entradas, nomes, custos, moleculas, fatores, figuras):
+        chaves, cenarios = [], []
+        for cenario in vizinhos(entradas, nomes, self.passos, self.max_cenarios):
+            chave = cache.chave_cenario(cenario, custos, moleculas)
+            if ("resultados", chave) not in self.memoria or (figuras and ("figuras", chave) not in self.memoria):
+                chaves.append(chave)
+                cenarios.append(cenario)
+        if not cenarios:
+            return
+
+        # Todos os vizinhos numa chamada só: um eixo de cenários
+        colunas = {nome: np.array([cenario[nome] for cenario in cenarios], dtype=float) for nome in calculos.ENTRADAS}
+        saida = calculos.calcular(**colunas, custos=custos, fatores=fatores)
+        for j, chave in enumerate(chaves):
+            resultados = calculos.resultados_por_molecula({campo: valores[j] for campo, valores in saida.items()},
+                                                          moleculas)
+            self.memoria.guardar(("resultados", chave), resultados)
+            if figuras:
+                import graficos
+
+                figuras_cenario = graficos.congelar(graficos.figuras_comparativas(resultados, moleculas))
+                for figura in figuras_cenario.values():
+                    # Já deixa pronto o dicionário que o Streamlit serializa a cada exibição
+                    figura.to_dict()
+                self.memoria.guardar(("figuras", chave), figuras_cenario)
+            with self._condicao:
+                self._antecipadas[chave] = True
+                while len(self._antecipadas) > MAX_LEMBRADAS:
+                    del self._antecipadas[next(iter(self._antecipadas))]
+                self.calculados += 1
+
+    def estatisticas(self):
+        with self._condicao:
+            consultas = self.acertos + self.falhas
+            return {
+                "pedidos": self.pedidos,
+                "calculados": self.calculados,
+                "descartados": self.descartados,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "erros": self.erros,
+                "ultimo_erro": self.ultimo_erro,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            }
@@ -0,0 +1,359 @@
+"""API HTTP (JSON) da calculadora, para outros sistemas (ERP, CRM...).
+
+Uso::
+
+    python api.py --porta 8600
+
+Rotas:
+
+- ``POST /calcular``: um cenário, ``{"entradas": {...}, "moleculas": [...], "custos": [...], "campos": [...]}``
+- ``POST /lote``: vários cenários, ``{"cenarios": [{...}, ...], "moleculas": ..., "custos": ..., "campos": ...}``
+- ``POST /varredura``: grade de sensibilidade, ``{"entradas": {...}, "eixo_x": ..., "valores_x": [...],
+  "eixo_y": ..., "valores_y": [...], ...}`` (sem valores, ±20% do cenário em ``pontos`` passos)
+- ``GET /catalogo``: moléculas e valores padrão
+- ``GET /saude``: estatísticas do cache e do agrupamento
+
+Entradas ausentes assumem ``calculos.ENTRADAS_PADRAO``. ``moleculas`` escolhe
+produtos do catálogo (a referência vem sempre primeiro), ``custos`` traz um
+valor (R$/cab/dia) por molécula escolhida e ``campos`` limita a resposta
+(padrão: todos). A resposta tem ``moleculas`` e ``resultados`` (campo -> lista
+por molécula, com os eixos dos cenários antes); valores não finitos viram
+``null`` e pedidos inválidos recebem 400 com ``{"erro": ...}``.
+
+Os pedidos de ``/calcular`` que chegam juntos são agrupados num único cálculo
+vetorizado, e as respostas de ``/calcular`` e ``/varredura`` ficam num cache
+LRU com as chaves normalizadas do app. O teste de carga está em ``carga_api.py``.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+import cache
+import calculos
+import catalogo
+import sensibilidade
+
+# Pedidos de /calcular avaliados num mesmo cálculo
+MAX_LOTE = 1024
+# Cenários por pedido de /lote e pontos por grade de /varredura
+MAX_CENARIOS = 200_000
+# Subcatálogos (combinações de moléculas) guardados entre pedidos
+MAX_SUBCATALOGOS = 256
+
+
+def _json(dados, status=200):
+    return Response(json.dumps(dados, separators=(",", ":")).encode(), status, media_type="application/json")
+
+
+def _lista(valores):
+    # Arrays -> listas aninhadas, com null no lugar de NaN/inf
+    valores = np.asarray(valores, dtype=float)
+    if np.isfinite(valores).all():
+        return valores.tolist()
+    return np.where(np.isfinite(valores), valores, None).tolist()
+
+
+def _numero(valor, nome):
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise ValueError(f"{nome} deve ser numérico")
+    return float(valor)
+
+
+def ler_entradas(dados):
+    """Entradas de um cenário (padrões para as ausentes); ``ValueError`` se inválidas."""
+    if not isinstance(dados, dict):
+        raise ValueError("entradas deve ser um objeto")
+    desconhecidas = [nome for nome in dados if nome not in calculos.ENTRADAS]
+    if desconhecidas:
+        raise ValueError(f"Entradas desconhecidas: {', '.join(desconhecidas)}")
+    return {nome: _numero(dados.get(nome, padrao), nome) for nome, padrao in calculos.ENTRADAS_PADRAO.items()}
+
+
+# Subcatálogos já montados, por tupla de nomes (LRU: cada combinação pedida criaria uma entrada)
+_PRODUTOS = cache.CacheLRU(max_entradas=MAX_SUBCATALOGOS)
+
+
+def _montar_produtos(nomes):
+    produtos = catalogo.selecionar(calculos.CATALOGO, list(nomes))
+    return tuple(produtos["nome"]), produtos["custo"], catalogo.fatores(produtos)
+
+
+def _produtos(nomes):
+    return _PRODUTOS.obter(nomes, lambda: _montar_produtos(nomes))
+
+
+def ler_opcoes(corpo):
+    """Moléculas, custos e campos de um pedido: ``(nomes, custos, fatores, campos)``."""
+    nomes = corpo.get("moleculas", calculos.MOLECULAS)
+    if not isinstance(nomes, list) or not all(isinstance(nome, str) for nome in nomes):
+        raise ValueError("moleculas deve ser uma lista de nomes")
+    nomes, custos, fatores = _produtos(tuple(nomes))
+
+    if "custos" in corpo:
+        if not isinstance(corpo["custos"], list) or len(corpo["custos"]) != len(nomes):
+            raise ValueError(f"custos deve ter um valor por molécula ({len(nomes)})")
+        custos = np.array([_numero(custo, "custos") for custo in corpo["custos"]])
+
+    campos = corpo.get("campos", calculos.CAMPOS)
+    if not isinstance(campos, list) or not campos:
+        raise ValueError("campos deve ser uma lista não vazia")
+    desconhecidos = [campo for campo in campos if campo not in calculos.CAMPOS]
+    if desconhecidos:
+        raise ValueError(f"Campos desconhecidos: {', '.join(map(str, desconhecidos))}")
+    return nomes, custos, fatores, list(campos)
+
+
+def _calcular_grupo(pedidos, fatores):
+    # Um cálculo para todos os pedidos (mesmas moléculas); devolve o corpo de cada resposta
+    valores = {nome: np.array([pedido["entradas"][nome] for pedido in pedidos]) for nome in calculos.ENTRADAS}
+    valores["custos"] = np.stack([pedido["custos"] for pedido in pedidos])
+    campos = list(dict.fromkeys(campo for pedido in pedidos for campo in pedido["campos"]))
+    saida = calculos.avaliar({**valores, **fatores}, campos)
+    linhas = {campo: _lista(saida[campo]) for campo in campos}
+
+    corpos = []
+    for i, pedido in enumerate(pedidos):
+        resposta = {"moleculas": pedido["moleculas"], "resultados": {campo: linhas[campo][i] for campo in pedido["campos"]}}
+        corpos.append(json.dumps(resposta, separators=(",", ":")).encode())
+    return corpos
+
+
+class Agrupador:
+    """Junta os pedidos de um cenário que chegam juntos num único cálculo vetorizado.
+
+    Não há espera fixa: o primeiro pedido é calculado assim que o motor fica
+    livre, e os que chegam enquanto isso formam o próximo lote (até
+    ``max_lote``). Pedidos idênticos em andamento compartilham o resultado.
+    """
+
+    def __init__(self, max_lote=MAX_LOTE):
+        self.max_lote = max_lote
+        self.fila = None
+        self.tarefa = None
+        self.em_andamento = {}
+        self.lotes = 0
+        self.pedidos = 0
+
+    def iniciar(self):
+        self.fila = asyncio.Queue()
+        self.tarefa = asyncio.create_task(self._executar())
+
+    async def parar(self):
+        self.tarefa.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self.tarefa
+
+    async def calcular(self, chave, pedido):
+        """Corpo JSON da resposta de ``pedido`` (entradas, custos, moléculas, fatores e campos)."""
+        futuro = self.em_andamento.get(chave)
+        if futuro is None:
+            futuro = asyncio.get_running_loop().create_future()
+            self.em_andamento[chave] = futuro
+            futuro.add_done_callback(lambda _: self.em_andamento.pop(chave, None))
+            self.fila.put_nowait(dict(pedido, futuro=futuro))
+        return await asyncio.shield(futuro)
+
+    async def _executar(self):
+        while True:
+            pedidos = [await self.fila.get()]
+            while len(pedidos) < self.max_lote and not self.fila.empty():
+                pedidos.append(self.fila.get_nowait())
+            self.lotes += 1
+            self.pedidos += len(pedidos)
+
+            grupos = {}
+            for pedido in pedidos:
+                grupos.setdefault(pedido["moleculas"], []).append(pedido)
+            for grupo in grupos.values():
+                # No próprio laço: um lote leva ~1 ms, menos que a troca para uma thread
+                try:
+                    corpos = _calcular_grupo(grupo, grupo[0]["fatores"])
+                except Exception as erro:
+                    corpos = [erro] * len(grupo)
+                for pedido, corpo in zip(grupo, corpos):
+                    if pedido["futuro"].done():
+                        continue
+                    if isinstance(corpo, Exception):
+                        pedido["futuro"].set_exception(corpo)
+                    else:
+                        pedido["futuro"].set_result(corpo)
+
+    def estatisticas(self):
+        return {
+            "lotes": self.lotes,
+            "pedidos": self.pedidos,
+            "pedidos_por_lote": self.pedidos / self.lotes if self.lotes else 0.0,
+            "na_fila": self.fila.qsize() if self.fila is not None else 0,
+        }
+
+
+respostas = cache.CacheLRU()
+agrupador = Agrupador()
+
+
+async def _corpo(request):
+    try:
+        corpo = json.loads(await request.body())
+    except ValueError:
+        raise ValueError("Corpo do pedido não é JSON válido") from None
+    if not isinstance(corpo, dict):
+        raise ValueError("O corpo do pedido deve ser um objeto JSON")
+    return corpo
+
+
+def _tratar_erros(rota):
+    # Erros de validação (ValueError) viram 400 com a mensagem
+    async def tratar(request):
+        try:
+            return await rota(request)
+        except ValueError as erro:
+            return _json({"erro": str(erro)}, 400)
+    return tratar
+
+
+async def rota_calcular(request):
+    corpo = await _corpo(request)
+    entradas = ler_entradas(corpo.get("entradas", {}))
+    nomes, custos, fatores, campos = ler_opcoes(corpo)
+    # Nomes e campos já são strings: só entradas e custos passam pela normalização
+    chave = ("calcular", nomes, tuple(campos)) + cache.chave_cenario(entradas, custos)
+    resposta = respostas.buscar(chave)
+    if resposta is None:
+        pedido = {"entradas": entradas, "custos": custos, "moleculas": nomes, "fatores": fatores, "campos": campos}
+        resposta = await agrupador.calcular(chave, pedido)
+        respostas.guardar(chave, resposta, len(resposta))
+    return Response(resposta, media_type="application/json")
+
+
+def _calcular_lote(cenarios, custos, fatores, nomes, campos):
+    valores = {
+        nome: np.array([_numero(cenario.get(nome, padrao), nome) for cenario in cenarios])
+        for nome, padrao in calculos.ENTRADAS_PADRAO.items()
+    }
+    saida = calculos.avaliar({**valores, "custos": custos, **fatores}, campos)
+    return json.dumps({"moleculas": nomes, "resultados": {campo: _lista(saida[campo]) for campo in campos}},
+                      separators=(",", ":")).encode()
+
+
+async def rota_lote(request):
+    corpo = await _corpo(request)
+    cenarios = corpo.get("cenarios")
+    if not isinstance(cenarios, list) or not cenarios or not all(isinstance(c, dict) for c in cenarios):
+        raise ValueError("cenarios deve ser uma lista não vazia de objetos")
+    if len(cenarios) > MAX_CENARIOS:
+        raise ValueError(f"No máximo {MAX_CENARIOS} cenários por pedido")
+    desconhecidas = {nome for cenario in cenarios for nome in cenario} - set(calculos.ENTRADAS)
+    if desconhecidas:
+        raise ValueError(f"Entradas desconhecidas: {', '.join(sorted(desconhecidas))}")
+    nomes, custos, fatores, campos = ler_opcoes(corpo)
+    resposta = await asyncio.to_thread(_calcular_lote, cenarios, custos, fatores, nomes, campos)
+    return Response(resposta, media_type="application/json")
+
+
+def _tamanho_eixo(corpo, eixo, pontos):
+    valores = corpo.get(f"valores_{eixo}")
+    return len(valores) if isinstance(valores, list) else pontos
+
+
+def _valores_eixo(corpo, eixo, entradas, pontos):
+    chave = f"valores_{eixo}"
+    if chave not in corpo:
+        return sensibilidade.faixa(entradas[corpo[f"eixo_{eixo}"]], pontos=pontos)
+    if not isinstance(corpo[chave], list) or not corpo[chave]:
+        raise ValueError(f"{chave} deve ser uma lista não vazia")
+    return np.array([_numero(valor, chave) for valor in corpo[chave]])
+
+
+def _calcular_varredura(entradas, eixo_x, valores_x, eixo_y, valores_y, custos, fatores, nomes, campos):
+    grade = sensibilidade.varredura(entradas, eixo_x, valores_x, eixo_y, valores_y, custos, fatores)
+    return json.dumps({
+        "moleculas": nomes,
+        "eixo_x": eixo_x, "valores_x": _lista(valores_x),
+        "eixo_y": eixo_y, "valores_y": _lista(valores_y),
+        "resultados": {campo: _lista(grade[campo]) for campo in campos},
+    }, separators=(",", ":")).encode()
+
+
+async def rota_varredura(request):
+    corpo = await _corpo(request)
+    entradas = ler_entradas(corpo.get("entradas", {}))
+    for eixo in ("eixo_x", "eixo_y"):
+        if corpo.get(eixo) not in calculos.ENTRADAS:
+            raise ValueError(f"{eixo} deve ser uma das entradas: {', '.join(calculos.ENTRADAS)}")
+    pontos = _numero(corpo.get("pontos", 50), "pontos")
+    if not 2 <= pontos <= MAX_CENARIOS:
+        raise ValueError(f"pontos deve estar entre 2 e {MAX_CENARIOS}")
+    pontos = int(pontos)
+    # Tamanho conferido antes de montar os eixos
+    if _tamanho_eixo(corpo, "x", pontos) * _tamanho_eixo(corpo, "y", pontos) > MAX_CENARIOS:
+        raise ValueError(f"A grade deve ter no máximo {MAX_CENARIOS} pontos")
+    valores_x = _valores_eixo(corpo, "x", entradas, pontos)
+    valores_y = _valores_eixo(corpo, "y", entradas, pontos)
+    nomes, custos, fatores, campos = ler_opcoes(corpo)
+
+    chave = ("varredura", corpo["eixo_x"], corpo["eixo_y"], nomes, tuple(campos)) + cache.chave_cenario(
+        entradas, custos, valores_x, valores_y)
+    resposta = respostas.buscar(chave)
+    if resposta is None:
+        resposta = await asyncio.to_thread(_calcular_varredura, entradas, corpo["eixo_x"], valores_x,
+                                           corpo["eixo_y"], valores_y, custos, fatores, nomes, campos)
+        respostas.guardar(chave, resposta, len(resposta))
+    return Response(resposta, media_type="application/json")
+
+
+async def rota_catalogo(request):
+    produtos = calculos.CATALOGO
+    return _json({
+        "moleculas": [
+            {"nome": nome, **{coluna: float(produtos[coluna][i]) for coluna in catalogo.COLUNAS_NUMERICAS}}
+            for i, nome in enumerate(produtos["nome"])
+        ],
+        "entradas": calculos.ENTRADAS,
+        "entradas_padrao": calculos.ENTRADAS_PADRAO,
+        "campos": calculos.CAMPOS,
+    })
+
+
+async def rota_saude(request):
+    return _json({"status": "ok", "cache": respostas.estatisticas(), "agrupador": agrupador.estatisticas()})
+
+
+@contextlib.asynccontextmanager
+async def _ciclo_de_vida(app):
+    agrupador.iniciar()
+    yield
+    await agrupador.parar()
+
+
+app = Starlette(
+    routes=[
+        Route("/calcular", _tratar_erros(rota_calcular), methods=["POST"]),
+        Route("/lote", _tratar_erros(rota_lote), methods=["POST"]),
+        Route("/varredura", _tratar_erros(rota_varredura), methods=["POST"]),
+        Route("/catalogo", rota_catalogo),
+        Route("/saude", rota_saude),
+    ],
+    lifespan=_ciclo_de_vida,
+)
+
+
+def main(argv=None):
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="API HTTP (JSON) da calculadora de alavancagem.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8600)
+    args = parser.parse_args(argv)
+    # Sem log de acesso: a cada pedido ele custa mais que o próprio cálculo
+    uvicorn.run(app, host=args.host, port=args.porta, log_level="warning", access_log=False)
+
+
+if __name__ == "__main__":
+    main()
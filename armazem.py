@@ -0,0 +1,380 @@
+"""Armazém local de cenários (SQLite): salvar, listar, recarregar e comparar.
+
+Cada cenário guarda o conjunto completo de entradas, as moléculas, os custos
+e os resultados de todos os campos por molécula. Há índices por cliente e
+data e por molécula e indicador principal (``calculos.INDICADORES``), de
+forma que listagens e rankings (por exemplo, os 50 maiores
+``incremento_lucro_adicional`` de uma molécula) leem só as linhas pedidas.
+
+Uso::
+
+    python armazem.py importar lotes.csv --cliente "Fazenda Boa Vista"
+    python armazem.py ranking incremento_lucro_adicional "FOSBOVI CONF. PRIME 5.0" --limite 50
+    python armazem.py exportar cenarios.parquet --cliente "Fazenda Boa Vista"
+
+O arquivo padrão é ``cenarios.db``, ao lado deste módulo, ou o indicado na
+variável de ambiente ``ALAVANCAGEM_CENARIOS``. Importações e exportações são
+feitas em blocos, com uma transação por bloco.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+import calculos
+
+ARQUIVO_PADRAO = os.environ.get(
+    "ALAVANCAGEM_CENARIOS", os.path.join(os.path.dirname(os.path.abspath(__file__)), "cenarios.db")
+)
+
+ORDENS = {"desc": "DESC", "asc": "ASC"}
+
+_ESQUEMA = [
+    f"""CREATE TABLE IF NOT EXISTS cenarios (
+        id INTEGER PRIMARY KEY,
+        cliente TEXT NOT NULL DEFAULT '',
+        nome TEXT NOT NULL DEFAULT '',
+        data TEXT NOT NULL,
+        {", ".join(f"{nome} REAL NOT NULL" for nome in calculos.ENTRADAS)},
+        moleculas TEXT NOT NULL,
+        custos TEXT NOT NULL,
+        opcoes TEXT NOT NULL DEFAULT '{{}}'
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS resultados (
+        cenario INTEGER NOT NULL REFERENCES cenarios(id) ON DELETE CASCADE,
+        posicao INTEGER NOT NULL,
+        molecula TEXT NOT NULL,
+        {", ".join(f"{campo} REAL" for campo in calculos.CAMPOS)},
+        PRIMARY KEY (cenario, posicao)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS cenarios_cliente_data ON cenarios (cliente, data)",
+    "CREATE INDEX IF NOT EXISTS cenarios_data ON cenarios (data)",
+    *(f"CREATE INDEX IF NOT EXISTS resultados_{campo} ON resultados (molecula, {campo})"
+      for campo in calculos.INDICADORES),
+]
+
+
+def _agora():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+
+def _real(valor):
+    # NaN/inf viram NULL (o SQLite não guarda valores não finitos de forma portável)
+    valor = float(valor)
+    return valor if np.isfinite(valor) else None
+
+
+def _validar_campo(campo):
+    if campo not in calculos.CAMPOS:
+        raise ValueError(f"Campo desconhecido: {campo}")
+
+
+class Armazem:
+    """Conexão com o banco de cenários, segura para uso entre threads (uma por sessão no Streamlit)."""
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho or ARQUIVO_PADRAO
+        self._conexao = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+        self._conexao.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL: leituras de outros processos não esperam as gravações
+            self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            # Cache de 64 MB: as gravações em bloco atualizam os índices dos indicadores em páginas aleatórias
+            self._conexao.execute("PRAGMA cache_size=-65536")
+            self._conexao.execute("PRAGMA foreign_keys=ON")
+            for comando in _ESQUEMA:
+                self._conexao.execute(comando)
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
+
+    def _gravar(self, cenarios, resultados):
+        # Uma transação para o bloco inteiro; ids atribuídos em sequência
+        colunas = ["cliente", "nome", "data", *calculos.ENTRADAS, "moleculas", "custos", "opcoes"]
+        with self._lock:
+            self._conexao.execute("BEGIN")
+            try:
+                ids = []
+                comando = f"INSERT INTO cenarios ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+                for cenario in cenarios:
+                    ids.append(self._conexao.execute(comando, [cenario[coluna] for coluna in colunas]).lastrowid)
+                self._conexao.executemany(
+                    f"INSERT INTO resultados (cenario, posicao, molecula, {', '.join(calculos.CAMPOS)}) "
+                    f"VALUES ({', '.join('?' * (len(calculos.CAMPOS) + 3))})",
+                    ((ids[i], *linha) for i, linha in resultados),
+                )
+                self._conexao.execute("COMMIT")
+            except BaseException:
+                self._conexao.execute("ROLLBACK")
+                raise
+        return ids
+
+    def salvar(self, entradas, resultados=None, moleculas=calculos.MOLECULAS, custos=calculos.CUSTOS_PADRAO,
+               fatores=None, cliente="", nome="", data=None, opcoes=None):
+        """Salva um cenário e retorna o seu ``id``.
+
+        ``resultados`` segue ``calculos.resultados_por_molecula`` (molécula ->
+        campo -> valor); se ausente, é calculado. ``opcoes`` guarda ajustes
+        da interface que não são entradas do motor (por exemplo, a simulação
+        dia a dia).
+        """
+        entradas = {nome_entrada: float(entradas[nome_entrada]) for nome_entrada in calculos.ENTRADAS}
+        if resultados is None:
+            saida = calculos.calcular(**entradas, custos=custos, fatores=fatores)
+            resultados = calculos.resultados_por_molecula(saida, moleculas)
+        cenario = {
+            "cliente": cliente, "nome": nome, "data": data or _agora(), **entradas,
+            "moleculas": json.dumps(list(moleculas), ensure_ascii=False),
+            "custos": json.dumps([float(custo) for custo in custos]),
+            "opcoes": json.dumps(opcoes or {}, ensure_ascii=False),
+        }
+        linhas = [
+            (0, (posicao, molecula, *(_real(resultados[molecula][campo]) for campo in calculos.CAMPOS)))
+            for posicao, molecula in enumerate(moleculas)
+        ]
+        return self._gravar([cenario], linhas)[0]
+
+    def salvar_tabela(self, tabela, moleculas=calculos.MOLECULAS, custos=calculos.CUSTOS_PADRAO, fatores=None,
+                      cliente="", data=None):
+        """Calcula e salva todos os cenários de um DataFrame (uma linha por cenário) numa transação.
+
+        As colunas de ``calculos.ENTRADAS`` substituem os valores padrão;
+        ``cliente``, ``nome`` e ``data``, se existirem, valem por linha.
+        Retorna os ids, na ordem das linhas.
+        """
+        import lotes
+
+        n, n_moleculas = len(tabela), len(moleculas)
+        entradas = {nome: np.broadcast_to(valor, n) for nome, valor in lotes.entradas_da_tabela(tabela).items()}
+        saida = calculos.calcular(**entradas, custos=custos, fatores=fatores)
+        data = data or _agora()
+        por_linha = {
+            coluna: tabela[coluna].astype(str).tolist() if coluna in tabela.columns else [padrao] * n
+            for coluna, padrao in [("cliente", cliente), ("nome", ""), ("data", data)]
+        }
+        fixas = {
+            "moleculas": json.dumps(list(moleculas), ensure_ascii=False),
+            "custos": json.dumps([float(custo) for custo in custos]),
+            "opcoes": "{}",
+        }
+        cenarios = [
+            {**{coluna: valores[i] for coluna, valores in por_linha.items()},
+             **{nome: float(valores[i]) for nome, valores in entradas.items()}, **fixas}
+            for i in range(n)
+        ]
+        # Valores por (lote, molécula); o SQLite grava NaN como NULL
+        valores = np.stack([np.broadcast_to(saida[campo], (n, n_moleculas)) for campo in calculos.CAMPOS], axis=-1)
+        valores = np.where(np.isfinite(valores), valores, np.nan).tolist()
+        linhas = [
+            (i, (posicao, molecula, *valores[i][posicao]))
+            for i in range(n) for posicao, molecula in enumerate(moleculas)
+        ]
+        return self._gravar(cenarios, linhas)
+
+    def _cenario(self, linha):
+        cenario = {coluna: linha[coluna] for coluna in ["id", "cliente", "nome", "data"]}
+        cenario["entradas"] = {nome: linha[nome] for nome in calculos.ENTRADAS}
+        cenario["moleculas"] = json.loads(linha["moleculas"])
+        cenario["custos"] = json.loads(linha["custos"])
+        cenario["opcoes"] = json.loads(linha["opcoes"])
+        return cenario
+
+    def listar(self, cliente=None, desde=None, ate=None, limite=100):
+        """Cenários mais recentes (sem resultados), filtrados por cliente e intervalo de datas ISO."""
+        condicoes, parametros = [], []
+        for condicao, valor in [("cliente = ?", cliente), ("data >= ?", desde), ("data <= ?", ate)]:
+            if valor is not None:
+                condicoes.append(condicao)
+                parametros.append(valor)
+        onde = f"WHERE {' AND '.join(condicoes)}" if condicoes else ""
+        with self._lock:
+            linhas = self._conexao.execute(
+                f"SELECT * FROM cenarios {onde} ORDER BY data DESC, id DESC LIMIT ?", [*parametros, int(limite)]
+            ).fetchall()
+        return [self._cenario(linha) for linha in linhas]
+
+    def clientes(self):
+        """Clientes com cenários salvos, em ordem alfabética."""
+        with self._lock:
+            return [linha[0] for linha in self._conexao.execute("SELECT DISTINCT cliente FROM cenarios ORDER BY cliente")]
+
+    def carregar(self, cenario_id):
+        """Cenário completo, com ``resultados`` no formato de ``calculos.resultados_por_molecula``."""
+        with self._lock:
+            linha = self._conexao.execute("SELECT * FROM cenarios WHERE id = ?", [cenario_id]).fetchone()
+            resultados = self._conexao.execute(
+                "SELECT * FROM resultados WHERE cenario = ? ORDER BY posicao", [cenario_id]).fetchall()
+        if linha is None:
+            raise ValueError(f"Cenário não encontrado: {cenario_id}")
+        cenario = self._cenario(linha)
+        cenario["resultados"] = {
+            resultado["molecula"]: {
+                campo: np.nan if resultado[campo] is None else resultado[campo] for campo in calculos.CAMPOS
+            }
+            for resultado in resultados
+        }
+        return cenario
+
+    def comparar(self, ids, campos=tuple(calculos.INDICADORES)):
+        """``campos`` de vários cenários lado a lado: ``id -> molécula -> campo -> valor``."""
+        for campo in campos:
+            _validar_campo(campo)
+        ids = [int(cenario_id) for cenario_id in ids]
+        with self._lock:
+            linhas = self._conexao.execute(
+                f"SELECT cenario, molecula, {', '.join(campos)} FROM resultados "
+                f"WHERE cenario IN ({', '.join('?' * len(ids))}) ORDER BY cenario, posicao", ids
+            ).fetchall()
+        comparacao = {cenario_id: {} for cenario_id in ids}
+        for linha in linhas:
+            comparacao[linha["cenario"]][linha["molecula"]] = {
+                campo: np.nan if linha[campo] is None else linha[campo] for campo in campos
+            }
+        return comparacao
+
+    def ranking(self, campo, molecula, limite=50, cliente=None, ordem="desc"):
+        """Os ``limite`` cenários com maior (ou menor, ``ordem="asc"``) ``campo`` para ``molecula``.
+
+        Com ``campo`` em ``calculos.INDICADORES`` a consulta percorre só o
+        índice ``(molecula, campo)``. Valores indefinidos (NULL) ficam de fora.
+        """
+        _validar_campo(campo)
+        if ordem not in ORDENS:
+            raise ValueError(f"Ordem desconhecida: {ordem}")
+        condicoes, parametros = ["r.molecula = ?", f"r.{campo} IS NOT NULL"], [molecula]
+        if cliente is not None:
+            condicoes.append("c.cliente = ?")
+            parametros.append(cliente)
+        with self._lock:
+            linhas = self._conexao.execute(
+                f"SELECT c.*, r.{campo} AS valor FROM resultados r JOIN cenarios c ON c.id = r.cenario "
+                f"WHERE {' AND '.join(condicoes)} ORDER BY r.{campo} {ORDENS[ordem]} LIMIT ?",
+                [*parametros, int(limite)],
+            ).fetchall()
+        return [{**self._cenario(linha), "valor": linha["valor"]} for linha in linhas]
+
+    def excluir(self, cenario_id):
+        with self._lock:
+            self._conexao.execute("DELETE FROM cenarios WHERE id = ?", [cenario_id])
+
+    def contar(self):
+        with self._lock:
+            return self._conexao.execute("SELECT COUNT(*) FROM cenarios").fetchone()[0]
+
+    def exportar(self, caminho, cliente=None, tamanho_bloco=100_000):
+        """Grava cenários e resultados (uma linha por cenário e molécula) em CSV ou Parquet.
+
+        O arquivo pode ser importado de volta (``importar_arquivo``). Lê em blocos de ``tamanho_bloco`` cenários, em ordem de ``id``; retorna o número de cenários.
+        """
+        import pandas as pd
+
+        import lotes
+
+        colunas = ["id", "cliente", "nome", "data", *calculos.ENTRADAS]
+        filtro, parametros = ("AND c.cliente = ?", [cliente]) if cliente is not None else ("", [])
+        escritor = lotes.EscritorBlocos(caminho)
+        ultimo, total = 0, 0
+        try:
+            while True:
+                with self._lock:
+                    ids = [linha[0] for linha in self._conexao.execute(
+                        f"SELECT id FROM cenarios c WHERE id > ? {filtro} ORDER BY id LIMIT ?",
+                        [ultimo, *parametros, int(tamanho_bloco)])]
+                    if not ids:
+                        break
+                    linhas = self._conexao.execute(
+                        f"SELECT {', '.join('c.' + coluna for coluna in colunas)}, r.molecula, "
+                        f"{', '.join('r.' + campo for campo in calculos.CAMPOS)} "
+                        "FROM cenarios c JOIN resultados r ON r.cenario = c.id "
+                        "WHERE c.id BETWEEN ? AND ? " + filtro + " ORDER BY c.id, r.posicao",
+                        [ids[0], ids[-1], *parametros]).fetchall()
+                # Campos homônimos de entradas (gmd, custeio) saem com o nome do nó do motor
+                tabela = pd.DataFrame([tuple(linha) for linha in linhas], columns=[
+                    *colunas, "molecula", *(calculos.NO_DO_CAMPO.get(campo, campo) for campo in calculos.CAMPOS)])
+                tabela["molecula"] = tabela["molecula"].astype("category")
+                escritor.gravar(tabela)
+                ultimo, total = ids[-1], total + len(ids)
+        finally:
+            escritor.fechar()
+        return total
+
+
+def importar_arquivo(armazem, caminho, cliente="", tamanho_bloco=20_000, moleculas=calculos.MOLECULAS,
+                     custos=calculos.CUSTOS_PADRAO, fatores=None):
+    """Calcula e salva os cenários de um arquivo de lotes (ver ``lotes.py``), um bloco por transação.
+
+    Arquivos de ``Armazem.exportar`` (uma linha por molécula) entram com uma
+    linha por cenário, a da referência. Retorna ``(n_cenarios, segundos)``.
+    """
+    import lotes
+
+    inicio = time.perf_counter()
+    n = 0
+    for bloco in lotes.ler_blocos(caminho, tamanho_bloco):
+        if "molecula" in bloco.columns:
+            bloco = bloco[bloco["molecula"].astype(str) == moleculas[0]]
+        armazem.salvar_tabela(bloco, moleculas, custos, fatores, cliente)
+        n += len(bloco)
+    return n, time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Armazém local de cenários da calculadora (SQLite).")
+    parser.add_argument("--banco", default=ARQUIVO_PADRAO, help="arquivo SQLite (padrão: ALAVANCAGEM_CENARIOS)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    importar = comandos.add_parser("importar", help="calcula e salva os lotes de um arquivo CSV ou Parquet")
+    importar.add_argument("entrada")
+    importar.add_argument("--cliente", default="", help="cliente das linhas sem a coluna cliente")
+    importar.add_argument("--tamanho-bloco", type=int, default=20_000, help="cenários por transação")
+
+    exportar = comandos.add_parser("exportar", help="grava cenários e resultados em CSV ou Parquet")
+    exportar.add_argument("saida")
+    exportar.add_argument("--cliente")
+
+    listar = comandos.add_parser("listar", help="cenários mais recentes")
+    listar.add_argument("--cliente")
+    listar.add_argument("--limite", type=int, default=20)
+
+    ranking = comandos.add_parser("ranking", help="melhores cenários por indicador e molécula")
+    ranking.add_argument("campo", choices=calculos.CAMPOS)
+    ranking.add_argument("molecula")
+    ranking.add_argument("--limite", type=int, default=50)
+    ranking.add_argument("--cliente")
+    ranking.add_argument("--ordem", choices=list(ORDENS), default="desc")
+    args = parser.parse_args(argv)
+
+    armazem = Armazem(args.banco)
+    inicio = time.perf_counter()
+    try:
+        if args.comando == "importar":
+            n, segundos = importar_arquivo(armazem, args.entrada, args.cliente, args.tamanho_bloco)
+            print(f"{n} cenários importados em {segundos:.2f} s ({n / max(segundos, 1e-9):,.0f} cenários/s)",
+                  file=sys.stderr)
+        elif args.comando == "exportar":
+            n = armazem.exportar(args.saida, args.cliente)
+            print(f"{n} cenários exportados em {time.perf_counter() - inicio:.2f} s", file=sys.stderr)
+        elif args.comando == "listar":
+            for cenario in armazem.listar(args.cliente, limite=args.limite):
+                print(f"{cenario['id']}\t{cenario['data']}\t{cenario['cliente']}\t{cenario['nome']}")
+        else:
+            linhas = armazem.ranking(args.campo, args.molecula, args.limite, args.cliente, args.ordem)
+            for posicao, cenario in enumerate(linhas, 1):
+                print(f"{posicao}\t{cenario['valor']:.4f}\t{cenario['id']}\t{cenario['cliente']}\t{cenario['nome']}")
+            print(f"{len(linhas)} cenários em {(time.perf_counter() - inicio) * 1000:.1f} ms", file=sys.stderr)
+    finally:
+        armazem.fechar()
+
+
+if __name__ == "__main__":
+    main()
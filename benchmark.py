@@ -0,0 +1,329 @@
+"""Benchmarks da calculadora.
+
+Mede (a) o tempo de reexecução do ``alavancagem.py`` com o harness de testes
+do Streamlit, para o cenário padrão e sequências típicas de edição, (b) o
+motor de cálculo para 1, 10^3 e 10^6 cenários, além da simulação dia a dia
+de 10^4 lotes, (c) a construção dos três gráficos da aba de resultados e
+(d) a partida a frio (``--secoes inicializacao``): importações e primeira
+execução do app num processo novo, (e) consultas às superfícies de resposta
+contra o motor exato (``--secoes superficies``), (f) a agregação de carteiras
+de lotes por grupo (``--secoes rebanho``) e (g) o backtest com uma série diária
+de preços de 20 anos (``--secoes historico``). O resultado é gravado em JSON::
+
+    python benchmark.py --saida bench.json
+    python benchmark.py --saida novo.json --comparar bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import calculos
+import diario
+import graficos
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(DIRETORIO, "alavancagem.py")
+
+# Sequências típicas de edição: (chave ou rótulo do widget, valor); "aba" troca de aba
+SEQUENCIAS = {
+    "preco_arroba": [("valor_venda_arroba_1", 340.0 + 0.1 * i) for i in range(1, 11)],
+    "gmd": [("GMD (kg/dia)", 1.551 + 0.001 * i) for i in range(1, 11)],
+    "preco_molecula": [("preco_tabela_FOSBOVI CONF. PRIME 5.0", 8.68 + 0.1 * i) for i in range(1, 11)],
+    "troca_abas": [("aba", aba) for aba in ["📊 Resultados", "📝 Entrada de Dados"] * 3],
+}
+
+
+def _estatisticas(tempos):
+    tempos = np.asarray(tempos)
+    return {
+        "n": int(tempos.size),
+        "mediana_ms": float(np.median(tempos) * 1000),
+        "minimo_ms": float(tempos.min() * 1000),
+        "p95_ms": float(np.percentile(tempos, 95) * 1000),
+    }
+
+
+def _cronometrar(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def _cenarios(n, semente=0):
+    rng = np.random.default_rng(semente)
+    return {
+        "pv_inicial": rng.uniform(300, 450, n),
+        "pv_final": rng.uniform(480, 620, n),
+        "gmd": rng.uniform(1.0, 2.0, n),
+        "rendimento_carcaca": rng.uniform(52, 57, n),
+        "consumo_pv_percentual": rng.uniform(2.0, 2.6, n),
+        "custeio": rng.uniform(12, 18, n),
+        "valor_venda_arroba": rng.uniform(250, 400, n),
+        "agio_percentual": rng.uniform(0, 10, n),
+    }
+
+
+def bench_calculo(repeticoes=5):
+    resultados = {}
+    for n in (1, 10**3, 10**6):
+        cenarios = _cenarios(n)
+        calculos.calcular(**cenarios)  # aquecimento
+        vezes = repeticoes if n > 1 else repeticoes * 200
+        estatisticas = _estatisticas(_cronometrar(lambda: calculos.calcular(**cenarios), vezes))
+        estatisticas["cenarios_por_s"] = n / (estatisticas["mediana_ms"] / 1000)
+        resultados[str(n)] = estatisticas
+
+    # Simulação dia a dia de um rebanho de 10^4 lotes com GMD declinante
+    cenarios = _cenarios(10**4)
+    estatisticas = _estatisticas(_cronometrar(
+        lambda: diario.simular(**cenarios, declinio=0.05, trajetorias=False), repeticoes
+    ))
+    estatisticas["cenarios_por_s"] = 10**4 / (estatisticas["mediana_ms"] / 1000)
+    resultados["diario_10000"] = estatisticas
+    return resultados
+
+
+def bench_superficies(repeticoes=5):
+    import tempfile
+
+    import superficies
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        superficie = superficies.construir(diretorio, processos=1)
+        resultados = {}
+        for n in (1, 10**5):
+            cenarios = {nome: valores for nome, valores in _cenarios(n).items() if nome in superficies.EIXOS}
+            vezes = repeticoes if n > 1 else repeticoes * 200
+            exatas = {**calculos.ENTRADAS_PADRAO, **cenarios, "custos": calculos.CUSTOS_PADRAO}
+            for nome, funcao in [
+                ("interpolado", lambda: superficie.consultar(cenarios)),
+                ("exato", lambda: calculos.avaliar(exatas, superficies.CAMPOS)),
+            ]:
+                funcao()  # aquecimento (páginas do memmap no cache)
+                estatisticas = _estatisticas(_cronometrar(funcao, vezes))
+                estatisticas["cenarios_por_s"] = n / (estatisticas["mediana_ms"] / 1000)
+                resultados[f"{nome}_{n}"] = estatisticas
+        del superficie
+    return resultados
+
+
+def bench_rebanho(repeticoes=5):
+    import pandas as pd
+
+    import rebanho
+
+    resultados = {}
+    for n in (10**3, 5 * 10**4):
+        rng = np.random.default_rng(0)
+        tabela = pd.DataFrame({
+            **{nome: valores for nome, valores in _cenarios(n).items() if nome in ("pv_inicial", "pv_final", "gmd")},
+            "cabecas": rng.integers(20, 200, n),
+            "baia": rng.integers(0, 200, n),
+            "fornecedor": rng.choice(["A", "B", "C", "D"], n),
+        })
+        for nome, por in [("total", ()), ("baia_fornecedor", ("baia", "fornecedor"))]:
+            estatisticas = _estatisticas(_cronometrar(lambda: rebanho.agregar(tabela, por), repeticoes))
+            estatisticas["lotes_por_s"] = n / (estatisticas["mediana_ms"] / 1000)
+            resultados[f"{nome}_{n}"] = estatisticas
+    return resultados
+
+
+def bench_historico(repeticoes=5):
+    import historico
+
+    # Série diária sintética de 20 anos (passeio aleatório em torno de R$ 300/@)
+    rng = np.random.default_rng(0)
+    n = 20 * 365
+    arroba = 300 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    precos = historico.serie(np.datetime64("2005-01-01") + np.arange(n), arroba, arroba * 1.05)
+    estatisticas = _estatisticas(_cronometrar(lambda: historico.simular(precos), repeticoes))
+    estatisticas["datas_por_s"] = n / (estatisticas["mediana_ms"] / 1000)
+    return {"simular_20_anos": estatisticas}
+
+
+def bench_graficos(repeticoes=50):
+    resultados = calculos.resultados_por_molecula(calculos.calcular(**calculos.ENTRADAS_PADRAO))
+    moleculas = calculos.MOLECULAS
+    construtores = {
+        "incremento_lucro": graficos.figura_incremento_lucro,
+        "custo_receita": graficos.figura_custo_receita,
+        "performance": graficos.figura_performance,
+    }
+    saida = {}
+    for nome, construtor in construtores.items():
+        saida[nome] = _estatisticas(_cronometrar(lambda: construtor(resultados, moleculas), repeticoes))
+        saida[nome + "_json"] = _estatisticas(
+            _cronometrar(lambda: construtor(resultados, moleculas).to_json(), repeticoes)
+        )
+    return saida
+
+
+def _aplicar(app, alvo, valor):
+    if alvo == "aba":
+        app.session_state["aba"] = valor
+        return
+    for widget in app.number_input:
+        if widget.key == alvo or widget.label == alvo:
+            widget.set_value(valor)
+            return
+    raise KeyError(f"Widget não encontrado: {alvo}")
+
+
+def bench_reexecucao(repeticoes=5):
+    import streamlit as st
+    from streamlit.testing.v1 import AppTest
+
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    resultados = {}
+
+    # Primeira execução (cache vazio) e reexecuções sem mudança
+    frias, quentes = [], []
+    for _ in range(repeticoes):
+        st.cache_resource.clear()
+        app = AppTest.from_file(SCRIPT, default_timeout=120)
+        inicio = time.perf_counter()
+        app.run()
+        frias.append(time.perf_counter() - inicio)
+        if app.exception:
+            raise RuntimeError(app.exception)
+        quentes.extend(_cronometrar(app.run, 3))
+    resultados["padrao_primeira_execucao"] = _estatisticas(frias)
+    resultados["padrao_reexecucao"] = _estatisticas(quentes)
+
+    # Sequências de edição, partindo de uma sessão nova com cache vazio
+    for nome, passos in SEQUENCIAS.items():
+        st.cache_resource.clear()
+        app = AppTest.from_file(SCRIPT, default_timeout=120)
+        app.run()
+        tempos = []
+        for alvo, valor in passos:
+            _aplicar(app, alvo, valor)
+            inicio = time.perf_counter()
+            app.run()
+            tempos.append(time.perf_counter() - inicio)
+            if app.exception:
+                raise RuntimeError(app.exception)
+        resultados["edicao_" + nome] = _estatisticas(tempos)
+    return resultados
+
+
+# Roda num interpretador novo: importações e primeira execução do app a frio
+_INICIALIZACAO = """
+import json, logging, sys, time
+inicio = time.perf_counter()
+import streamlit
+streamlit_s = time.perf_counter() - inicio
+inicio = time.perf_counter()
+import calculos, estilo, meta, abate, sensibilidade, monte_carlo, paralelo, diario, catalogo
+modulos_s = time.perf_counter() - inicio
+from streamlit.testing.v1 import AppTest
+logging.getLogger("streamlit").setLevel(logging.ERROR)
+app = AppTest.from_file(sys.argv[1], default_timeout=120)
+inicio = time.perf_counter()
+app.run()
+primeira_s = time.perf_counter() - inicio
+print(json.dumps({"importar_streamlit": streamlit_s, "importar_modulos": modulos_s,
+                  "primeira_execucao": primeira_s, "pandas": "pandas" in sys.modules}))
+"""
+
+
+def bench_inicializacao(repeticoes=5):
+    """Partida a frio: cada repetição é um processo novo."""
+    medidas = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, "-c", _INICIALIZACAO, SCRIPT], cwd=DIRETORIO,
+                               capture_output=True, text=True, check=True).stdout
+        medidas.append(json.loads(saida.strip().splitlines()[-1]))
+    resultados = {nome: _estatisticas([medida[nome] for medida in medidas])
+                  for nome in ["importar_streamlit", "importar_modulos", "primeira_execucao"]}
+    resultados["pandas_carregado"] = any(medida["pandas"] for medida in medidas)
+    return resultados
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=DIRETORIO,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executar(secoes, repeticoes):
+    relatorio = {
+        "commit": _commit(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "maquina": platform.machine(),
+    }
+    if "calculo" in secoes:
+        relatorio["calculo"] = bench_calculo(repeticoes)
+    if "graficos" in secoes:
+        relatorio["graficos"] = bench_graficos(repeticoes * 10)
+    if "reexecucao" in secoes:
+        relatorio["reexecucao"] = bench_reexecucao(repeticoes)
+    if "superficies" in secoes:
+        relatorio["superficies"] = bench_superficies(repeticoes)
+    if "inicializacao" in secoes:
+        relatorio["inicializacao"] = bench_inicializacao(repeticoes)
+    if "rebanho" in secoes:
+        relatorio["rebanho"] = bench_rebanho(repeticoes)
+    if "historico" in secoes:
+        relatorio["historico"] = bench_historico(repeticoes)
+    return relatorio
+
+
+def comparar(atual, anterior, tolerancia=0.10):
+    """Lista as medianas que mudaram mais que ``tolerancia`` (fração) entre dois relatórios."""
+    linhas = []
+    for secao, casos in atual.items():
+        if not isinstance(casos, dict) or not isinstance(anterior.get(secao), dict):
+            continue
+        for caso, medidas in casos.items():
+            base = anterior[secao].get(caso)
+            if not isinstance(medidas, dict) or not isinstance(base, dict) or "mediana_ms" not in base:
+                continue
+            variacao = medidas["mediana_ms"] / base["mediana_ms"] - 1
+            marca = "REGRESSÃO" if variacao > tolerancia else ("melhora" if variacao < -tolerancia else "")
+            linhas.append(f"{secao}/{caso}: {base['mediana_ms']:.3f} -> {medidas['mediana_ms']:.3f} ms "
+                          f"({variacao * 100:+.1f}%) {marca}".rstrip())
+    return linhas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks da Calculadora de Alavancagem.")
+    parser.add_argument("--saida", default="bench.json", help="arquivo JSON de saída")
+    parser.add_argument("--comparar", help="relatório JSON anterior para comparação")
+    parser.add_argument("--secoes", nargs="+", default=["calculo", "graficos", "reexecucao"],
+                        choices=["calculo", "graficos", "reexecucao", "inicializacao", "superficies", "rebanho",
+                                 "historico"])
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="variação relativa tolerada na comparação")
+    args = parser.parse_args(argv)
+
+    relatorio = executar(args.secoes, args.repeticoes)
+    with open(args.saida, "w", encoding="utf-8") as arquivo:
+        json.dump(relatorio, arquivo, indent=2, ensure_ascii=False)
+    print(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as arquivo:
+            linhas = comparar(relatorio, json.load(arquivo), args.tolerancia)
+        print("\n".join(linhas))
+        if any(linha.endswith("REGRESSÃO") for linha in linhas):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Cache LRU compartilhado entre execuções e sessões, com teto de memória.
+
+As chaves são tuplas de entradas normalizadas (ver ``chave_cenario``); os
+valores podem ser resultados do motor ou figuras já construídas. O tamanho de
+cada valor é estimado na inserção e as entradas menos usadas recentemente são
+descartadas quando o teto de bytes (ou de entradas) é ultrapassado.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Configuração por variáveis de ambiente
+LIMITE_MB_PADRAO = float(os.environ.get("ALAVANCAGEM_CACHE_MB", 64))
+MAX_ENTRADAS_PADRAO = int(os.environ.get("ALAVANCAGEM_CACHE_ENTRADAS", 4096))
+
+
+def normalizar(valor):
+    """Converte números para ``float`` com 12 dígitos significativos."""
+    if isinstance(valor, (list, tuple, np.ndarray)):
+        return tuple(normalizar(v) for v in valor)
+    if isinstance(valor, dict):
+        return tuple((chave, normalizar(valor[chave])) for chave in sorted(valor))
+    if isinstance(valor, (int, float, np.number)):
+        return float(f"{float(valor):.12g}")
+    return valor
+
+
+def chave_cenario(entradas, custos, *extras):
+    """Chave de cache de um cenário: entradas e custos normalizados."""
+    return (normalizar(entradas), normalizar(custos)) + tuple(normalizar(extra) for extra in extras)
+
+
+def estimar_tamanho(valor):
+    """Estimativa em bytes da memória ocupada por ``valor``."""
+    if isinstance(valor, np.ndarray):
+        return valor.nbytes
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(estimar_tamanho(k) + estimar_tamanho(v) for k, v in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(estimar_tamanho(v) for v in valor)
+    if hasattr(valor, "to_plotly_json"):
+        # Figuras do Plotly: o JSON serializado é uma boa aproximação
+        return len(valor.to_json())
+    return sys.getsizeof(valor)
+
+
+class CacheLRU:
+    """Cache LRU seguro para uso entre threads (uma por sessão no Streamlit)."""
+
+    def __init__(self, limite_bytes=None, max_entradas=None):
+        self.limite_bytes = int((LIMITE_MB_PADRAO * 2**20) if limite_bytes is None else limite_bytes)
+        self.max_entradas = MAX_ENTRADAS_PADRAO if max_entradas is None else max_entradas
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def __len__(self):
+        return len(self._itens)
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._itens
+
+    def buscar(self, chave, padrao=None):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+            return padrao
+
+    def guardar(self, chave, valor, tamanho=None):
+        tamanho = estimar_tamanho(valor) if tamanho is None else tamanho
+        if tamanho > self.limite_bytes:
+            return
+        with self._lock:
+            if chave in self._itens:
+                self.bytes -= self._itens.pop(chave)[1]
+            self._itens[chave] = (valor, tamanho)
+            self.bytes += tamanho
+            while self._itens and (self.bytes > self.limite_bytes or len(self._itens) > self.max_entradas):
+                _, (_, tamanho_antigo) = self._itens.popitem(last=False)
+                self.bytes -= tamanho_antigo
+                self.descartes += 1
+
+    def obter(self, chave, calcular):
+        """Retorna o valor em cache ou calcula, guarda e retorna."""
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave][0]
+            self.falhas += 1
+        # O cálculo fica fora do lock para não bloquear as outras sessões
+        valor = calcular()
+        self.guardar(chave, valor)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self.bytes = 0
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.acertos + self.falhas
+            return {
+                "entradas": len(self._itens),
+                "bytes": self.bytes,
+                "limite_bytes": self.limite_bytes,
+                "max_entradas": self.max_entradas,
+                "acertos": self.acertos,
+                "falhas": self.falhas,
+                "descartes": self.descartes,
+                "taxa_acerto": self.acertos / consultas if consultas else 0.0,
+            }
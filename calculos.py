@@ -0,0 +1,381 @@
+"""Motor de cálculo vetorizado da Calculadora de Alavancagem.
+
+Todas as funções aceitam escalares ou arrays NumPy (com broadcasting entre si)
+e devolvem arrays com um eixo extra no final, um elemento por molécula, na
+ordem de ``MOLECULAS``. A primeira molécula é a referência para os incrementos.
+
+As moléculas e seus parâmetros vêm do catálogo (``catalogo.py``). Os
+multiplicadores são entradas do grafo (``fator_gmd``, ``fator_rendimento``,
+``fator_consumo``): por padrão, os do catálogo inteiro; para avaliar outro
+conjunto de produtos, passe ``fatores`` junto com os ``custos`` dele.
+"""
+
+import numpy as np
+
+import catalogo
+import grafo
+
+# Catálogo de moléculas, lido e validado uma vez na importação (a primeira é a referência)
+CATALOGO = catalogo.carregar()
+MOLECULAS = CATALOGO["nome"]
+
+# Multiplicadores de desempenho de cada molécula em relação à referência
+FATOR_GMD = CATALOGO["fator_gmd"]
+FATOR_RENDIMENTO = CATALOGO["fator_rendimento"]
+FATOR_CONSUMO = CATALOGO["fator_consumo"]
+FATORES_PADRAO = catalogo.fatores(CATALOGO)
+
+# Valores padrão da tabela de produtos
+PRECOS_PADRAO = CATALOGO["preco"]
+CONSUMOS_PADRAO = CATALOGO["consumo"]
+CUSTOS_PADRAO = CATALOGO["custo"]
+
+# Entradas escalares de um cenário e seus rótulos na interface
+ENTRADAS = {
+    "pv_inicial": "Peso Vivo Inicial (Kg/Cab)",
+    "pv_final": "Peso Vivo Final (Kg/Cab)",
+    "gmd": "GMD (kg/dia)",
+    "rendimento_carcaca": "Rendimento de Carcaça (%)",
+    "consumo_pv_percentual": "Consumo (%PV)",
+    "custeio": "Custeio (R$/Cab/dia)",
+    "valor_venda_arroba": "Valor de Venda da arroba (R$/@)",
+    "agio_percentual": "Ágio para Animal Magro (%)",
+}
+
+# Cenário padrão da calculadora
+ENTRADAS_PADRAO = {
+    "pv_inicial": 390,
+    "pv_final": 560,
+    "gmd": 1.551,
+    "rendimento_carcaca": 54.89,
+    "consumo_pv_percentual": 2.31,
+    "custeio": 15.0,
+    "valor_venda_arroba": 340.0,
+    "agio_percentual": 5.0,
+}
+
+# Indicadores principais e seus rótulos na interface
+INDICADORES = {
+    "resultado": "Resultado (R$/Cab)",
+    "rentabilidade_mensal": "Rentabilidade Mensal",
+    "incremento_lucro_adicional": "Incremento Lucro Adicional (R$/Cab)",
+    "resultado_agio": "Resultado com Ágio (R$/Cab)",
+    "rentabilidade_mensal_agio": "Rentabilidade Mensal com Ágio",
+}
+
+# Campos físicos (não dependem de preços nem de custeio)
+CAMPOS_ZOOTECNICOS = [
+    "gmd", "rendimento", "peso_final", "dias", "consumo_pv", "consumo_ms",
+    "pv_final_arroba", "arrobas", "gdc", "eficiencia_biologica",
+]
+
+# Campos financeiros
+CAMPOS_FINANCEIROS = [
+    "custo_animal_magro", "diferencial_tecnologico", "custeio", "custeio_final",
+    "custeio_periodo", "custo_arroba", "valor_arrobas", "resultado_arrobas",
+    "resultado", "rentabilidade_periodo", "rentabilidade_mensal",
+    "resultado_agio", "rentabilidade_periodo_agio", "rentabilidade_mensal_agio",
+    "margem_diaria_agio", "arrobas_adicionais", "receita_adicional", "custo_adicional",
+    "incremento_lucro_adicional", "custo_arroba_adicional",
+    "incremento_resultado_agio_percentual",
+]
+
+CAMPOS = CAMPOS_ZOOTECNICOS + CAMPOS_FINANCEIROS
+
+# Campos relativos à referência (sempre zero para a primeira molécula)
+CAMPOS_INCREMENTAIS = [
+    "arrobas_adicionais", "receita_adicional", "custo_adicional",
+    "incremento_lucro_adicional", "custo_arroba_adicional",
+    "incremento_resultado_agio_percentual",
+]
+
+
+def _coluna(valor):
+    # Acrescenta o eixo das moléculas ao final
+    return np.asarray(valor, dtype=float)[..., np.newaxis]
+
+
+def _rentabilidade_mensal(rentabilidade_periodo, dias):
+    return ((1 + rentabilidade_periodo) ** (1 / (dias / 30.4))) - 1
+
+
+# Grafo de cálculo: cada nó declara as entradas ou nós de que depende
+GRAFO = grafo.Grafo()
+no = GRAFO.no
+
+# Nós cujo nome difere do campo de saída (para não colidir com a entrada homônima)
+NO_DO_CAMPO = {"gmd": "gmd_moleculas", "custeio": "custeio_moleculas"}
+
+
+# Desempenho de cada molécula
+
+@no("gmd_moleculas", "gmd", "fator_gmd")
+def _gmd_moleculas(gmd, fator_gmd):
+    return _coluna(gmd) * fator_gmd
+
+
+@no("rendimento", "rendimento_carcaca", "fator_rendimento")
+def _rendimento(rendimento_carcaca, fator_rendimento):
+    return _coluna(rendimento_carcaca) * fator_rendimento
+
+
+@no("consumo_pv", "consumo_pv_percentual", "fator_consumo")
+def _consumo_pv(consumo_pv_percentual, fator_consumo):
+    return _coluna(consumo_pv_percentual) / 100 * fator_consumo
+
+
+# Pesos e dias (todas as moléculas ficam o mesmo número de dias no cocho)
+
+@no("dias_referencia", "pv_inicial", "pv_final", "gmd")
+def _dias_referencia(pv_inicial, pv_final, gmd):
+    return (_coluna(pv_final) - _coluna(pv_inicial)) / _coluna(gmd)
+
+
+@no("peso_final", "pv_inicial", "pv_final", "gmd_moleculas", "dias_referencia")
+def _peso_final(pv_inicial, pv_final, gmd_moleculas, dias_referencia):
+    peso_final = _coluna(pv_inicial) + gmd_moleculas * dias_referencia
+    peso_final[..., 0] = _coluna(pv_final)[..., 0]
+    return peso_final
+
+
+@no("dias", "dias_referencia", "peso_final")
+def _dias(dias_referencia, peso_final):
+    return np.broadcast_to(dias_referencia, peso_final.shape)
+
+
+@no("consumo_ms", "consumo_pv", "pv_inicial", "peso_final")
+def _consumo_ms(consumo_pv, pv_inicial, peso_final):
+    return consumo_pv * (_coluna(pv_inicial) + peso_final) / 2
+
+
+@no("pv_final_arroba", "peso_final", "rendimento")
+def _pv_final_arroba(peso_final, rendimento):
+    return peso_final * rendimento / 100 / 15
+
+
+@no("arrobas", "pv_final_arroba", "pv_inicial")
+def _arrobas(pv_final_arroba, pv_inicial):
+    return pv_final_arroba - (_coluna(pv_inicial) / 30)
+
+
+@no("gdc", "peso_final", "rendimento", "pv_inicial", "dias")
+def _gdc(peso_final, rendimento, pv_inicial, dias):
+    return ((peso_final * rendimento / 100) - (_coluna(pv_inicial) / 2)) / dias
+
+
+@no("eficiencia_biologica", "consumo_ms", "dias", "arrobas")
+def _eficiencia_biologica(consumo_ms, dias, arrobas):
+    return (consumo_ms * dias) / arrobas
+
+
+# Custeio: proporcional ao consumo de MS da referência, mais o diferencial tecnológico
+
+@no("diferencial_tecnologico", "custos")
+def _diferencial_tecnologico(custos):
+    custos = np.asarray(custos, dtype=float)
+    return custos - custos[..., :1]
+
+
+@no("custeio_moleculas", "consumo_ms", "custeio")
+def _custeio_moleculas(consumo_ms, custeio):
+    return consumo_ms / consumo_ms[..., :1] * _coluna(custeio)
+
+
+@no("custeio_final", "custeio_moleculas", "diferencial_tecnologico")
+def _custeio_final(custeio_moleculas, diferencial_tecnologico):
+    return custeio_moleculas + diferencial_tecnologico
+
+
+@no("custeio_periodo", "custeio_final", "dias")
+def _custeio_periodo(custeio_final, dias):
+    return custeio_final * dias
+
+
+@no("custo_arroba", "custeio_periodo", "arrobas")
+def _custo_arroba(custeio_periodo, arrobas):
+    return custeio_periodo / arrobas
+
+
+# Receitas e resultados
+
+@no("custo_animal_magro", "valor_venda_arroba", "agio_percentual", "pv_inicial")
+def _custo_animal_magro(valor_venda_arroba, agio_percentual, pv_inicial):
+    return (_coluna(valor_venda_arroba) * (1 + _coluna(agio_percentual) / 100)) * (_coluna(pv_inicial) / 30)
+
+
+@no("valor_arrobas", "valor_venda_arroba", "arrobas")
+def _valor_arrobas(valor_venda_arroba, arrobas):
+    return _coluna(valor_venda_arroba) * arrobas
+
+
+@no("resultado_arrobas", "valor_arrobas", "custeio_periodo")
+def _resultado_arrobas(valor_arrobas, custeio_periodo):
+    return valor_arrobas - custeio_periodo
+
+
+@no("resultado", "valor_arrobas", "custeio_periodo", "custo_animal_magro")
+def _resultado(valor_arrobas, custeio_periodo, custo_animal_magro):
+    return valor_arrobas - custeio_periodo - custo_animal_magro
+
+
+@no("rentabilidade_periodo", "resultado", "valor_venda_arroba", "peso_final")
+def _rentabilidade_periodo(resultado, valor_venda_arroba, peso_final):
+    return resultado / (_coluna(valor_venda_arroba) * peso_final)
+
+
+@no("rentabilidade_mensal", "rentabilidade_periodo", "dias")
+def _rentabilidade_mensal_no(rentabilidade_periodo, dias):
+    return _rentabilidade_mensal(rentabilidade_periodo, dias)
+
+
+@no("resultado_agio", "pv_final_arroba", "valor_venda_arroba", "custo_animal_magro", "custeio_periodo")
+def _resultado_agio(pv_final_arroba, valor_venda_arroba, custo_animal_magro, custeio_periodo):
+    return pv_final_arroba * _coluna(valor_venda_arroba) - custo_animal_magro - custeio_periodo
+
+
+@no("rentabilidade_periodo_agio", "resultado_agio", "valor_venda_arroba", "pv_final_arroba")
+def _rentabilidade_periodo_agio(resultado_agio, valor_venda_arroba, pv_final_arroba):
+    return resultado_agio / (_coluna(valor_venda_arroba) * pv_final_arroba)
+
+
+@no("rentabilidade_mensal_agio", "rentabilidade_periodo_agio", "dias")
+def _rentabilidade_mensal_agio(rentabilidade_periodo_agio, dias):
+    return _rentabilidade_mensal(rentabilidade_periodo_agio, dias)
+
+
+@no("margem_diaria_agio", "resultado_agio", "dias")
+def _margem_diaria_agio(resultado_agio, dias):
+    # Resultado com ágio por dia de cocho (R$/cab/dia)
+    return resultado_agio / dias
+
+
+# Incrementos em relação à molécula de referência
+
+@no("arrobas_adicionais", "arrobas")
+def _arrobas_adicionais(arrobas):
+    return arrobas - arrobas[..., :1]
+
+
+@no("receita_adicional", "arrobas_adicionais", "valor_venda_arroba")
+def _receita_adicional(arrobas_adicionais, valor_venda_arroba):
+    return arrobas_adicionais * _coluna(valor_venda_arroba)
+
+
+@no("custo_adicional", "custeio_periodo", "custeio_final", "dias")
+def _custo_adicional(custeio_periodo, custeio_final, dias):
+    return custeio_periodo - custeio_final[..., :1] * dias
+
+
+@no("incremento_lucro_adicional", "resultado")
+def _incremento_lucro_adicional(resultado):
+    return resultado - resultado[..., :1]
+
+
+@no("custo_arroba_adicional", "custo_adicional", "arrobas_adicionais")
+def _custo_arroba_adicional(custo_adicional, arrobas_adicionais):
+    return np.divide(
+        custo_adicional, arrobas_adicionais,
+        out=np.zeros(np.broadcast(custo_adicional, arrobas_adicionais).shape),
+        where=arrobas_adicionais != 0,
+    )
+
+
+@no("incremento_resultado_agio_percentual", "resultado_agio")
+def _incremento_resultado_agio_percentual(resultado_agio):
+    base_agio = resultado_agio[..., :1]
+    incremento_agio = (resultado_agio / base_agio - 1) * 100
+    return np.where(base_agio < 0, -incremento_agio, incremento_agio)
+
+
+def _no(campo):
+    return NO_DO_CAMPO.get(campo, campo)
+
+
+def _saida(valores, campos):
+    # Todos os campos com a mesma forma (*cenarios, n_moleculas)
+    saida = {campo: valores[_no(campo)] for campo in campos}
+    forma = np.broadcast_shapes(*(np.shape(valor) for valor in saida.values()))
+    return {
+        campo: valor if np.shape(valor) == forma else np.broadcast_to(valor, forma)
+        for campo, valor in saida.items()
+    }
+
+
+def avaliar(valores, campos=CAMPOS):
+    """Avalia o grafo a partir de entradas (e nós já conhecidos) e devolve ``campos``.
+
+    Fatores ausentes em ``valores`` são os do catálogo padrão.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        valores = GRAFO.avaliar({**FATORES_PADRAO, **valores}, [_no(campo) for campo in campos])
+    return _saida(valores, campos)
+
+
+def calcular_zootecnico(pv_inicial, pv_final, gmd, rendimento_carcaca, consumo_pv_percentual, fatores=None):
+    """Calcula os indicadores físicos (peso, dias, arrobas, consumo) por molécula."""
+    return avaliar({
+        "pv_inicial": pv_inicial,
+        "pv_final": pv_final,
+        "gmd": gmd,
+        "rendimento_carcaca": rendimento_carcaca,
+        "consumo_pv_percentual": consumo_pv_percentual,
+        **(fatores or {}),
+    }, CAMPOS_ZOOTECNICOS)
+
+
+def calcular_financeiro(zootecnico, pv_inicial, custeio, valor_venda_arroba, agio_percentual, custos=CUSTOS_PADRAO):
+    """Calcula custeio, resultados, rentabilidades e incrementos sobre a referência."""
+    valores = {_no(campo): valor for campo, valor in zootecnico.items()}
+    valores.update({
+        "pv_inicial": pv_inicial,
+        "custeio": custeio,
+        "valor_venda_arroba": valor_venda_arroba,
+        "agio_percentual": agio_percentual,
+        "custos": custos,
+    })
+    return avaliar(valores, CAMPOS_FINANCEIROS)
+
+
+def calcular(pv_inicial, pv_final, gmd, rendimento_carcaca, consumo_pv_percentual,
+             custeio, valor_venda_arroba, agio_percentual, custos=CUSTOS_PADRAO, fatores=None):
+    """Avalia todos os cenários de uma vez.
+
+    Retorna um dicionário ``campo -> array`` com forma ``(*cenarios, n_moleculas)``.
+    ``fatores`` (ver ``catalogo.fatores``) substitui os multiplicadores do catálogo.
+    """
+    return avaliar({
+        "pv_inicial": pv_inicial,
+        "pv_final": pv_final,
+        "gmd": gmd,
+        "rendimento_carcaca": rendimento_carcaca,
+        "consumo_pv_percentual": consumo_pv_percentual,
+        "custeio": custeio,
+        "valor_venda_arroba": valor_venda_arroba,
+        "agio_percentual": agio_percentual,
+        "custos": custos,
+        **(fatores or {}),
+    })
+
+
+class AvaliadorIncremental(grafo.Avaliador):
+    """Avaliador que recalcula só os campos afetados pelas entradas alteradas."""
+
+    def __init__(self):
+        super().__init__(GRAFO)
+
+    def calcular(self, custos=CUSTOS_PADRAO, fatores=None, **entradas):
+        with np.errstate(divide="ignore", invalid="ignore"):
+            valores = self.avaliar({**FATORES_PADRAO, **(fatores or {}), **entradas, "custos": custos})
+        return _saida(valores, CAMPOS)
+
+    def campos_alterados(self):
+        """Campos de saída cujo valor mudou na última avaliação."""
+        return {campo for campo in CAMPOS if _no(campo) in self.alterados}
+
+
+def resultados_por_molecula(saida, moleculas=MOLECULAS):
+    """Converte a saída de um único cenário no dicionário ``resultados`` por molécula."""
+    return {
+        molecula: {campo: float(valores[..., i]) for campo, valores in saida.items()}
+        for i, molecula in enumerate(moleculas)
+    }
@@ -0,0 +1,148 @@
+"""Teste de carga local da API (``api.py``).
+
+Abre ``--conexoes`` conexões HTTP/1.1 persistentes e envia pedidos em sequência
+em cada uma durante ``--duracao`` segundos, com cenários sorteados; uma fração
+``--repetidos`` repete cenários de um conjunto pequeno (acertos de cache).
+Mede vazão e latências (p50, p99) e grava o resultado em JSON::
+
+    python carga_api.py --iniciar --conexoes 64 --duracao 10 --saida carga.json
+
+Com ``--iniciar`` o servidor é levantado num subprocesso; sem ele, usa o que
+estiver em ``--host``/``--porta``.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+import calculos
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _cenario(rng, repetido):
+    if repetido:
+        # Poucos cenários distintos: o mesmo pedido volta muitas vezes
+        gmd = 1.4 + 0.01 * rng.integers(0, 20)
+        return {"entradas": {"gmd": round(gmd, 2)}}
+    return {"entradas": {
+        "gmd": float(rng.uniform(1.2, 1.9)),
+        "valor_venda_arroba": float(rng.uniform(280, 380)),
+        "pv_final": float(rng.uniform(520, 600)),
+    }}
+
+
+def _pedido(host, rota, corpo):
+    corpo = json.dumps(corpo).encode()
+    cabecalho = (f"POST {rota} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(corpo)}\r\n\r\n")
+    return cabecalho.encode() + corpo
+
+
+async def _resposta(leitor):
+    # Status e corpo de uma resposta com Content-Length
+    cabecalho = await leitor.readuntil(b"\r\n\r\n")
+    linhas = cabecalho.decode("latin-1").split("\r\n")
+    status = int(linhas[0].split()[1])
+    tamanho = 0
+    for linha in linhas[1:]:
+        nome, _, valor = linha.partition(":")
+        if nome.lower() == "content-length":
+            tamanho = int(valor)
+    return status, await leitor.readexactly(tamanho)
+
+
+async def _conexao(host, porta, rota, fim, repetidos, semente, latencias, erros):
+    # Mensagens montadas antes, para o cliente gastar pouca CPU durante a carga
+    rng = np.random.default_rng(semente)
+    mensagens = [_pedido(host, rota, _cenario(rng, rng.random() < repetidos)) for _ in range(1000)]
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    try:
+        for i in itertools.count():
+            if time.perf_counter() >= fim:
+                break
+            mensagem = mensagens[i % len(mensagens)]
+            inicio = time.perf_counter()
+            escritor.write(mensagem)
+            status, _ = await _resposta(leitor)
+            latencias.append(time.perf_counter() - inicio)
+            if status != 200:
+                erros.append(status)
+    finally:
+        escritor.close()
+
+
+async def carga(host="127.0.0.1", porta=8600, rota="/calcular", conexoes=64, duracao=10.0, repetidos=0.5):
+    """Executa a carga e retorna vazão e latências."""
+    latencias, erros = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(
+        _conexao(host, porta, rota, inicio + duracao, repetidos, semente, latencias, erros)
+        for semente in range(conexoes)
+    ))
+    segundos = time.perf_counter() - inicio
+    tempos = np.asarray(latencias) * 1000
+    return {
+        "pedidos": len(latencias),
+        "erros": len(erros),
+        "segundos": segundos,
+        "pedidos_por_segundo": len(latencias) / segundos,
+        "p50_ms": float(np.percentile(tempos, 50)),
+        "p99_ms": float(np.percentile(tempos, 99)),
+        "maximo_ms": float(tempos.max()),
+    }
+
+
+def _aguardar(host, porta, limite=30.0):
+    fim = time.perf_counter() + limite
+    while time.perf_counter() < fim:
+        try:
+            socket.create_connection((host, porta), timeout=1.0).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Servidor não respondeu em {host}:{porta}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga local da API da calculadora.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8600)
+    parser.add_argument("--rota", default="/calcular")
+    parser.add_argument("--conexoes", type=int, default=64)
+    parser.add_argument("--duracao", type=float, default=10.0, help="segundos de carga")
+    parser.add_argument("--repetidos", type=float, default=0.5, help="fração de pedidos com cenários repetidos")
+    parser.add_argument("--iniciar", action="store_true", help="levanta o servidor (api.py) num subprocesso")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    args = parser.parse_args(argv)
+
+    servidor = None
+    if args.iniciar:
+        servidor = subprocess.Popen([sys.executable, os.path.join(DIRETORIO, "api.py"),
+                                     "--host", args.host, "--porta", str(args.porta)])
+    try:
+        _aguardar(args.host, args.porta)
+        resultado = asyncio.run(carga(args.host, args.porta, args.rota, args.conexoes, args.duracao, args.repetidos))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    resultado.update({"rota": args.rota, "conexoes": args.conexoes, "repetidos": args.repetidos,
+                      "moleculas": len(calculos.MOLECULAS), "cpus": os.cpu_count()})
+    print(json.dumps(resultado, indent=2))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+
+if __name__ == "__main__":
+    main()
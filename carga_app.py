@@ -0,0 +1,271 @@
+"""Teste de carga local do app Streamlit (``alavancagem.py``) com várias sessões.
+
+Cada sessão abre o websocket que o navegador abriria (``/_stcore/stream``) e
+repete um roteiro de edições típicas: cliques no preço da arroba, no GMD e no
+preço de uma molécula, alternados com trocas de aba. A cada edição o cliente
+manda os estados dos widgets e espera o fim da execução do script; esse tempo
+é a latência da execução. As sessões começam de preços da arroba diferentes,
+então não compartilham cenários no cache.
+
+Mede vazão, latências (p50, p95, p99) por ação e o consumo do processo do
+servidor lido de ``/proc`` (CPU e memória residente por sessão)::
+
+    python carga_app.py --iniciar --sessoes 8 --duracao 30 --saida carga_app.json
+
+Com ``--iniciar`` o servidor é levantado num subprocesso; sem ele, usa o que
+estiver em ``--host``/``--porta`` (e ``--pid`` para medir CPU e memória).
+Tudo roda na máquina local, sem rede externa.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.NumberInput_pb2 import NumberInput
+
+import antecipacao
+import calculos
+from carga_api import _aguardar
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+SCRIPT = os.path.join(DIRETORIO, "alavancagem.py")
+
+ABA_ENTRADA = "📝 Entrada de Dados"
+ABA_RESULTADOS = "📊 Resultados"
+
+# Roteiro de uma volta: (ação, chave do widget, passos por clique ou rótulo da aba)
+ROTEIRO = [
+    *[("preco_arroba", "valor_venda_arroba_1", 1)] * 5,
+    ("troca_aba", "aba", ABA_RESULTADOS),
+    *[("gmd", "gmd", 1)] * 5,
+    *[("preco_molecula", "preco_tabela_" + calculos.MOLECULAS[-1], 1)] * 3,
+    ("troca_aba", "aba", ABA_ENTRADA),
+]
+
+# Passo dos campos que não estão em ``antecipacao.PASSOS``
+PASSO_PRECO_MOLECULA = 0.1
+
+
+def _passo(chave):
+    if chave.startswith("preco_tabela_"):
+        return PASSO_PRECO_MOLECULA
+    for nome, passo in antecipacao.PASSOS.items():
+        if chave == nome or chave.startswith(nome + "_"):
+            return passo
+    raise ValueError(f"Passo desconhecido para o widget {chave}")
+
+
+class _Sessao:
+    """Uma aba de navegador: guarda os widgets vistos e os valores editados."""
+
+    def __init__(self, conexao, limite):
+        self.conexao = conexao
+        self.limite = limite
+        self.widgets = {}
+        self.valores = {}
+
+    def _registrar(self, mensagem):
+        # Ids (``$$ID-<hash>-<chave>``), tipo e valor padrão dos widgets com chave
+        delta = mensagem.delta
+        if delta.WhichOneof("type") == "add_block":
+            bloco = delta.add_block
+            if bloco.WhichOneof("type") == "tab_container" and bloco.tab_container.id:
+                self.widgets[bloco.tab_container.id.split("-", 2)[-1]] = (bloco.tab_container.id, "string_value", None)
+            return False
+        if delta.WhichOneof("type") != "new_element":
+            return False
+        elemento = delta.new_element
+        tipo = elemento.WhichOneof("type")
+        if tipo == "exception":
+            return True
+        if tipo == "number_input":
+            widget = elemento.number_input
+            campo = "int_value" if widget.data_type == NumberInput.INT else "double_value"
+            valor = widget.value if widget.HasField("value") else widget.default
+            self.widgets[widget.id.split("-", 2)[-1]] = (widget.id, campo, valor)
+        return False
+
+    async def executar(self):
+        """Pede uma execução com os valores atuais; retorna se terminou sem erro."""
+        mensagem = BackMsg()
+        estado = mensagem.rerun_script
+        estado.query_string = ""
+        for chave, valor in self.valores.items():
+            identificador, campo, _ = self.widgets[chave]
+            widget = estado.widget_states.widgets.add()
+            widget.id = identificador
+            setattr(widget, campo, valor)
+        await self.conexao.send(mensagem.SerializeToString())
+
+        erro = False
+        while True:
+            resposta = ForwardMsg()
+            resposta.ParseFromString(await asyncio.wait_for(self.conexao.recv(), self.limite))
+            tipo = resposta.WhichOneof("type")
+            if tipo == "delta":
+                erro = self._registrar(resposta) or erro
+            elif tipo == "script_finished":
+                if resposta.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    return False
+                # Execuções só de fragmentos (painéis com ``run_every``) não encerram o pedido
+                if resposta.script_finished == ForwardMsg.FINISHED_SUCCESSFULLY:
+                    return not erro
+
+    def editar(self, chave, passos):
+        _, _, atual = self.widgets[chave]
+        valor = round(self.valores.get(chave, atual) + passos * _passo(chave), 6)
+        self.valores[chave] = valor
+
+
+async def _sessao(url, indice, fim, pausa, limite, latencias, erros):
+    rng = np.random.default_rng(indice)
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as conexao:
+        sessao = _Sessao(conexao, limite)
+        if not await sessao.executar():
+            erros.append("abertura")
+        # Cada sessão parte de um preço da arroba próprio
+        sessao.editar("valor_venda_arroba_1", 10 * (indice + 1))
+        await sessao.executar()
+        while time.perf_counter() < fim:
+            for acao, chave, valor in ROTEIRO:
+                if time.perf_counter() >= fim:
+                    break
+                if acao == "troca_aba":
+                    sessao.valores[chave] = valor
+                else:
+                    sessao.editar(chave, valor)
+                inicio = time.perf_counter()
+                try:
+                    certo = await sessao.executar()
+                except asyncio.TimeoutError:
+                    certo = False
+                latencias.setdefault(acao, []).append(time.perf_counter() - inicio)
+                if not certo:
+                    erros.append(acao)
+                # Tempo de leitura do usuário entre um clique e outro
+                await asyncio.sleep(pausa * rng.uniform(0.5, 1.5))
+
+
+def _processo(pid):
+    """CPU acumulada (s) e memória residente (MB) do processo ``pid``."""
+    if pid is None:
+        return None
+    with open(f"/proc/{pid}/stat") as arquivo:
+        campos = arquivo.read().rsplit(")", 1)[1].split()
+    with open(f"/proc/{pid}/statm") as arquivo:
+        paginas = int(arquivo.read().split()[1])
+    cpu = (int(campos[11]) + int(campos[12])) / os.sysconf("SC_CLK_TCK")
+    return cpu, paginas * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+async def _amostrar(pid, fim, amostras, intervalo=0.5):
+    while time.perf_counter() < fim:
+        amostras.append(_processo(pid)[1])
+        await asyncio.sleep(intervalo)
+
+
+def _percentis(tempos):
+    tempos = np.asarray(tempos) * 1000
+    return {
+        "execucoes": int(tempos.size),
+        "p50_ms": float(np.percentile(tempos, 50)),
+        "p95_ms": float(np.percentile(tempos, 95)),
+        "p99_ms": float(np.percentile(tempos, 99)),
+        "maximo_ms": float(tempos.max()),
+    }
+
+
+async def carga(host="127.0.0.1", porta=8501, sessoes=8, duracao=30.0, pausa=0.5, limite=60.0, pid=None):
+    """Executa a carga e retorna vazão, latências e consumo do servidor."""
+    url = f"ws://{host}:{porta}/_stcore/stream"
+    # Uma execução antes de medir: importações e caches de recurso já prontos
+    async with websockets.connect(url, subprotocols=["streamlit"], max_size=None) as conexao:
+        await _Sessao(conexao, limite).executar()
+
+    latencias, erros, memoria = {}, [], []
+    antes = _processo(pid)
+    inicio = time.perf_counter()
+    fim = inicio + duracao
+    tarefas = [_sessao(url, indice, fim, pausa, limite, latencias, erros) for indice in range(sessoes)]
+    if pid is not None:
+        tarefas.append(_amostrar(pid, fim, memoria))
+    await asyncio.gather(*tarefas)
+    segundos = time.perf_counter() - inicio
+    depois = _processo(pid)
+
+    todas = [tempo for tempos in latencias.values() for tempo in tempos]
+    resultado = {
+        "sessoes": sessoes,
+        "execucoes": len(todas),
+        "erros": len(erros),
+        "segundos": segundos,
+        "execucoes_por_segundo": len(todas) / segundos,
+        **_percentis(todas),
+        "acoes": {acao: _percentis(tempos) for acao, tempos in sorted(latencias.items())},
+    }
+    if pid is not None:
+        cpu = depois[0] - antes[0]
+        resultado["servidor"] = {
+            "cpu_segundos": cpu,
+            "cpu_percentual": 100 * cpu / segundos,
+            "cpu_ms_por_execucao": 1000 * cpu / max(len(todas), 1),
+            "cpu_segundos_por_sessao": cpu / sessoes,
+            "memoria_inicial_mb": antes[1],
+            "memoria_pico_mb": max(memoria + [depois[1]]),
+            "memoria_por_sessao_mb": (max(memoria + [depois[1]]) - antes[1]) / sessoes,
+        }
+    return resultado
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Teste de carga local do app Streamlit com várias sessões.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=8501)
+    parser.add_argument("--sessoes", type=int, default=8, help="sessões simultâneas")
+    parser.add_argument("--duracao", type=float, default=30.0, help="segundos de carga")
+    parser.add_argument("--pausa", type=float, default=0.5, help="segundos médios entre duas edições da mesma sessão")
+    parser.add_argument("--limite", type=float, default=60.0, help="segundos de espera por uma execução")
+    parser.add_argument("--iniciar", action="store_true", help="levanta o servidor (streamlit run) num subprocesso")
+    parser.add_argument("--pid", type=int, help="processo do servidor já em execução, para medir CPU e memória")
+    parser.add_argument("--saida", help="arquivo JSON com o resultado")
+    args = parser.parse_args(argv)
+
+    servidor, pid = None, args.pid
+    temporario = tempfile.TemporaryDirectory()
+    if args.iniciar:
+        # Cenários salvos num banco descartável, para não tocar no do usuário
+        ambiente = dict(os.environ, ALAVANCAGEM_CENARIOS=os.path.join(temporario.name, "cenarios.db"))
+        servidor = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", SCRIPT, "--server.headless", "true",
+             "--server.address", args.host, "--server.port", str(args.porta),
+             "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+            env=ambiente, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        pid = servidor.pid
+    try:
+        _aguardar(args.host, args.porta)
+        resultado = asyncio.run(carga(args.host, args.porta, args.sessoes, args.duracao, args.pausa, args.limite, pid))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+        temporario.cleanup()
+
+    resultado.update({"pausa": args.pausa, "moleculas": len(calculos.MOLECULAS), "cpus": os.cpu_count()})
+    print(json.dumps(resultado, indent=2))
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Catálogo de moléculas (produtos) lido de um arquivo CSV.
+
+Cada linha é um produto. A primeira é a base: as entradas do cenário (GMD,
+rendimento, consumo, custeio) descrevem o animal com ela, seus fatores são 1
+e ela é a referência dos incrementos. Colunas obrigatórias:
+
+- ``nome``
+- ``fator_gmd``, ``fator_rendimento``, ``fator_consumo``: multiplicadores sobre a base
+- ``preco`` (R$/kg), ``consumo`` (g/cab/dia) e ``custo`` (R$/cab/dia): valores padrão da tabela
+
+Colunas extras (fabricante, observações...) são mantidas como texto. O arquivo
+padrão é ``moleculas.csv``, ao lado deste módulo, ou o indicado na variável de
+ambiente ``ALAVANCAGEM_CATALOGO``.
+"""
+
+import csv
+import os
+
+import numpy as np
+
+ARQUIVO_PADRAO = os.environ.get(
+    "ALAVANCAGEM_CATALOGO", os.path.join(os.path.dirname(os.path.abspath(__file__)), "moleculas.csv")
+)
+
+FATORES = ["fator_gmd", "fator_rendimento", "fator_consumo"]
+COLUNAS_NUMERICAS = FATORES + ["preco", "consumo", "custo"]
+
+
+def carregar(caminho=None):
+    """Lê e valida o catálogo; cada coluna numérica vira um array contíguo."""
+    caminho = caminho or ARQUIVO_PADRAO
+    with open(caminho, newline="", encoding="utf-8") as arquivo:
+        linhas = list(csv.DictReader(arquivo))
+    if not linhas:
+        raise ValueError(f"Catálogo vazio: {caminho}")
+
+    faltando = [coluna for coluna in ["nome"] + COLUNAS_NUMERICAS if coluna not in linhas[0]]
+    if faltando:
+        raise ValueError(f"Colunas ausentes no catálogo {caminho}: {', '.join(faltando)}")
+
+    catalogo = {"nome": [linha["nome"].strip() for linha in linhas]}
+    for coluna in COLUNAS_NUMERICAS:
+        try:
+            catalogo[coluna] = np.array([float(linha[coluna]) for linha in linhas])
+        except (TypeError, ValueError):
+            raise ValueError(f"Valor não numérico na coluna {coluna} do catálogo {caminho}") from None
+    for coluna in linhas[0]:
+        if coluna not in catalogo:
+            catalogo[coluna] = [(linha[coluna] or "").strip() for linha in linhas]
+
+    validar(catalogo)
+    return catalogo
+
+
+def validar(catalogo):
+    """Levanta ``ValueError`` com todos os problemas encontrados no catálogo."""
+    problemas = []
+    nomes = catalogo["nome"]
+    if any(not nome for nome in nomes):
+        problemas.append("há produto sem nome")
+    repetidos = sorted({nome for nome in nomes if nomes.count(nome) > 1})
+    if repetidos:
+        problemas.append(f"nomes repetidos: {', '.join(repetidos)}")
+    for coluna in COLUNAS_NUMERICAS:
+        valores = catalogo[coluna]
+        if not np.all(np.isfinite(valores)):
+            problemas.append(f"{coluna} tem valores não finitos")
+        elif coluna in FATORES and np.any(valores <= 0):
+            problemas.append(f"{coluna} deve ser positivo")
+        elif np.any(valores < 0):
+            problemas.append(f"{coluna} não pode ser negativo")
+    if not problemas and any(catalogo[fator][0] != 1 for fator in FATORES):
+        problemas.append(f"os fatores da base ({nomes[0]}) devem ser 1")
+    if problemas:
+        raise ValueError("Catálogo inválido: " + "; ".join(problemas))
+
+
+def selecionar(catalogo, nomes):
+    """Subcatálogo com os produtos ``nomes``, na ordem dada (a base vem sempre primeiro)."""
+    desconhecidos = [nome for nome in nomes if nome not in catalogo["nome"]]
+    if desconhecidos:
+        raise ValueError(f"Produtos fora do catálogo: {', '.join(desconhecidos)}")
+    base = catalogo["nome"][0]
+    indices = [0] + [catalogo["nome"].index(nome) for nome in nomes if nome != base]
+    return {
+        coluna: valores[indices] if isinstance(valores, np.ndarray) else [valores[i] for i in indices]
+        for coluna, valores in catalogo.items()
+    }
+
+
+def fatores(catalogo):
+    """Entradas do motor com os multiplicadores de cada produto."""
+    return {fator: catalogo[fator] for fator in FATORES}
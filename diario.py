@@ -0,0 +1,144 @@
+"""Simulação dia a dia de crescimento, consumo e custeio.
+
+O cálculo rápido de ``calculos`` supõe GMD constante e consumo de MS pelo peso
+médio do período. Aqui o GMD de cada molécula pode cair a uma taxa mensal
+(``declinio``, fração por mês), o peso é integrado no tempo e o consumo
+(%PV do peso do dia), o custeio diário e as arrobas são acumulados dia a dia.
+Os arrays têm forma ``(*lotes, dias, n_moleculas)``.
+
+Todas as moléculas saem no dia em que a referência atinge ``pv_final``. Com
+``declinio=0`` pesos, dias e consumo coincidem com o cálculo rápido; o
+custeio difere um pouco porque a proporção de consumo entre as moléculas é
+aplicada a cada dia, e não às médias do período.
+"""
+
+import numpy as np
+
+import calculos
+from calculos import _coluna
+
+DIAS_MES = 30.4
+
+
+def _taxa(declinio):
+    # Taxa contínua de queda do GMD (por dia)
+    return np.log1p(-np.asarray(declinio, dtype=float)) / DIAS_MES
+
+
+def ganho_relativo(t, declinio=0.0):
+    """Integral do fator de GMD de 0 a ``t`` dias (igual a ``t`` sem declínio)."""
+    k = _taxa(declinio)
+    t = np.asarray(t, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(k == 0, t, np.expm1(k * t) / np.where(k == 0, 1.0, k))
+
+
+def dias_ate(pv_inicial, pv_final, gmd, declinio=0.0):
+    """Dias até a referência atingir ``pv_final``; NaN se o GMD cair antes disso."""
+    k = _taxa(declinio)
+    ganho = (np.asarray(pv_final, dtype=float) - pv_inicial) / gmd
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(k == 0, ganho, np.log1p(k * ganho) / np.where(k == 0, 1.0, k))
+
+
+def peso_maximo(pv_inicial, gmd, declinio=0.0):
+    """Peso que a referência alcança com o GMD caindo sem parar (infinito sem declínio)."""
+    k = _taxa(declinio)
+    with np.errstate(divide="ignore"):
+        return np.where(k < 0, np.asarray(pv_inicial, dtype=float) - np.asarray(gmd, dtype=float) / k, np.inf)
+
+
+def verificar(pv_inicial, pv_final, gmd, declinio=0.0):
+    """``ValueError`` se algum lote não atinge ``pv_final`` antes de o GMD zerar.
+
+    ``simular`` devolve NaN nesses lotes; a interface avisa em vez de mostrar NaN.
+    """
+    dias = dias_ate(pv_inicial, pv_final, gmd, declinio)
+    if not np.all(np.isfinite(dias)):
+        maximo = np.min(peso_maximo(pv_inicial, gmd, declinio))
+        raise ValueError(f"Com essa queda do GMD o lote para de crescer em {maximo:.1f} kg e não atinge o peso "
+                         "final; reduza a queda ou o peso final")
+
+
+def simular(pv_inicial, pv_final, gmd, rendimento_carcaca, consumo_pv_percentual,
+            custeio, valor_venda_arroba, agio_percentual, custos=calculos.CUSTOS_PADRAO,
+            declinio=0.0, trajetorias=True, fatores=None):
+    """Simula os lotes dia a dia.
+
+    Retorna ``{"resumo": ..., "trajetorias": ...}``. O resumo tem os mesmos
+    campos de ``calculos.calcular``; as trajetórias trazem ``dia``
+    (``(*lotes, dias + 1)``), ``peso``, ``gmd``, ``custeio_acumulado`` e
+    ``arrobas`` por dia, e ``consumo_ms`` e ``custeio`` (final, com o
+    diferencial tecnológico) médios de cada dia.
+    """
+    entradas = {
+        "pv_inicial": pv_inicial,
+        "pv_final": pv_final,
+        "gmd": gmd,
+        "rendimento_carcaca": rendimento_carcaca,
+        "consumo_pv_percentual": consumo_pv_percentual,
+        "custeio": custeio,
+        "valor_venda_arroba": valor_venda_arroba,
+        "agio_percentual": agio_percentual,
+        "custos": custos,
+        **calculos.FATORES_PADRAO,
+        **(fatores or {}),
+    }
+    # Parâmetros diários de cada molécula vêm do mesmo grafo do cálculo rápido
+    base = calculos.GRAFO.avaliar(entradas, ["gmd_moleculas", "consumo_pv", "rendimento", "diferencial_tecnologico"])
+    gmd_moleculas, consumo_pv = base["gmd_moleculas"], base["consumo_pv"]
+
+    pv_inicial = np.asarray(pv_inicial, dtype=float)[..., np.newaxis]
+    gmd = np.asarray(gmd, dtype=float)[..., np.newaxis]
+    declinio = np.asarray(declinio, dtype=float)[..., np.newaxis]
+    dias = dias_ate(pv_inicial, np.asarray(pv_final, dtype=float)[..., np.newaxis], gmd, declinio)
+
+    # Grade diária; o último passo de cada lote é fracionário
+    n_passos = int(np.ceil(np.nanmax(dias))) if np.isfinite(dias).any() else 0
+    dia = np.minimum(np.arange(n_passos + 1), dias)
+    duracao = np.diff(dia, axis=-1)
+    ganho = ganho_relativo(dia, declinio)
+    ganho_medio = (ganho[..., 1:] + ganho[..., :-1]) / 2  # trapézio no peso de cada passo
+
+    # O peso de cada molécula é linear no ganho relativo, então as somas por
+    # passo saem de arrays (lotes, dias), sem o eixo das moléculas:
+    #   consumo  = consumo_pv * Σ (pv_inicial + gmd_m * ganho) * duração
+    #   custeio  = custeio * Σ consumo_m / consumo_ref * duração
+    soma_ganho = np.sum(ganho_medio * duracao, axis=-1, keepdims=True)
+    consumo_total = consumo_pv * (pv_inicial * dias + gmd_moleculas * soma_ganho)
+    inverso = duracao / (pv_inicial + gmd * ganho_medio)
+    soma_inverso = np.sum(inverso, axis=-1, keepdims=True)
+    soma_ganho_inverso = np.sum(ganho_medio * inverso, axis=-1, keepdims=True)
+    proporcao = consumo_pv / consumo_pv[..., :1]
+    custeio_total = _coluna(custeio) * proporcao * (pv_inicial * soma_inverso + gmd_moleculas * soma_ganho_inverso)
+
+    # O resumo reaproveita o grafo, com os nós zootécnicos já integrados
+    valores = dict(entradas, **base)
+    valores.update({
+        "dias_referencia": dias,
+        "dias": np.broadcast_to(dias, consumo_total.shape),
+        "peso_final": pv_inicial + gmd_moleculas * ganho_relativo(dias, declinio),
+        "consumo_ms": consumo_total / dias,
+        "custeio_moleculas": custeio_total / dias,
+    })
+    resultado = {"resumo": calculos.avaliar(valores)}
+
+    if trajetorias:
+        # Eixos (*lotes, dias, n_moleculas)
+        peso = pv_inicial[..., np.newaxis] + gmd_moleculas[..., np.newaxis, :] * ganho[..., np.newaxis]
+        consumo_ms = consumo_pv[..., np.newaxis, :] * (peso[..., 1:, :] + peso[..., :-1, :]) / 2
+        custeio_dia = consumo_ms / consumo_ms[..., :1] * _coluna(_coluna(custeio))
+        custeio_final = custeio_dia + base["diferencial_tecnologico"][..., np.newaxis, :]
+        custeio_acumulado = np.cumsum(custeio_final * duracao[..., np.newaxis], axis=-2)
+        zeros = np.zeros(custeio_acumulado.shape[:-2] + (1,) + custeio_acumulado.shape[-1:])
+        rendimento = base["rendimento"][..., np.newaxis, :]
+        resultado["trajetorias"] = {
+            "dia": dia,
+            "peso": peso,
+            "gmd": gmd_moleculas[..., np.newaxis, :] * np.exp(_taxa(declinio) * dia)[..., np.newaxis],
+            "consumo_ms": consumo_ms,
+            "custeio": custeio_final,
+            "custeio_acumulado": np.concatenate([zeros, custeio_acumulado], axis=-2),
+            "arrobas": peso * rendimento / 100 / 15 - pv_inicial[..., np.newaxis] / 30,
+        }
+    return resultado
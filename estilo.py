@@ -0,0 +1,86 @@
+"""CSS e trechos de HTML fixos da interface.
+
+Montados uma vez por processo, na importação, e já compactados: a cada
+reexecução o script só repassa as strings prontas ao Streamlit.
+"""
+
+import re
+
+
+def _compactar(html):
+    # Remove quebras de linha e espaços entre blocos (o navegador os ignora)
+    return re.sub(r"\s*\n\s*", " ", html).replace("> <", "><").strip()
+
+
+CSS = _compactar("""
+    <style>
+    .stApp {
+        background-color: #002A3B;
+    }
+    .main {
+        background-color: #f0f9ff;
+        border-radius: 15px;
+        padding: 20px;
+    }
+    .stTitle {
+        color: #2c5282;
+    }
+    .stHeader {
+        color: #234e52;
+    }
+    .metric-card {
+        background-color: white;
+        padding: 10px;
+        border-radius: 5px;
+        box-shadow: 0 1px 2px rgba(0,0,0,0.1);
+        margin: 5px 0;
+    }
+    .metric-value {
+        color: #2f855a;
+        font-size: 24px;
+        font-weight: bold;
+    }
+    div[data-testid="stVerticalBlock"] {
+        background-color: #f0f9ff;
+        border-radius: 15px;
+        padding: 20px;
+    }
+    .diferencial-value {
+        font-size: 20px;
+        font-weight: bold;
+        color: #464646ee;
+        text-align: left;
+    }
+    </style>
+""")
+
+CABECALHO_PRODUTOS = _compactar("""
+    <div class="produto-header">
+        <h3 style="margin:0">Diferencial Tecnológico</h3>
+    </div>
+""")
+
+_CABECALHO_INDICADOR = _compactar("""
+    <div style="background-color: white; padding: 15px; border-radius: 10px; box-shadow: 0 2px 4px rgba(0,0,0,0.1);">
+        <h4 style="color: #2c5282; margin-bottom: 10px;">{titulo}</h4>
+""")
+
+_CARTAO_METRICA = _compactar("""
+    <div style="background-color: white; padding: 10px; border-radius: 5px;
+                box-shadow: 0 1px 2px rgba(0,0,0,0.1); margin: 5px 0;">
+        <div style="font-size: 0.9em; color: #666;">{titulo}</div>
+        <div style="font-size: 1.1em; color: #2f855a; font-weight: bold;">
+            {prefixo}{valor:.2f}{sufixo}
+        </div>
+    </div>
+""")
+
+
+def cabecalho_indicador(titulo):
+    """Abre o quadro de um indicador da aba de resultados (fechado com ``</div>``)."""
+    return _CABECALHO_INDICADOR.format(titulo=titulo)
+
+
+def cartao_metrica(titulo, valor, prefixo="", sufixo=""):
+    """Cartão com o valor de um indicador para uma molécula."""
+    return _CARTAO_METRICA.format(titulo=titulo, valor=valor, prefixo=prefixo, sufixo=sufixo)
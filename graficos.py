@@ -0,0 +1,411 @@
+"""Construção dos gráficos do app (sem dependência do Streamlit).
+
+As figuras têm tamanho limitado, qualquer que seja o número de cenários
+avaliados: séries longas são reduzidas (mínimo e máximo por faixa) e passam
+para WebGL, grades de mapas de calor são agrupadas por média e histogramas
+chegam já agregados. Os arrays vão em float32, que o Plotly codifica em
+base64 com metade do tamanho.
+"""
+
+import functools
+
+import numpy as np
+import plotly.graph_objects as go
+
+import importacoes
+
+# Pontos por série de linha; acima disso a série é reduzida
+PONTOS_POR_SERIE = 2000
+# Séries com mais pontos que isso usam Scattergl (WebGL) no lugar de SVG
+PONTOS_WEBGL = 1000
+# Células por eixo dos mapas de calor; acima disso as células são agrupadas
+CELULAS_POR_EIXO = 150
+# Barras das distribuições de Monte Carlo
+BINS_HISTOGRAMA = 128
+
+
+def _com_plotly(funcao):
+    # Monta a figura sem correr junto com uma importação do pandas (ver importacoes.py)
+    @functools.wraps(funcao)
+    def envolvida(*args, **opcoes):
+        with importacoes.usando_plotly():
+            return funcao(*args, **opcoes)
+    return envolvida
+
+
+class FiguraCongelada(go.Figure):
+    """Figura que não muda depois de pronta, para exibição repetida.
+
+    O Streamlit chama ``to_dict`` a cada exibição (cópia profunda e conversão
+    dos arrays para base64); aqui o dicionário é montado uma vez e reaproveitado.
+    """
+
+    @_com_plotly
+    def to_dict(self):
+        if getattr(self, "_dicionario", None) is None:
+            self._dicionario = super().to_dict()
+        return self._dicionario
+
+
+@_com_plotly
+def congelar(figuras):
+    """Uma figura (ou dicionário de figuras) como ``FiguraCongelada``, para guardar em cache."""
+    if isinstance(figuras, dict):
+        return {nome: congelar(figura) for nome, figura in figuras.items()}
+    return FiguraCongelada(figuras)
+
+
+def _compacto(valores):
+    return np.asarray(valores, dtype=np.float32)
+
+
+def reduzir_serie(x, y, pontos=PONTOS_POR_SERIE):
+    """Reduz uma série (ordenada em ``x``) a no máximo ``pontos``, com o mínimo e o máximo de cada faixa."""
+    x, y = np.asarray(x), np.asarray(y)
+    if len(y) <= pontos:
+        return x, y
+    faixas = pontos // 2
+    tamanho = -(-len(y) // faixas)
+    # A última faixa é completada com o último ponto, que não muda o mínimo nem o máximo
+    blocos = np.pad(y, (0, faixas * tamanho - len(y)), mode="edge").reshape(faixas, tamanho)
+    inicio = np.arange(faixas)[:, np.newaxis] * tamanho
+    extremos = np.sort(np.stack([blocos.argmin(axis=1), blocos.argmax(axis=1)], axis=1) + inicio, axis=1)
+    indices = np.unique(np.minimum(extremos.ravel(), len(y) - 1))
+    return x[indices], y[indices]
+
+
+@_com_plotly
+def linha(x, y, **opcoes):
+    """Traço de linha com a série reduzida, em WebGL quando passa de ``PONTOS_WEBGL`` pontos."""
+    n = len(y)
+    x, y = reduzir_serie(x, y)
+    tipo = go.Scattergl if n > PONTOS_WEBGL else go.Scatter
+    # Datas ficam como estão; só eixos numéricos vão para float32
+    return tipo(x=_compacto(x) if np.issubdtype(x.dtype, np.number) else x, y=_compacto(y), **opcoes)
+
+
+def _medias_blocos(valores, tamanho, eixo):
+    # Média de blocos de ``tamanho`` elementos ao longo do eixo (o último pode ser menor)
+    n = valores.shape[eixo]
+    inicios = np.arange(0, n, tamanho)
+    contagens = np.diff(np.append(inicios, n))
+    forma = [1] * valores.ndim
+    forma[eixo] = -1
+    return np.add.reduceat(valores, inicios, axis=eixo) / contagens.reshape(forma)
+
+
+def reduzir_grade(valores_x, valores_y, z, celulas=CELULAS_POR_EIXO):
+    """Agrupa a grade ``z[y, x]`` por média até ``celulas`` por eixo; eixos com o centro de cada grupo."""
+    valores_x, valores_y, z = np.asarray(valores_x, dtype=float), np.asarray(valores_y, dtype=float), np.asarray(z)
+    for eixo, valores in [(1, valores_x), (0, valores_y)]:
+        tamanho = -(-len(valores) // celulas)
+        if tamanho > 1:
+            z = _medias_blocos(z, tamanho, eixo)
+            valores = _medias_blocos(valores, tamanho, 0)
+        if eixo == 1:
+            valores_x = valores
+        else:
+            valores_y = valores
+    return valores_x, valores_y, z
+
+
+def reagrupar_histograma(contagens, bordas, bins=BINS_HISTOGRAMA):
+    """Centros e contagens de um histograma de largura fixa reagrupado em ``bins`` barras."""
+    contagens = np.asarray(contagens)
+    centros = (bordas[:-1] + bordas[1:]) / 2
+    agrupar = max(contagens.shape[-1] // bins, 1)
+    n = contagens.shape[-1] // agrupar * agrupar
+    return (centros[:n].reshape(-1, agrupar).mean(axis=1),
+            contagens[..., :n].reshape(*contagens.shape[:-1], -1, agrupar).sum(axis=-1))
+
+
+@_com_plotly
+def figura_incremento_lucro(resultados, moleculas):
+    # b) Incremento Lucro Adicional (R$/cab)
+    fig_lucro = go.Figure()
+
+    # Incrementos em R$ e percentuais (molécula 1 é referência)
+    lucros = [resultados[molecula]['incremento_lucro_adicional'] for molecula in moleculas]
+    incrementos = [resultados[molecula]['incremento_resultado_agio_percentual'] for molecula in moleculas]
+
+    # Adiciona as barras
+    fig_lucro.add_trace(go.Bar(
+        x=moleculas,
+        y=lucros,
+        name='Incremento Lucro Adicional',
+        marker_color='rgb(71, 135, 198)'  # Azul claro
+    ))
+
+    # Adiciona anotações para os valores em R$ e percentual no meio das barras
+    for i, (valor, percentual) in enumerate(zip(lucros, incrementos)):
+        if valor != 0:  # Apenas para valores não zero
+            fig_lucro.add_annotation(
+                x=moleculas[i],
+                y=valor/2,  # Posição do valor em R$
+                text=f"+R$ {abs(valor):.2f}<br>(+{abs(percentual):.0f}%)",  # Valor em R$ e percentual
+                showarrow=False,
+                font=dict(size=14, color='white'),
+                align='center'
+            )
+
+    fig_lucro.update_layout(
+        title='Incremento Lucro Adicional (R$/cab)',
+        yaxis_title='R$/cab',
+        showlegend=False
+    )
+    return fig_lucro
+
+
+def _textos_variacao(valores):
+    # Sem texto na referência; da terceira molécula em diante, variação sobre a anterior
+    textos = [""]
+    for i in range(1, len(valores)):
+        texto = f"R$ {abs(valores[i]):.2f}"
+        if i > 1:
+            variacao = ((valores[i] / valores[i - 1]) - 1) * 100 if valores[i - 1] != 0 else 0
+            texto += f"<br>({variacao:.1f}%)"
+        textos.append(texto)
+    return textos
+
+
+@_com_plotly
+def figura_custo_receita(resultados, moleculas):
+    # c) Custo x Receita Adicional
+    fig_custoReceita = go.Figure()
+
+    # Molécula 1 é referência
+    receitas = [resultados[molecula]['receita_adicional'] for molecula in moleculas]
+    custos_adicionais = [resultados[molecula]['custo_adicional'] for molecula in moleculas]
+
+    # Barra para Receita Adicional
+    fig_custoReceita.add_trace(go.Bar(
+        x=moleculas,
+        y=receitas,
+        name='Receita Adicional',
+        text=_textos_variacao(receitas),
+        textposition='inside',
+        textfont=dict(size=14, color='white'),
+        insidetextanchor='middle',
+        marker_color='rgb(71, 135, 198)'  # Azul claro
+    ))
+
+    # Barra para Custo Adicional
+    fig_custoReceita.add_trace(go.Bar(
+        x=moleculas,
+        y=custos_adicionais,
+        name='Custo Adicional',
+        text=_textos_variacao(custos_adicionais),
+        textposition='inside',
+        textfont=dict(size=14, color='white'),
+        insidetextanchor='middle',
+        marker_color='rgb(35, 67, 98)'  # Azul escuro
+    ))
+
+    fig_custoReceita.update_layout(
+        title='Custo x Receita Adicional',
+        yaxis_title='R$/cab',
+        showlegend=True,
+        barmode='group',
+        uniformtext=dict(mode='hide', minsize=10)
+    )
+    return fig_custoReceita
+
+
+@_com_plotly
+def figura_performance(resultados, moleculas):
+    # d) Performance: Arrobas x Custo
+    fig_performance = go.Figure()
+
+    # Preparar dados
+    arrobas_base = [resultados[moleculas[0]]['arrobas']] * len(moleculas)  # Arrobas da referência para todas as moléculas
+    arrobas_adicionais = [resultados[mol]['arrobas_adicionais'] for mol in moleculas]
+
+    # Custo da arroba adicional (zero para a referência)
+    custos_arroba = [resultados[mol]['custo_arroba_adicional'] for mol in moleculas]
+
+    # Barra para Arrobas Base
+    fig_performance.add_trace(go.Bar(
+        x=moleculas,
+        y=arrobas_base,
+        name='Arrobas Base (@/cab)',
+        text=[f"{valor:.2f}" for valor in arrobas_base],
+        textposition='inside',
+        textfont=dict(size=14, color='white'),
+        insidetextanchor='middle',
+        marker_color='rgb(71, 135, 198)'  # Azul claro
+    ))
+
+    # Barra para Arrobas Adicionais
+    fig_performance.add_trace(go.Bar(
+        x=moleculas,
+        y=arrobas_adicionais,
+        name='Arrobas Adicionais (@/cab)',
+        text=[f"{valor:.2f}" if valor > 0 else "" for valor in arrobas_adicionais],
+        textposition='inside',
+        textfont=dict(size=14, color='white'),
+        insidetextanchor='middle',
+        marker_color='rgb(35, 67, 98)'  # Azul escuro
+    ))
+
+    # Adicionar linha de custo
+    fig_performance.add_trace(go.Scatter(
+        x=moleculas,
+        y=custos_arroba,
+        name='Custo @+ (R$/@)',
+        mode='lines+markers+text',
+        line=dict(color='orange', width=2),
+        marker=dict(size=10, color='orange'),
+        text=[f"R${custo:.2f}" for custo in custos_arroba],
+        textposition='top center',
+        textfont=dict(size=14, color='black'),
+        yaxis='y2',
+        showlegend=False
+    ))
+
+    fig_performance.update_layout(
+        title='Performance',
+        yaxis_title='Arrobas (@/cab)',
+        yaxis2=dict(
+            title='Custo @+ (R$/@)',
+            overlaying='y',
+            side='right'
+        ),
+        showlegend=True,
+        barmode='stack',
+        uniformtext=dict(mode='hide', minsize=10)
+    )
+    return fig_performance
+
+
+@_com_plotly
+def figuras_comparativas(resultados, moleculas):
+    """Os três gráficos da seção "Análise Comparativa"."""
+    return {
+        "incremento_lucro": figura_incremento_lucro(resultados, moleculas),
+        "custo_receita": figura_custo_receita(resultados, moleculas),
+        "performance": figura_performance(resultados, moleculas),
+    }
+
+
+@_com_plotly
+def figuras_trajetorias(trajetorias, moleculas):
+    """Trajetórias diárias da simulação dia a dia (peso, custeio e arrobas acumulados)."""
+    series = {
+        "peso": ("Peso Vivo ao Longo do Confinamento", "Kg/cab"),
+        "custeio_acumulado": ("Custeio Acumulado", "R$/cab"),
+        "arrobas": ("Arrobas Produzidas Acumuladas", "@/cab"),
+    }
+    figuras = {}
+    for campo, (titulo, unidade) in series.items():
+        fig = go.Figure()
+        for i, molecula in enumerate(moleculas):
+            fig.add_trace(linha(trajetorias["dia"], trajetorias[campo][:, i], name=molecula, mode='lines'))
+        fig.update_layout(title=titulo, xaxis_title='Dias', yaxis_title=unidade)
+        figuras[campo] = fig
+    return figuras
+
+
+@_com_plotly
+def figura_sensibilidade(valores_x, valores_y, z, atual_x, atual_y, titulo, rotulo_x, rotulo_y, rotulo_z):
+    """Mapa de calor de uma varredura, com o cenário atual marcado."""
+    valores_x, valores_y, z = reduzir_grade(valores_x, valores_y, z)
+    fig = go.Figure(go.Heatmap(
+        x=_compacto(valores_x),
+        y=_compacto(valores_y),
+        z=_compacto(z),
+        colorscale='RdYlGn',
+        zmid=0,
+        colorbar=dict(title=dict(text=rotulo_z, side='right'))
+    ))
+
+    # Marca o cenário atual
+    fig.add_trace(go.Scatter(
+        x=[atual_x],
+        y=[atual_y],
+        mode='markers',
+        marker=dict(symbol='x', size=12, color='black'),
+        showlegend=False
+    ))
+
+    fig.update_layout(title=titulo, xaxis_title=rotulo_x, yaxis_title=rotulo_y)
+    return fig
+
+
+@_com_plotly
+def figura_distribuicao(histograma, moleculas, titulo):
+    """Distribuição acumulada nos histogramas do Monte Carlo (tamanho fixo, independente dos sorteios)."""
+    centros, contagens = reagrupar_histograma(histograma.contagens, histograma.bordas)
+    fig = go.Figure()
+    for i, molecula in enumerate(moleculas):
+        fig.add_trace(linha(centros, contagens[i] / histograma.n[i], name=molecula, mode='lines', line_shape='hvh'))
+    fig.update_layout(title=titulo, xaxis_title='R$/cab', yaxis_title='Frequência')
+    return fig
+
+
+@_com_plotly
+def figuras_abate(curva, otimo, atual, campo_x, escala, moleculas, rotulo_x, rotulo_y):
+    """Curva do objetivo por ponto de saída e custo de desviar do ótimo (x marca o ponto de saída atual)."""
+    fig_curva = go.Figure()
+    fig_desvio = go.Figure()
+    for i, molecula in enumerate(moleculas):
+        x = curva[campo_x][:, i]
+        fig_curva.add_trace(linha(x, curva["valores"][:, i] * escala, name=molecula, mode='lines'))
+        fig_curva.add_trace(go.Scatter(
+            x=[otimo[campo_x][i], atual[campo_x][i]],
+            y=[otimo["valor"][i] * escala, otimo["valor_atual"][i] * escala],
+            mode='markers',
+            marker=dict(size=10, symbol=['circle', 'x']),
+            showlegend=False
+        ))
+        fig_desvio.add_trace(linha(x, (otimo["valor"][i] - curva["valores"][:, i]) * escala, name=molecula,
+                                   mode='lines'))
+    fig_curva.update_layout(title="Objetivo por Ponto de Saída", xaxis_title=rotulo_x, yaxis_title=rotulo_y)
+    fig_desvio.update_layout(title="Custo de Desviar do Ótimo", xaxis_title=rotulo_x, yaxis_title=rotulo_y)
+    return {"curva": fig_curva, "desvio": fig_desvio}
+
+
+@_com_plotly
+def figuras_historico(simulacao, moleculas):
+    """Margem realizada (resultado com ágio) por data de entrada e vantagem acumulada sobre a referência (backtest)."""
+    fig_resultado = go.Figure()
+    fig_vantagem = go.Figure()
+    for i, molecula in enumerate(moleculas):
+        fig_resultado.add_trace(linha(simulacao["entrada"], simulacao["resultado_agio"][:, i], name=molecula,
+                                      mode='lines'))
+        if i > 0:
+            fig_vantagem.add_trace(linha(simulacao["entrada"], np.cumsum(simulacao["vantagem"][:, i]), name=molecula,
+                                         mode='lines'))
+    fig_resultado.update_layout(title="Margem Realizada por Data de Entrada", xaxis_title='Entrada',
+                                yaxis_title='R$/cab')
+    fig_vantagem.update_layout(title=f"Vantagem Acumulada sobre {moleculas[0]}", xaxis_title='Entrada',
+                               yaxis_title='R$/cab (um lote por data)')
+    return {"resultado": fig_resultado, "vantagem": fig_vantagem}
+
+
+@_com_plotly
+def figura_tornado(tornado, campo, i, molecula, rotulos, escala=1, unidade='R$/cab'):
+    """Tornado da molécula ``i``: variação de ``campo`` com cada variável a ±X%, maiores no topo."""
+    dados = tornado[campo]
+    base = dados["base"][i]
+    baixo = (dados["baixo"][:, i] - base) * escala
+    alto = (dados["alto"][:, i] - base) * escala
+    ordem = np.argsort(np.abs(alto - baixo), kind="stable")
+    nomes = [rotulos.get(tornado["nomes"][j], tornado["nomes"][j]) for j in ordem]
+    # Elasticidade onde o base não é zero; senão, a semielasticidade
+    elasticidades = [f"{e:+.2f}% por 1%" if np.isfinite(e) else f"{se * escala / 100:+.2f} {unidade} por 1%"
+                     for e, se in zip(dados["elasticidade"][ordem, i], dados["semielasticidade"][ordem, i])]
+    percentual = round(tornado["variacao"] * 100)
+
+    fig = go.Figure()
+    fig.add_trace(go.Bar(y=nomes, x=baixo[ordem], orientation='h', name=f'-{percentual}%',
+                         marker_color='rgb(214, 96, 77)', hovertext=elasticidades))
+    fig.add_trace(go.Bar(y=nomes, x=alto[ordem], orientation='h', name=f'+{percentual}%',
+                         marker_color='rgb(71, 135, 198)', hovertext=elasticidades))
+    fig.update_layout(
+        title=molecula,
+        barmode='overlay',
+        xaxis_title=f'Variação ({unidade})',
+        legend=dict(orientation='h', yanchor='bottom', y=1.02, xanchor='right', x=1),
+        margin=dict(l=10),
+    )
+    return fig
@@ -0,0 +1,120 @@
+"""Grafo de dependências para recálculo incremental.
+
+Cada nó é uma função cujos argumentos são os valores das suas dependências
+(outros nós ou entradas). ``Avaliador`` guarda os valores da última avaliação
+e, quando as entradas mudam, recalcula apenas os nós a jusante delas.
+"""
+
+import numpy as np
+
+
+class Grafo:
+    def __init__(self):
+        self.nos = {}  # nome -> (funcao, dependencias)
+        self._ordens = {}  # ordens topológicas já calculadas
+
+    def no(self, nome, *dependencias):
+        """Decorador que registra ``funcao`` como o nó ``nome``."""
+        def registrar(funcao):
+            if nome in self.nos:
+                raise ValueError(f"Nó duplicado: {nome}")
+            self.nos[nome] = (funcao, dependencias)
+            self._ordens.clear()
+            return funcao
+        return registrar
+
+    def entradas(self):
+        """Nomes usados como dependência que não são nós (valores de entrada)."""
+        return {dep for _, deps in self.nos.values() for dep in deps if dep not in self.nos}
+
+    def ordem(self, alvos=None, conhecidos=()):
+        """Nós necessários para ``alvos`` (todos, por padrão) em ordem topológica.
+
+        A busca não desce abaixo dos nomes em ``conhecidos``.
+        """
+        chave = (None if alvos is None else tuple(alvos), frozenset(conhecidos))
+        if chave not in self._ordens:
+            self._ordens[chave] = self._ordenar(alvos, conhecidos)
+        return self._ordens[chave]
+
+    def _ordenar(self, alvos, conhecidos):
+        visitados, ordem = set(), []
+
+        def visitar(nome, caminho):
+            if nome in visitados or nome in conhecidos or nome not in self.nos:
+                return
+            if nome in caminho:
+                raise ValueError(f"Ciclo no grafo envolvendo {nome}")
+            for dep in self.nos[nome][1]:
+                visitar(dep, caminho | {nome})
+            visitados.add(nome)
+            ordem.append(nome)
+
+        for nome in self.nos if alvos is None else alvos:
+            visitar(nome, frozenset())
+        return ordem
+
+    def dependentes(self, nomes):
+        """Nós a jusante de ``nomes`` (entradas ou nós), sem incluí-los."""
+        afetados = set(nomes)
+        for nome in self.ordem():
+            if afetados.intersection(self.nos[nome][1]):
+                afetados.add(nome)
+        return afetados - set(nomes)
+
+    def avaliar(self, valores, alvos=None):
+        """Avalia os nós necessários para ``alvos``.
+
+        ``valores`` traz as entradas e, opcionalmente, nós já calculados (que
+        não são recalculados). Retorna um novo dicionário com todos os valores.
+        """
+        valores = dict(valores)
+        for nome in self.ordem(alvos, conhecidos=valores):
+            funcao, deps = self.nos[nome]
+            valores[nome] = funcao(*(valores[dep] for dep in deps))
+        return valores
+
+
+def _iguais(a, b):
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return a == b
+    try:
+        return np.array_equal(a, b)
+    except (TypeError, ValueError):
+        return a is b
+
+
+class Avaliador:
+    """Avaliação incremental de um grafo, mantendo o estado entre chamadas.
+
+    Após ``avaliar``, ``alterados`` contém as entradas e nós cujo valor mudou;
+    nós recalculados com o mesmo valor de antes não propagam a mudança.
+    """
+
+    def __init__(self, grafo):
+        self.grafo = grafo
+        self.valores = {}
+        self.alterados = set()
+        self.recalculados = set()
+
+    def avaliar(self, entradas):
+        anteriores = self.valores
+        valores = dict(entradas)
+        alterados = {nome for nome, valor in entradas.items()
+                     if nome not in anteriores or not _iguais(valor, anteriores[nome])}
+        recalculados = set()
+
+        for nome in self.grafo.ordem():
+            funcao, deps = self.grafo.nos[nome]
+            if nome in anteriores and not alterados.intersection(deps):
+                valores[nome] = anteriores[nome]
+                continue
+            valores[nome] = funcao(*(valores[dep] for dep in deps))
+            recalculados.add(nome)
+            if nome not in anteriores or not _iguais(valores[nome], anteriores[nome]):
+                alterados.add(nome)
+
+        self.valores = valores
+        self.alterados = alterados
+        self.recalculados = recalculados
+        return valores
@@ -0,0 +1,229 @@
+"""Backtest da escolha da molécula com a série histórica de preços da arroba.
+
+A página usa um único ``valor_venda_arroba``; aqui um lote do cenário atual
+entra em cada data da série e sai ``dias`` depois, vendido pela arroba do dia
+da saída. A reposição é paga na entrada: pelo preço do boi magro (coluna
+``magro``, em R$/@) ou, sem ela, pela arroba do dia com o ``agio_percentual``.
+Todas as datas de entrada são avaliadas numa chamada só do motor.
+
+A margem realizada é o ``resultado_agio``: venda do peso final inteiro menos a
+compra do magro e o custeio. (O ``resultado`` do motor desconta a compra só
+das arrobas ganhas e fica negativo em qualquer cenário realista; a diferença
+entre moléculas, ``vantagem``, é a mesma nos dois.)
+
+A série é um CSV ou Parquet com as colunas ``data`` e ``arroba`` (R$/@) e,
+opcionalmente, ``magro``; datas sem cotação (fins de semana, feriados) usam a
+última cotação anterior. Lotes cuja saída passa do fim da série ficam de fora::
+
+    python historico.py precos.csv --por-ano --custeio 16
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import calculos
+import catalogo
+import lotes
+
+COLUNA_DATA = "data"
+COLUNA_ARROBA = "arroba"
+COLUNA_MAGRO = "magro"
+
+# Campos do motor guardados para cada data de entrada
+CAMPOS = ["resultado", "resultado_agio", "rentabilidade_mensal_agio", "valor_arrobas", "custeio_periodo"]
+
+# Margem realizada de cada lote (R$/cab)
+CAMPO_MARGEM = "resultado_agio"
+
+
+def carregar(caminho):
+    """Lê a série de preços e devolve ``{"data", "arroba", "magro"}`` ordenada por data (um valor por dia)."""
+    tabela = pd.concat(lotes.ler_blocos(caminho), ignore_index=True)
+    ausentes = [coluna for coluna in (COLUNA_DATA, COLUNA_ARROBA) if coluna not in tabela.columns]
+    if ausentes:
+        raise ValueError(f"Colunas ausentes na série de preços: {', '.join(ausentes)}")
+    return serie(tabela[COLUNA_DATA], tabela[COLUNA_ARROBA],
+                 tabela[COLUNA_MAGRO] if COLUNA_MAGRO in tabela.columns else None)
+
+
+def serie(datas, arroba, magro=None):
+    """Monta a série a partir de arrays; datas repetidas ficam com a última cotação."""
+    datas = pd.to_datetime(pd.Series(datas)).to_numpy().astype("datetime64[D]")
+    colunas = {COLUNA_ARROBA: np.asarray(arroba, dtype=float)}
+    if magro is not None:
+        colunas[COLUNA_MAGRO] = np.asarray(magro, dtype=float)
+    if len(datas) < 2:
+        raise ValueError("A série de preços precisa de pelo menos duas datas")
+    for nome, valores in colunas.items():
+        if len(valores) != len(datas) or not np.all(np.isfinite(valores)) or np.any(valores <= 0):
+            raise ValueError(f"A coluna '{nome}' precisa de um preço positivo em cada data")
+
+    # Ordena e mantém a última linha de cada data
+    ordem = np.argsort(datas, kind="stable")
+    datas = datas[ordem]
+    ultimas = np.append(datas[1:] != datas[:-1], True)
+    return {
+        COLUNA_DATA: datas[ultimas],
+        COLUNA_ARROBA: colunas[COLUNA_ARROBA][ordem][ultimas],
+        COLUNA_MAGRO: colunas[COLUNA_MAGRO][ordem][ultimas] if magro is not None else None,
+    }
+
+
+def simular(precos, entradas=None, custos=calculos.CUSTOS_PADRAO, fatores=None):
+    """Resultado realizado de um lote entrando em cada data da série, por molécula.
+
+    Retorna arrays com forma ``(n_entradas, n_moleculas)`` para ``CAMPOS``,
+    ``saida`` (data de venda) e ``preco_saida``, além de ``entrada``,
+    ``custo_animal_magro`` (por data), ``dias`` (por molécula) e ``vantagem``:
+    o resultado menos o da molécula de referência no mesmo lote.
+    """
+    entradas = {**calculos.ENTRADAS_PADRAO, **(entradas or {})}
+    base = {**entradas, "custos": custos, **(fatores or {})}
+    datas, arroba, magro = precos[COLUNA_DATA], precos[COLUNA_ARROBA], precos[COLUNA_MAGRO]
+
+    # Os dias de cocho não dependem de preços: um valor por molécula
+    dias = np.atleast_1d(calculos.avaliar(base, ["dias"])["dias"])
+    if not np.all(np.isfinite(dias)) or np.any(dias <= 0):
+        raise ValueError("O cenário não tem dias de cocho positivos (confira pesos e GMD)")
+    dias = np.rint(dias).astype(int)
+
+    saidas = datas[:, np.newaxis] + dias
+    validas = saidas.max(axis=1) <= datas[-1]
+    if not validas.any():
+        raise ValueError(f"A série precisa cobrir mais de {dias.max()} dias para fechar um lote")
+    saidas = saidas[validas]
+    # Última cotação até o dia da venda
+    preco_saida = arroba[np.searchsorted(datas, saidas, side="right") - 1]
+
+    # Reposição comprada na entrada, com a mesma conversão do motor (pv_inicial / 30 arrobas)
+    if magro is None:
+        reposicao = {"valor_venda_arroba": arroba[validas], "agio_percentual": entradas["agio_percentual"]}
+    else:
+        reposicao = {"valor_venda_arroba": magro[validas], "agio_percentual": 0.0}
+    custo_magro = calculos.avaliar({**reposicao, "pv_inicial": entradas["pv_inicial"]},
+                                   ["custo_animal_magro"])["custo_animal_magro"]
+
+    simulacao = {campo: np.empty(saidas.shape) for campo in CAMPOS}
+    # Uma avaliação por duração distinta (hoje todas as moléculas ficam os mesmos dias no cocho)
+    for duracao in np.unique(dias):
+        colunas = dias == duracao
+        saida = calculos.avaliar({**base, "valor_venda_arroba": preco_saida[:, np.argmax(colunas)],
+                                  "custo_animal_magro": custo_magro}, CAMPOS)
+        for campo in CAMPOS:
+            simulacao[campo][:, colunas] = saida[campo][:, colunas]
+
+    simulacao.update({
+        "entrada": datas[validas],
+        "saida": saidas,
+        "preco_saida": preco_saida,
+        "custo_animal_magro": custo_magro[:, 0],
+        "dias": dias,
+        "vantagem": simulacao["resultado"] - simulacao["resultado"][:, :1],
+    })
+    return simulacao
+
+
+def queda_maxima(valores):
+    """Maior queda do acumulado de ``valores`` (eixo 0) a partir do pico anterior, por coluna."""
+    acumulado = np.cumsum(valores, axis=0)
+    picos = np.maximum.accumulate(np.vstack([np.zeros((1,) + acumulado.shape[1:]), acumulado]), axis=0)[1:]
+    return (picos - acumulado).max(axis=0)
+
+
+def resumo(simulacao, moleculas=calculos.MOLECULAS):
+    """Indicadores do backtest por molécula.
+
+    ``vitorias`` é a fração dos lotes em que a molécula supera a referência;
+    as quedas máximas são do acumulado de um lote por data de entrada (R$/cab).
+    """
+    margem, vantagem = simulacao[CAMPO_MARGEM], simulacao["vantagem"]
+    vitorias = (vantagem > 0).mean(axis=0)
+    vitorias[0] = np.nan
+    return pd.DataFrame({
+        "molecula": list(moleculas),
+        "lotes": len(margem),
+        "margem_media": margem.mean(axis=0),
+        "margem_p5": np.percentile(margem, 5, axis=0),
+        "margem_mediana": np.median(margem, axis=0),
+        "prejuizo": (margem < 0).mean(axis=0),
+        "rentabilidade_mensal_media": simulacao["rentabilidade_mensal_agio"].mean(axis=0),
+        "vitorias": vitorias,
+        "vantagem_media": vantagem.mean(axis=0),
+        "vantagem_p5": np.percentile(vantagem, 5, axis=0),
+        "queda_maxima": queda_maxima(margem),
+        "queda_maxima_vantagem": queda_maxima(vantagem),
+    })
+
+
+def por_ano(simulacao, moleculas=calculos.MOLECULAS):
+    """Margem média e vitórias sobre a referência por ano de entrada × molécula."""
+    anos = simulacao["entrada"].astype("datetime64[Y]").astype(int) + 1970
+    unicos, codigos = np.unique(anos, return_inverse=True)
+    lotes_ano = np.bincount(codigos, minlength=len(unicos))
+    n_moleculas = len(moleculas)
+    colunas = {
+        "ano": np.repeat(unicos, n_moleculas),
+        "molecula": np.tile(list(moleculas), len(unicos)),
+        "lotes": np.repeat(lotes_ano, n_moleculas),
+    }
+    for nome, valores in [("margem_media", simulacao[CAMPO_MARGEM]), ("vantagem_media", simulacao["vantagem"]),
+                          ("vitorias", (simulacao["vantagem"] > 0).astype(float))]:
+        somas = np.stack([np.bincount(codigos, valores[:, i], len(unicos)) for i in range(n_moleculas)], axis=1)
+        colunas[nome] = (somas / lotes_ano[:, np.newaxis]).ravel()
+    colunas["vitorias"][np.tile(np.arange(n_moleculas) == 0, len(unicos))] = np.nan
+    return pd.DataFrame(colunas)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backtest da escolha da molécula com a série histórica da arroba.")
+    parser.add_argument("entrada", help="série de preços (.csv ou .parquet) com as colunas 'data' e 'arroba'")
+    parser.add_argument("--saida", help="arquivo com o resultado de cada data de entrada × molécula (.csv ou .parquet)")
+    parser.add_argument("--por-ano", action="store_true", help="mostra também o resumo por ano de entrada")
+    parser.add_argument("--catalogo", help="catálogo de moléculas (CSV) no lugar do padrão")
+    parser.add_argument("--custos", nargs="+", type=float,
+                        help="custo (R$/cab/dia) de cada molécula (padrão: os do catálogo)")
+    for nome, valor in calculos.ENTRADAS_PADRAO.items():
+        if nome != "valor_venda_arroba":
+            parser.add_argument(f"--{nome.replace('_', '-')}", type=float, default=valor,
+                                help=f"{calculos.ENTRADAS[nome]} (padrão: {valor})")
+    args = parser.parse_args(argv)
+
+    produtos = catalogo.carregar(args.catalogo) if args.catalogo else calculos.CATALOGO
+    custos = produtos["custo"] if args.custos is None else args.custos
+    if len(custos) != len(produtos["nome"]):
+        parser.error(f"--custos requer {len(produtos['nome'])} valores")
+
+    entradas = {nome: getattr(args, nome) for nome in calculos.ENTRADAS_PADRAO if nome != "valor_venda_arroba"}
+    precos = carregar(args.entrada)
+    inicio = time.perf_counter()
+    simulacao = simular(precos, entradas, custos, catalogo.fatores(produtos))
+    segundos = time.perf_counter() - inicio
+
+    if args.saida:
+        n = len(simulacao["entrada"])
+        tabela = pd.DataFrame({
+            "entrada": np.repeat(simulacao["entrada"], len(produtos["nome"])),
+            "molecula": np.tile(produtos["nome"], n),
+            "saida": simulacao["saida"].ravel(),
+            "preco_saida": simulacao["preco_saida"].ravel(),
+            **{campo: simulacao[campo].ravel() for campo in CAMPOS + ["vantagem"]},
+        })
+        escritor = lotes.EscritorBlocos(args.saida)
+        try:
+            escritor.gravar(tabela)
+        finally:
+            escritor.fechar()
+    print(resumo(simulacao, produtos["nome"]).to_string(index=False))
+    if args.por_ano:
+        print()
+        print(por_ano(simulacao, produtos["nome"]).to_string(index=False))
+    n = len(simulacao["entrada"])
+    print(f"{n} datas de entrada simuladas em {segundos * 1000:.1f} ms", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Importação do pandas sob demanda, sem corrida com o plotly.
+
+O app não carrega o pandas na partida (ver ``bench_inicializacao`` em
+``benchmark.py``): ele só entra nas abas que leem arquivos ou mostram tabelas.
+Enquanto uma thread importa o pandas, o módulo fica em ``sys.modules`` pela
+metade; o plotly de outra thread (outra sessão, a antecipação, a fila de
+relatórios) o encontra lá com ``get_module("pandas", should_load=False)`` e
+falha ao usar ``pandas.Series``.
+
+Os trechos que montam ou serializam figuras rodam dentro de ``usando_plotly()``
+e o pandas é importado por ``pandas()``, que espera esses trechos terminarem e
+segura os novos enquanto importa. Com o pandas carregado, nenhum dos dois espera.
+"""
+
+import contextlib
+import sys
+import threading
+
+_condicao = threading.Condition()
+_local = threading.local()
+_usando = 0
+_esperando = 0
+_importando = False
+
+
+def _carregado():
+    modulo = sys.modules.get("pandas")
+    return modulo is not None and not getattr(getattr(modulo, "__spec__", None), "_initializing", False)
+
+
+@contextlib.contextmanager
+def usando_plotly():
+    """Trecho que usa o plotly: não roda junto com a importação do pandas."""
+    global _usando
+    if _carregado():
+        yield
+        return
+    profundidade = getattr(_local, "profundidade", 0)
+    with _condicao:
+        # Trechos aninhados não esperam: a thread já está contada
+        _condicao.wait_for(lambda: not _importando and (profundidade > 0 or _esperando == 0))
+        _usando += 1
+    _local.profundidade = profundidade + 1
+    try:
+        yield
+    finally:
+        _local.profundidade = profundidade
+        with _condicao:
+            _usando -= 1
+            _condicao.notify_all()
+
+
+def pandas():
+    """Importa (uma vez) e retorna o pandas, sem trechos do plotly rodando ao mesmo tempo."""
+    global _esperando, _importando
+    if _carregado():
+        return sys.modules["pandas"]
+    if getattr(_local, "profundidade", 0):
+        raise RuntimeError("O pandas não pode ser importado dentro de usando_plotly()")
+    with _condicao:
+        _esperando += 1
+        try:
+            _condicao.wait_for(lambda: _usando == 0 and not _importando)
+        finally:
+            _esperando -= 1
+        _importando = True
+    try:
+        import pandas
+    finally:
+        with _condicao:
+            _importando = False
+            _condicao.notify_all()
+    return pandas
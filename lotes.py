@@ -0,0 +1,164 @@
+"""Avaliação em lote de arquivos CSV/Parquet com um lote por linha.
+
+Uso::
+
+    python lotes.py lotes.csv resultados.parquet --valor-venda-arroba 320
+
+Cada linha do arquivo de entrada é um lote; as colunas com os nomes de
+``calculos.ENTRADAS`` (``pv_inicial``, ``pv_final``, ``gmd``, ...) substituem os
+valores padrão. As demais colunas (identificadores, baia, fornecedor...) são
+repassadas para a saída, que tem uma linha por lote e molécula.
+
+O arquivo é lido e gravado em blocos, sem carregar a entrada inteira na memória.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import calculos
+import catalogo
+
+
+def _formato(caminho):
+    # Aceita também arquivos abertos com nome (como os enviados pela interface)
+    extensao = os.path.splitext(getattr(caminho, "name", caminho))[1].lower()
+    if extensao in (".parquet", ".pq"):
+        return "parquet"
+    if extensao in (".csv", ".txt", ".gz"):
+        return "csv"
+    raise ValueError(f"Formato de arquivo não suportado: {caminho}")
+
+
+def ler_blocos(caminho, tamanho_bloco=100_000):
+    """Itera sobre o arquivo de lotes em DataFrames de até ``tamanho_bloco`` linhas."""
+    if _formato(caminho) == "parquet":
+        import pyarrow.parquet as pq
+
+        for lote in pq.ParquetFile(caminho).iter_batches(batch_size=tamanho_bloco):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(caminho, chunksize=tamanho_bloco)
+
+
+def entradas_da_tabela(tabela, padroes=None):
+    """Monta os argumentos de ``calculos.calcular`` a partir das colunas da tabela."""
+    padroes = {**calculos.ENTRADAS_PADRAO, **(padroes or {})}
+    return {
+        nome: tabela[nome].to_numpy(dtype=float) if nome in tabela.columns else padroes[nome]
+        for nome in calculos.ENTRADAS
+    }
+
+
+def avaliar_tabela(tabela, padroes=None, custos=calculos.CUSTOS_PADRAO, campos=None, moleculas=calculos.MOLECULAS,
+                   fatores=None):
+    """Avalia todos os lotes da tabela e devolve uma linha por lote e molécula."""
+    saida = calculos.calcular(**entradas_da_tabela(tabela, padroes), custos=custos, fatores=fatores)
+    n, n_moleculas = len(tabela), len(moleculas)
+
+    # Colunas que não são entradas do modelo são repassadas (repetidas por molécula)
+    colunas = {
+        coluna: np.repeat(tabela[coluna].to_numpy(), n_moleculas)
+        for coluna in tabela.columns if coluna not in calculos.ENTRADAS
+    }
+    colunas["molecula"] = pd.Categorical.from_codes(np.tile(np.arange(n_moleculas), n), moleculas)
+    for campo in campos or calculos.CAMPOS:
+        colunas[campo] = np.broadcast_to(saida[campo], (n, n_moleculas)).ravel()
+    return pd.DataFrame(colunas)
+
+
+class EscritorBlocos:
+    # Grava os blocos de saída em sequência no mesmo arquivo
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.formato = _formato(caminho)
+        self.parquet = None
+        self.csv = None
+
+    def gravar(self, tabela):
+        import pyarrow as pa
+
+        tabela = pa.Table.from_pandas(tabela, preserve_index=False)
+        if self.formato == "parquet":
+            import pyarrow.parquet as pq
+
+            if self.parquet is None:
+                # Dicionário só para a coluna de molécula; nos campos numéricos ele só custa tempo
+                self.parquet = pq.ParquetWriter(self.caminho, tabela.schema, use_dictionary=["molecula"])
+            self.parquet.write_table(tabela)
+        else:
+            # Escrita do pyarrow: o to_csv do pandas formata número a número e é dezenas de vezes mais lento
+            import pyarrow.csv as pcsv
+
+            primeiro = self.csv is None
+            if primeiro:
+                self.csv = pa.output_stream(self.caminho, compression="detect")
+            pcsv.write_csv(_datas_sem_hora(tabela), self.csv, pcsv.WriteOptions(include_header=primeiro))
+
+    def fechar(self):
+        if self.parquet is not None:
+            self.parquet.close()
+        if self.csv is not None:
+            self.csv.close()
+
+
+def _datas_sem_hora(tabela):
+    # Como no pandas, datas sem hora são gravadas só com o dia
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    for i, campo in enumerate(tabela.schema):
+        if pa.types.is_timestamp(campo.type) and campo.type.tz is None:
+            coluna = tabela.column(i)
+            if pc.all(pc.equal(pc.cast(coluna, pa.date32()).cast(campo.type), coluna)).as_py() is not False:
+                tabela = tabela.set_column(i, campo.name, pc.cast(coluna, pa.date32()))
+    return tabela
+
+
+def avaliar_arquivo(entrada, saida, tamanho_bloco=100_000, padroes=None, custos=calculos.CUSTOS_PADRAO, campos=None,
+                    moleculas=calculos.MOLECULAS, fatores=None):
+    """Avalia o arquivo de lotes bloco a bloco; retorna ``(n_lotes, segundos)``."""
+    inicio = time.perf_counter()
+    n_lotes = 0
+    escritor = EscritorBlocos(saida)
+    try:
+        for bloco in ler_blocos(entrada, tamanho_bloco):
+            escritor.gravar(avaliar_tabela(bloco, padroes, custos, campos, moleculas, fatores))
+            n_lotes += len(bloco)
+    finally:
+        escritor.fechar()
+    return n_lotes, time.perf_counter() - inicio
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Avalia um arquivo de lotes (CSV ou Parquet) por molécula.")
+    parser.add_argument("entrada", help="arquivo de lotes (.csv ou .parquet)")
+    parser.add_argument("saida", help="arquivo de resultados (.csv ou .parquet)")
+    parser.add_argument("--tamanho-bloco", type=int, default=100_000, help="linhas avaliadas por bloco")
+    parser.add_argument("--campos", nargs="+", choices=calculos.CAMPOS, help="campos gravados (padrão: todos)")
+    parser.add_argument("--catalogo", help="catálogo de moléculas (CSV) no lugar do padrão")
+    parser.add_argument("--custos", nargs="+", type=float,
+                        help="custo (R$/cab/dia) de cada molécula (padrão: os do catálogo)")
+    for nome, valor in calculos.ENTRADAS_PADRAO.items():
+        parser.add_argument(f"--{nome.replace('_', '-')}", type=float, default=valor,
+                            help=f"{calculos.ENTRADAS[nome]} quando a coluna não existir (padrão: {valor})")
+    args = parser.parse_args(argv)
+
+    produtos = catalogo.carregar(args.catalogo) if args.catalogo else calculos.CATALOGO
+    custos = produtos["custo"] if args.custos is None else args.custos
+    if len(custos) != len(produtos["nome"]):
+        parser.error(f"--custos requer {len(produtos['nome'])} valores")
+
+    padroes = {nome: getattr(args, nome) for nome in calculos.ENTRADAS_PADRAO}
+    n_lotes, segundos = avaliar_arquivo(args.entrada, args.saida, args.tamanho_bloco, padroes, custos, args.campos,
+                                        produtos["nome"], catalogo.fatores(produtos))
+    print(f"{n_lotes} lotes avaliados em {segundos:.2f} s ({n_lotes / max(segundos, 1e-9):,.0f} lotes/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""Busca de meta: qual valor de uma entrada faz um indicador atingir o alvo.
+
+Exemplos: o preço máximo (R$/kg) da FOSBOVI CONF. PRIME 5.0 até o incremento
+de lucro zerar, ou o valor da arroba que zera o resultado. A raiz é buscada
+pelo método de Illinois (regula falsi modificada), vetorizado: todas as
+entradas podem ser arrays e cada cenário é resolvido ao mesmo tempo.
+
+A variável pode ser uma entrada de ``calculos.ENTRADAS`` ou, por molécula,
+``("custos", i)`` ou ``("precos", i)``. O preço entra no modelo pelo custo
+diário. Com a tabela de preços (``precos``), o custo informado vale no preço
+informado e acompanha o preço na mesma proporção, então valor atual, solução
+e diferença ficam na mesma base mesmo com o custo editado à parte; sem ela,
+``custo = preco * consumo / 1000`` (consumo em g/cab/dia).
+
+Uso em lote::
+
+    python meta.py lotes.csv metas.csv --variavel precos --molecula-variavel 2 \\
+        --campo incremento_lucro_adicional --molecula 2 --alvo 0
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import calculos
+import catalogo
+
+
+def rotulo_variavel(variavel, moleculas=calculos.MOLECULAS):
+    nome, indice = _separar(variavel)
+    if nome == "custos":
+        return f"Custo de {moleculas[indice]} (R$/cab/dia)"
+    if nome == "precos":
+        return f"Preço de {moleculas[indice]} (R$/kg)"
+    return calculos.ENTRADAS[nome]
+
+
+def _separar(variavel):
+    if isinstance(variavel, (tuple, list)):
+        nome, indice = variavel
+    else:
+        nome, indice = variavel, None
+    if nome not in calculos.ENTRADAS and nome not in ("custos", "precos"):
+        raise ValueError(f"Variável desconhecida: {nome}")
+    if nome in ("custos", "precos") and indice is None:
+        raise ValueError(f"A variável {nome} requer o índice da molécula")
+    return nome, indice
+
+
+def valor_atual(entradas, variavel, custos=calculos.CUSTOS_PADRAO, consumos=calculos.CONSUMOS_PADRAO, precos=None):
+    """Valor da variável no cenário ``entradas``.
+
+    O preço vem da tabela ``precos`` (R$/kg) quando informada; sem ela, é
+    derivado do custo e do consumo.
+    """
+    nome, indice = _separar(variavel)
+    if nome == "custos":
+        return np.asarray(custos, dtype=float)[..., indice]
+    if nome == "precos" and precos is not None:
+        return np.asarray(precos, dtype=float)[..., indice]
+    if nome == "precos":
+        return np.asarray(custos, dtype=float)[..., indice] * 1000 / np.asarray(consumos, dtype=float)[..., indice]
+    return np.asarray(entradas[nome], dtype=float)
+
+
+def avaliar(entradas, variavel, valores, campo, molecula,
+            custos=calculos.CUSTOS_PADRAO, consumos=calculos.CONSUMOS_PADRAO, fatores=None, precos=None):
+    """Indicador ``campo`` da ``molecula`` com a variável substituída por ``valores``."""
+    nome, indice = _separar(variavel)
+    argumentos = dict(entradas, **(fatores or {}))
+    custos = np.asarray(custos, dtype=float)
+    if nome in calculos.ENTRADAS:
+        argumentos[nome] = valores
+    else:
+        forma = np.broadcast_shapes(np.shape(valores), custos.shape[:-1])
+        custos = np.broadcast_to(custos, forma + custos.shape[-1:]).copy()
+        valores = np.asarray(valores, dtype=float)
+        if nome == "custos":
+            custos[..., indice] = valores
+        else:
+            pelo_consumo = valores * np.asarray(consumos, dtype=float)[..., indice] / 1000
+            if precos is None:
+                custos[..., indice] = pelo_consumo
+            else:
+                # O custo informado vale no preço da tabela e varia na proporção do preço
+                preco_atual = np.asarray(precos, dtype=float)[..., indice]
+                com_preco = preco_atual > 0
+                custos[..., indice] = np.where(
+                    com_preco, custos[..., indice] * valores / np.where(com_preco, preco_atual, 1.0), pelo_consumo)
+    argumentos["custos"] = custos
+    # Só os nós necessários para o campo pedido são avaliados
+    return calculos.avaliar(argumentos, [campo])[campo][..., molecula]
+
+
+def _intervalo_padrao(atual):
+    escala = np.where(np.abs(atual) > 0, np.abs(atual), 1.0)
+    return np.zeros_like(escala), escala * 10
+
+
+def resolver(entradas, variavel, campo, alvo=0.0, molecula=-1, custos=calculos.CUSTOS_PADRAO,
+             consumos=calculos.CONSUMOS_PADRAO, intervalo=None, tolerancia=1e-9, max_iteracoes=100, expansoes=4,
+             fatores=None, precos=None):
+    """Resolve ``campo[molecula](variavel) == alvo`` para todos os cenários.
+
+    ``intervalo`` é o par (mínimo, máximo) da busca; por padrão vai de zero a
+    dez vezes o valor atual, ampliado até ``expansoes`` vezes (×10) quando não
+    há troca de sinal. Limites onde o indicador não é finito são aproximados
+    do valor atual (com ``precos``, o preço da tabela). Retorna ``{"valor", "convergiu", "iteracoes"}``;
+    cenários sem solução no intervalo ficam com ``valor`` NaN.
+    """
+    atual = valor_atual(entradas, variavel, custos, consumos, precos)
+
+    def f(x):
+        return avaliar(entradas, variavel, x, campo, molecula, custos, consumos, fatores, precos) - alvo
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        if intervalo is None:
+            a, b = _intervalo_padrao(atual)
+            ampliar = True
+        else:
+            a, b = (np.asarray(v, dtype=float) for v in intervalo)
+            ampliar = False
+        fa = f(a)
+        forma = np.shape(fa)
+        a, b = np.broadcast_to(a, forma).copy(), np.broadcast_to(b, forma).copy()
+        fb = np.broadcast_to(f(b), forma).copy()
+        fa = np.array(fa, dtype=float)
+
+        # Amplia o limite superior onde ainda não há troca de sinal
+        for _ in range(expansoes if ampliar else 0):
+            sem_troca = ~(np.sign(fa) != np.sign(fb))
+            if not sem_troca.any():
+                break
+            b = np.where(sem_troca, b * 10, b)
+            fb = np.where(sem_troca, f(b), fb)
+
+        # Limites sem valor finito (divisão por zero, rentabilidade abaixo de
+        # -100%) se aproximam do valor atual até o indicador ficar definido
+        atual = np.broadcast_to(atual, forma)
+        for _ in range(max_iteracoes):
+            ruim_a, ruim_b = ~np.isfinite(fa), ~np.isfinite(fb)
+            if not (ruim_a.any() or ruim_b.any()):
+                break
+            a = np.where(ruim_a, (a + atual) / 2, a)
+            b = np.where(ruim_b, (b + atual) / 2, b)
+            fa = np.where(ruim_a, f(a), fa)
+            fb = np.where(ruim_b, f(b), fb)
+
+        valido = np.isfinite(fa) & np.isfinite(fb) & ((fa == 0) | (fb == 0) | (np.sign(fa) != np.sign(fb)))
+        convergiu = valido & ((fa == 0) | (fb == 0))
+        solucao = np.where(fa == 0, a, b)
+
+        iteracoes = 0
+        for iteracoes in range(1, max_iteracoes + 1):
+            ativos = valido & ~convergiu
+            if not ativos.any():
+                break
+            c = np.where(fb != fa, (a * fb - b * fa) / (fb - fa), (a + b) / 2)
+            fc = f(c)
+            # Se a secante cair onde o indicador não é finito, usa o ponto médio
+            ruim = ativos & ~np.isfinite(fc)
+            if ruim.any():
+                c = np.where(ruim, (a + b) / 2, c)
+                fc = np.where(ruim, f(c), fc)
+                valido &= np.isfinite(fc) | ~ativos
+                ativos &= valido
+            # Elementos já resolvidos não mudam
+            c = np.where(ativos, c, b)
+            fc = np.where(ativos, fc, fb)
+
+            troca = np.sign(fc) != np.sign(fb)
+            fa = np.where(troca, fb, fa / 2)  # Illinois: reduz o lado que ficou parado
+            a = np.where(troca, b, a)
+            b, fb = c, fc
+
+            escala = np.maximum(np.abs(b), 1.0)
+            resolvidos = ativos & ((np.abs(fc) <= tolerancia * np.maximum(abs(alvo), 1.0)) | (np.abs(b - a) <= tolerancia * escala))
+            solucao = np.where(resolvidos, b, solucao)
+            convergiu |= resolvidos
+
+    solucao = np.where(convergiu, solucao, np.nan)
+    return {"valor": solucao, "convergiu": convergiu, "iteracoes": iteracoes}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca de meta para cada lote de um arquivo CSV ou Parquet.")
+    parser.add_argument("entrada", help="arquivo de lotes (.csv ou .parquet)")
+    parser.add_argument("saida", help="arquivo com a solução por lote (.csv ou .parquet)")
+    parser.add_argument("--variavel", required=True, choices=list(calculos.ENTRADAS) + ["custos", "precos"])
+    parser.add_argument("--molecula-variavel", type=int, help="índice da molécula (para custos e precos)")
+    parser.add_argument("--campo", required=True, choices=calculos.CAMPOS)
+    parser.add_argument("--molecula", type=int, help="índice da molécula do indicador (padrão: a última)")
+    parser.add_argument("--alvo", type=float, default=0.0)
+    parser.add_argument("--tamanho-bloco", type=int, default=100_000)
+    parser.add_argument("--catalogo", help="catálogo de moléculas (CSV) no lugar do padrão")
+    parser.add_argument("--custos", nargs="+", type=float,
+                        help="custo (R$/cab/dia) de cada molécula (padrão: os do catálogo)")
+    args = parser.parse_args(argv)
+
+    produtos = catalogo.carregar(args.catalogo) if args.catalogo else calculos.CATALOGO
+    n_moleculas = len(produtos["nome"])
+    custos = produtos["custo"] if args.custos is None else args.custos
+    if len(custos) != n_moleculas:
+        parser.error(f"--custos requer {n_moleculas} valores")
+    if args.variavel in ("custos", "precos"):
+        if args.molecula_variavel is None:
+            parser.error(f"--variavel {args.variavel} requer --molecula-variavel")
+        if not 0 <= args.molecula_variavel < n_moleculas:
+            parser.error(f"--molecula-variavel deve estar entre 0 e {n_moleculas - 1}")
+    elif args.molecula_variavel is not None:
+        parser.error("--molecula-variavel só vale para --variavel custos ou precos")
+    molecula = n_moleculas - 1 if args.molecula is None else args.molecula
+    if not 0 <= molecula < n_moleculas:
+        parser.error(f"--molecula deve estar entre 0 e {n_moleculas - 1}")
+
+    # Só a linha de comando lê arquivos: pandas (via lotes) fica fora da importação do app
+    import lotes
+
+    variavel = args.variavel if args.molecula_variavel is None else (args.variavel, args.molecula_variavel)
+    nome_coluna = args.variavel if args.molecula_variavel is None else f"{args.variavel}_{args.molecula_variavel}"
+    inicio = time.perf_counter()
+    n_lotes = 0
+    escritor = lotes.EscritorBlocos(args.saida)
+    try:
+        for bloco in lotes.ler_blocos(args.entrada, args.tamanho_bloco):
+            solucao = resolver(lotes.entradas_da_tabela(bloco), variavel, args.campo, args.alvo, molecula, custos,
+                               produtos["consumo"], fatores=catalogo.fatores(produtos), precos=produtos["preco"])
+            saida = bloco.copy()
+            saida[f"meta_{nome_coluna}"] = np.broadcast_to(solucao["valor"], len(bloco))
+            saida["meta_convergiu"] = np.broadcast_to(solucao["convergiu"], len(bloco))
+            escritor.gravar(saida)
+            n_lotes += len(bloco)
+    finally:
+        escritor.fechar()
+    segundos = time.perf_counter() - inicio
+    print(f"{n_lotes} lotes resolvidos em {segundos:.2f} s ({n_lotes / max(segundos, 1e-9):,.0f} lotes/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
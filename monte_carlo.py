@@ -0,0 +1,265 @@
+"""Simulação de Monte Carlo do resultado do lote.
+
+As entradas incertas são descritas por dicionários simples, por exemplo::
+
+    {"tipo": "normal", "media": 1.551, "desvio": 0.08}
+    {"tipo": "triangular", "minimo": 300, "moda": 340, "maximo": 360}
+    {"tipo": "empirica", "amostras": [320.5, 331.0, 345.2]}
+
+Os sorteios são processados em blocos de tamanho fixo e acumulados em
+histogramas, de forma que a memória não cresce com o número de sorteios. Cada
+bloco usa um gerador próprio derivado da semente, então o resultado depende
+apenas de ``semente`` e ``tamanho_bloco`` (e não do número de processos: as
+estatísticas de cada bloco são somadas sempre na ordem dos blocos).
+"""
+
+import numpy as np
+
+import calculos
+import paralelo
+
+TIPOS_DISTRIBUICAO = ["normal", "triangular", "empirica"]
+
+PERCENTIS = (5, 50, 95)
+
+
+def validar_distribuicao(distribuicao):
+    """Confere os parâmetros de ``distribuicao``; levanta ValueError com a causa."""
+    tipo = distribuicao["tipo"]
+    if tipo == "normal":
+        if distribuicao["desvio"] < 0:
+            raise ValueError("O desvio padrão não pode ser negativo")
+    elif tipo == "triangular":
+        minimo, moda, maximo = distribuicao["minimo"], distribuicao["moda"], distribuicao["maximo"]
+        if not minimo < maximo:
+            raise ValueError(f"Triangular: o mínimo ({minimo}) deve ser menor que o máximo ({maximo})")
+        if not minimo <= moda <= maximo:
+            raise ValueError(f"Triangular: a moda ({moda}) deve estar entre o mínimo ({minimo}) e o máximo ({maximo})")
+    elif tipo == "empirica":
+        if not len(distribuicao["amostras"]):
+            raise ValueError("A distribuição empírica requer ao menos uma observação")
+    else:
+        raise ValueError(f"Distribuição desconhecida: {tipo}")
+
+
+def amostrar(distribuicao, rng, n):
+    """Sorteia ``n`` valores da distribuição descrita em ``distribuicao``."""
+    validar_distribuicao(distribuicao)
+    tipo = distribuicao["tipo"]
+    if tipo == "normal":
+        valores = rng.normal(distribuicao["media"], distribuicao["desvio"], n)
+    elif tipo == "triangular":
+        valores = rng.triangular(distribuicao["minimo"], distribuicao["moda"], distribuicao["maximo"], n)
+    elif tipo == "empirica":
+        valores = rng.choice(np.asarray(distribuicao["amostras"], dtype=float), n)
+    else:
+        raise ValueError(f"Distribuição desconhecida: {tipo}")
+    # As entradas do modelo não admitem valores negativos
+    return np.maximum(valores, 0.0)
+
+
+class HistogramaAcumulado:
+    """Histograma de largura fixa por molécula, acumulado bloco a bloco.
+
+    A faixa é definida pelo primeiro bloco, com folga de metade da amplitude
+    para cada lado; valores fora dela entram nas contagens de transbordo.
+    """
+
+    def __init__(self, n_moleculas, bins=4096, bordas=None):
+        self.n_moleculas = n_moleculas
+        self.bins = bins
+        self.bordas = bordas
+        self.contagens = np.zeros((n_moleculas, bins), dtype=np.int64)
+        self.abaixo = np.zeros(n_moleculas, dtype=np.int64)
+        self.acima = np.zeros(n_moleculas, dtype=np.int64)
+        self.minimo = np.full(n_moleculas, np.inf)
+        self.maximo = np.full(n_moleculas, -np.inf)
+        self.soma = np.zeros(n_moleculas)
+        self.n = np.zeros(n_moleculas, dtype=np.int64)
+
+    def adicionar(self, valores):
+        # valores: (n, n_moleculas)
+        if self.bordas is None:
+            finitos = valores[np.isfinite(valores)]
+            inferior, superior = (finitos.min(), finitos.max()) if finitos.size else (0.0, 1.0)
+            folga = max(superior - inferior, abs(superior), 1.0) * 0.5
+            self.bordas = np.linspace(inferior - folga, superior + folga, self.bins + 1)
+
+        for i in range(self.n_moleculas):
+            coluna = valores[:, i]
+            coluna = coluna[np.isfinite(coluna)]
+            if not coluna.size:
+                continue
+            self.n[i] += coluna.size
+            self.soma[i] += coluna.sum()
+            self.minimo[i] = min(self.minimo[i], coluna.min())
+            self.maximo[i] = max(self.maximo[i], coluna.max())
+            self.abaixo[i] += np.count_nonzero(coluna < self.bordas[0])
+            self.acima[i] += np.count_nonzero(coluna > self.bordas[-1])
+            self.contagens[i] += np.histogram(coluna, bins=self.bordas)[0]
+
+    def combinar(self, outro):
+        """Soma as contagens de outro histograma com as mesmas bordas."""
+        self.contagens += outro.contagens
+        self.abaixo += outro.abaixo
+        self.acima += outro.acima
+        self.minimo = np.minimum(self.minimo, outro.minimo)
+        self.maximo = np.maximum(self.maximo, outro.maximo)
+        self.soma += outro.soma
+        self.n += outro.n
+
+    def media(self):
+        with np.errstate(invalid="ignore"):
+            return self.soma / self.n
+
+    def percentil(self, q):
+        """Percentil ``q`` (0-100) por molécula, interpolado dentro do bin."""
+        resultado = np.full(self.n_moleculas, np.nan)
+        for i in range(self.n_moleculas):
+            if not self.n[i]:
+                continue
+            alvo = q / 100 * self.n[i]
+            if alvo <= self.abaixo[i]:
+                resultado[i] = self.minimo[i]
+                continue
+            acumulado = self.abaixo[i] + np.cumsum(self.contagens[i])
+            indice = int(np.searchsorted(acumulado, alvo))
+            if indice >= self.bins:
+                resultado[i] = self.maximo[i]
+                continue
+            anterior = acumulado[indice - 1] if indice else self.abaixo[i]
+            fracao = (alvo - anterior) / max(self.contagens[i, indice], 1)
+            valor = self.bordas[indice] + fracao * (self.bordas[indice + 1] - self.bordas[indice])
+            resultado[i] = min(max(valor, self.minimo[i]), self.maximo[i])
+        return resultado
+
+
+def _semente_bloco(raiz, indice):
+    # O mesmo que raiz.spawn(n)[indice], sem depender de quantos filhos já foram gerados
+    return np.random.SeedSequence(raiz.entropy, spawn_key=raiz.spawn_key + (int(indice),), pool_size=raiz.pool_size)
+
+
+def _blocos(n_sorteios, tamanho_bloco):
+    return [min(tamanho_bloco, n_sorteios - inicio) for inicio in range(0, n_sorteios, tamanho_bloco)]
+
+
+def avaliar_bloco(entradas, distribuicoes, n, semente, custos=calculos.CUSTOS_PADRAO, campo="resultado_agio", fatores=None):
+    """Sorteia e avalia um bloco; retorna ``(valores, n_prejuizo, n_supera_referencia)``."""
+    rng = np.random.default_rng(semente)
+    argumentos = dict(entradas)
+    # Ordem fixa para que a sequência de sorteios não dependa do dicionário
+    for nome in calculos.ENTRADAS:
+        if nome in distribuicoes:
+            argumentos[nome] = amostrar(distribuicoes[nome], rng, n)
+    valores = calculos.calcular(**argumentos, custos=custos, fatores=fatores)[campo]
+    valores = np.broadcast_to(valores, (n, valores.shape[-1]))
+    prejuizo = np.count_nonzero(valores < 0, axis=0)
+    supera = np.count_nonzero(valores > valores[:, :1], axis=0)
+    return valores, prejuizo, supera
+
+
+# Blocos enviados ao pool de uma vez (as estatísticas de cada um ocupam ~100 kB)
+BLOCOS_POR_RODADA = 64
+
+# Estado do histograma que cada bloco resume e que é somado entre os blocos
+ESTATISTICAS_HISTOGRAMA = ("contagens", "abaixo", "acima", "n", "minimo", "maximo", "soma")
+
+
+def _saidas_bloco(n_moleculas, bins):
+    # Estatísticas de um bloco: forma (sem o eixo dos blocos) e dtype
+    inteiro = ((n_moleculas,), np.int64)
+    real = ((n_moleculas,), float)
+    return {"contagens": ((n_moleculas, bins), np.int64), "abaixo": inteiro, "acima": inteiro, "n": inteiro,
+            "minimo": real, "maximo": real, "soma": real, "prejuizo": inteiro, "supera": inteiro}
+
+
+def estatisticas_blocos(tamanho, indice, raiz, entradas, distribuicoes, custos, campo, fatores, bins, bordas):
+    """Sorteia e resume os blocos ``indice`` (com ``tamanho`` sorteios cada).
+
+    Retorna as estatísticas de ``HistogramaAcumulado`` e as contagens de
+    prejuízo e de superação da referência, empilhadas por bloco, além das
+    ``bordas`` usadas (as do primeiro bloco, se não forem dadas).
+    """
+    n_moleculas = np.shape(custos)[-1]
+    blocos = {nome: [] for nome in _saidas_bloco(n_moleculas, bins)}
+    for n, k in zip(tamanho, indice):
+        valores, prejuizo, supera = avaliar_bloco(entradas, distribuicoes, int(n), _semente_bloco(raiz, k),
+                                                  custos, campo, fatores)
+        histograma = HistogramaAcumulado(n_moleculas, bins, bordas)
+        histograma.adicionar(valores)
+        bordas = histograma.bordas
+        for nome in ESTATISTICAS_HISTOGRAMA:
+            blocos[nome].append(getattr(histograma, nome))
+        blocos["prejuizo"].append(prejuizo)
+        blocos["supera"].append(supera)
+    return dict({nome: np.stack(valores) for nome, valores in blocos.items()}, bordas=bordas)
+
+
+def _histograma_do_bloco(blocos, k, bins, bordas):
+    histograma = HistogramaAcumulado(blocos["n"].shape[-1], bins, bordas)
+    for nome in ESTATISTICAS_HISTOGRAMA:
+        setattr(histograma, nome, blocos[nome][k])
+    return histograma
+
+
+def simular(entradas, distribuicoes, n_sorteios=100_000, semente=None, tamanho_bloco=100_000,
+            custos=calculos.CUSTOS_PADRAO, campo="resultado_agio", bins=4096, fatores=None,
+            processos=1, progresso=None, cancelar=None):
+    """Executa a simulação de Monte Carlo em blocos.
+
+    ``entradas`` é o cenário base e ``distribuicoes`` mapeia nomes de
+    ``calculos.ENTRADAS`` para a distribuição sorteada em seu lugar. Com
+    ``processos > 1`` os blocos são divididos entre processos;
+    ``progresso(blocos_feitos, total)`` e ``cancelar`` seguem
+    ``paralelo.em_partes``.
+    """
+    for nome in distribuicoes:
+        if nome not in calculos.ENTRADAS:
+            raise ValueError(f"Entrada desconhecida: {nome}")
+        validar_distribuicao(distribuicoes[nome])
+    if n_sorteios <= 0:
+        raise ValueError("O número de sorteios deve ser positivo")
+
+    n_moleculas = np.shape(custos)[-1]
+    tamanhos = np.array(_blocos(n_sorteios, tamanho_bloco))
+    fixos = {"raiz": np.random.SeedSequence(semente), "entradas": entradas, "distribuicoes": distribuicoes,
+             "custos": custos, "campo": campo, "fatores": fatores, "bins": bins}
+
+    # O primeiro bloco define a faixa do histograma; os demais são independentes entre si
+    primeiro = estatisticas_blocos(tamanhos[:1], [0], bordas=None, **fixos)
+    histograma = HistogramaAcumulado(n_moleculas, bins, primeiro["bordas"])
+    histograma.combinar(_histograma_do_bloco(primeiro, 0, bins, histograma.bordas))
+    prejuizo, supera = primeiro["prejuizo"][0].copy(), primeiro["supera"][0].copy()
+    if progresso is not None:
+        progresso(1, len(tamanhos))
+
+    # Os demais vão ao pool em rodadas; cada rodada é somada ao histograma (na ordem
+    # dos blocos) antes da seguinte, então a memória não cresce com os sorteios
+    for inicio in range(1, len(tamanhos), BLOCOS_POR_RODADA):
+        indices = np.arange(inicio, min(inicio + BLOCOS_POR_RODADA, len(tamanhos)))
+        rodada = paralelo.em_partes(
+            estatisticas_blocos, len(indices), {"tamanho": tamanhos[indices], "indice": indices},
+            _saidas_bloco(n_moleculas, bins), fixos=dict(fixos, bordas=histograma.bordas),
+            processos=processos, tamanho_parte=1,
+            progresso=None if progresso is None else (
+                lambda feitas, total, antes=inicio: progresso(antes + feitas, len(tamanhos))),
+            cancelar=cancelar,
+        )
+        for k in range(len(indices)):
+            histograma.combinar(_histograma_do_bloco(rodada, k, bins, histograma.bordas))
+            prejuizo += rodada["prejuizo"][k]
+            supera += rodada["supera"][k]
+
+    return resumir(histograma, prejuizo, supera, n_sorteios)
+
+
+def resumir(histograma, prejuizo, supera, n_sorteios):
+    """Monta o dicionário de saída da simulação."""
+    return {
+        "n_sorteios": n_sorteios,
+        "percentis": {q: histograma.percentil(q) for q in PERCENTIS},
+        "media": histograma.media(),
+        "prob_prejuizo": prejuizo / n_sorteios,
+        "prob_supera_referencia": supera / n_sorteios,
+        "histograma": histograma,
+    }
@@ -0,0 +1,210 @@
+"""Execução de trabalhos pesados em vários processos.
+
+Varreduras de sensibilidade, simulações de Monte Carlo e otimizações por lote
+são divididas em partes ao longo do primeiro eixo (linhas da grade, blocos de
+sorteios, lotes) e distribuídas num pool de processos persistente. Entradas e
+saídas ficam em memória compartilhada: cada processo recebe só o nome do
+segmento, a forma e o dtype, lê a sua fatia das entradas e grava a sua fatia
+das saídas. As partes fazem as mesmas contas do caminho em um processo, então
+o resultado é idêntico bit a bit.
+
+O número de processos padrão vem de ``ALAVANCAGEM_PROCESSOS`` (ou do número de
+CPUs); com um processo as partes rodam no próprio processo, sem pool.
+"""
+
+import atexit
+import concurrent.futures
+import contextlib
+import math
+import multiprocessing
+import os
+import sys
+import threading
+import types
+from multiprocessing import shared_memory
+
+import numpy as np
+
+PROCESSOS_PADRAO = int(os.environ.get("ALAVANCAGEM_PROCESSOS", 0)) or os.cpu_count() or 1
+
+# Partes por processo: mais partes equilibram melhor a carga e dão progresso mais fino
+PARTES_POR_PROCESSO = 4
+
+
+class Cancelado(Exception):
+    """A execução foi interrompida por ``cancelar``."""
+
+
+class ArrayCompartilhado:
+    """Array NumPy num segmento de memória compartilhada (criado ou, com ``nome``, aberto)."""
+
+    def __init__(self, forma, dtype=float, nome=None):
+        self.forma = tuple(forma)
+        self.dtype = np.dtype(dtype)
+        if nome is None:
+            tamanho = max(math.prod(self.forma) * self.dtype.itemsize, 1)
+            self.memoria = shared_memory.SharedMemory(create=True, size=tamanho)
+        else:
+            self.memoria = shared_memory.SharedMemory(name=nome)
+        self.array = np.ndarray(self.forma, self.dtype, buffer=self.memoria.buf)
+
+    @classmethod
+    def copiar(cls, valores):
+        valores = np.asarray(valores)
+        compartilhado = cls(valores.shape, valores.dtype)
+        compartilhado.array[...] = valores
+        return compartilhado
+
+    @classmethod
+    def abrir(cls, descritor):
+        nome, forma, dtype = descritor
+        return cls(forma, dtype, nome)
+
+    def descritor(self):
+        """O que vai para o outro processo: nome do segmento, forma e dtype."""
+        return self.memoria.name, self.forma, self.dtype.str
+
+    def fechar(self):
+        self.array = None
+        self.memoria.close()
+
+    def liberar(self):
+        self.fechar()
+        self.memoria.unlink()
+
+
+_pool = None
+_processos_pool = 0
+_trava = threading.Lock()
+# Serializa a troca do __main__: duas threads trocando juntas deixariam o falso no lugar
+_trava_principal = threading.Lock()
+
+
+def obter_pool(processos):
+    """Pool de processos compartilhado, recriado se mudar o tamanho ou quebrar."""
+    global _pool, _processos_pool
+    with _trava:
+        if _pool is None or _processos_pool != processos or getattr(_pool, "_broken", False):
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # forkserver/spawn: nada de fork de um processo com threads (o Streamlit tem várias)
+            metodo = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = concurrent.futures.ProcessPoolExecutor(processos, mp_context=multiprocessing.get_context(metodo))
+            _processos_pool = processos
+        return _pool
+
+
+@atexit.register
+def fechar_pool():
+    """Encerra o pool compartilhado (também na saída do interpretador)."""
+    global _pool
+    with _trava:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+@contextlib.contextmanager
+def _sem_principal(funcao):
+    # Os processos do pool nascem no primeiro submit e reexecutam o __main__ do pai. No
+    # Streamlit ele é o script do app inteiro; se a função não mora lá, o __main__ é ocultado.
+    # A trava vale também sem troca: quem submete uma função do __main__ precisa do verdadeiro
+    with _trava_principal:
+        if getattr(funcao, "__module__", None) == "__main__":
+            yield
+            return
+        principal = sys.modules.get("__main__")
+        sys.modules["__main__"] = types.ModuleType("__main__")
+        try:
+            yield
+        finally:
+            sys.modules["__main__"] = principal
+
+
+def limites(n, processos, tamanho_parte=None):
+    """Intervalos ``(inicio, fim)`` das partes de ``range(n)``."""
+    if tamanho_parte is None:
+        tamanho_parte = max(1, math.ceil(n / (max(processos, 1) * PARTES_POR_PROCESSO)))
+    return [(inicio, min(inicio + tamanho_parte, n)) for inicio in range(0, n, tamanho_parte)]
+
+
+def _executar_parte(funcao, entradas, saidas, inicio, fim, fixos):
+    # Roda num processo do pool: lê a fatia das entradas e grava a das saídas
+    # (entradas e saídas podem ter nomes iguais, por isso ficam separadas)
+    lidas = {nome: ArrayCompartilhado.abrir(descritor) for nome, descritor in entradas.items()}
+    gravadas = {nome: ArrayCompartilhado.abrir(descritor) for nome, descritor in saidas.items()}
+    try:
+        resultado = funcao(**{nome: lida.array[inicio:fim] for nome, lida in lidas.items()}, **fixos)
+        for nome, gravada in gravadas.items():
+            gravada.array[inicio:fim] = resultado[nome]
+        del resultado
+    finally:
+        for aberto in [*lidas.values(), *gravadas.values()]:
+            aberto.fechar()
+
+
+def em_partes(funcao, n, entradas, saidas, fixos=None, processos=None, tamanho_parte=None,
+              progresso=None, cancelar=None):
+    """Avalia ``funcao`` em partes do primeiro eixo e junta as saídas.
+
+    ``entradas`` mapeia nomes para arrays com ``n`` linhas, fatiados entre as
+    partes; ``fixos`` são repassados inteiros. ``funcao(**fatias, **fixos)``
+    deve ser uma função de módulo (para chegar aos outros processos) e devolver
+    um dicionário com as ``saidas`` da parte, descritas por ``nome -> (forma
+    sem o primeiro eixo, dtype)``. ``progresso(feitas, total)`` é chamado a
+    cada parte concluída; se ``cancelar()`` ficar verdadeiro, as partes
+    pendentes são canceladas e ``Cancelado`` é levantado (o mesmo vale para
+    uma exceção levantada por ``progresso``).
+
+    Retorna ``nome -> array (n, *forma)``.
+    """
+    processos = PROCESSOS_PADRAO if processos is None else processos
+    fixos = fixos or {}
+    partes = limites(n, processos, tamanho_parte)
+
+    if processos <= 1 or len(partes) <= 1:
+        resultado = {nome: np.empty((n, *forma), dtype) for nome, (forma, dtype) in saidas.items()}
+        for feitas, (inicio, fim) in enumerate(partes, 1):
+            if cancelar is not None and cancelar():
+                raise Cancelado()
+            parte = funcao(**{nome: valores[inicio:fim] for nome, valores in entradas.items()}, **fixos)
+            for nome in saidas:
+                resultado[nome][inicio:fim] = parte[nome]
+            if progresso is not None:
+                progresso(feitas, len(partes))
+        return resultado
+
+    lidas, gravadas = {}, {}
+    futuros = []
+    try:
+        for nome, valores in entradas.items():
+            lidas[nome] = ArrayCompartilhado.copiar(valores)
+        for nome, (forma, dtype) in saidas.items():
+            gravadas[nome] = ArrayCompartilhado((n, *forma), dtype)
+        descritores_entradas = {nome: lida.descritor() for nome, lida in lidas.items()}
+        descritores_saidas = {nome: gravada.descritor() for nome, gravada in gravadas.items()}
+
+        pool = obter_pool(processos)
+        with _sem_principal(funcao):
+            futuros = [pool.submit(_executar_parte, funcao, descritores_entradas, descritores_saidas, inicio, fim, fixos)
+                       for inicio, fim in partes]
+        pendentes, feitas = set(futuros), 0
+        while pendentes:
+            # Espera com limite para conferir o cancelamento mesmo sem partes concluídas
+            concluidos, pendentes = concurrent.futures.wait(
+                pendentes, timeout=0.1, return_when=concurrent.futures.FIRST_COMPLETED)
+            for futuro in concluidos:
+                futuro.result()
+            feitas += len(concluidos)
+            if concluidos and progresso is not None:
+                progresso(feitas, len(partes))
+            if pendentes and cancelar is not None and cancelar():
+                raise Cancelado()
+        return {nome: gravada.array.copy() for nome, gravada in gravadas.items()}
+    finally:
+        # Pendentes são canceladas; as que já rodam terminam antes de liberar a memória
+        for futuro in futuros:
+            futuro.cancel()
+        concurrent.futures.wait(futuros)
+        for compartilhado in [*lidas.values(), *gravadas.values()]:
+            compartilhado.liberar()
@@ -0,0 +1,114 @@
+"""Perfil de execução por seção do ``alavancagem.py``.
+
+Ativado com ``?perfil=1`` na URL ou ``ALAVANCAGEM_PERFIL=1`` no ambiente.
+O script chama ``marco("Seção")`` no início de cada bloco lógico; cada marco
+fecha a seção anterior. Com o perfil desligado, ``marco`` retorna de imediato.
+
+Para contar elementos, widgets e bytes, as mensagens enviadas ao navegador
+são interceptadas no contexto da execução enquanto o perfil está ativo.
+"""
+
+import os
+import time
+from collections import deque
+
+import numpy as np
+
+# Tipos de elemento que são widgets de entrada
+TIPOS_WIDGET = {
+    "button", "checkbox", "color_picker", "date_input", "file_uploader", "multiselect",
+    "number_input", "radio", "selectbox", "slider", "text_area", "text_input",
+    "time_input", "toggle", "segmented_control", "button_group", "download_button",
+}
+
+TAMANHO_HISTORICO = 50
+
+
+def ativo(query_params):
+    return query_params.get("perfil") == "1" or os.environ.get("ALAVANCAGEM_PERFIL") == "1"
+
+
+class Perfilador:
+    def __init__(self, ativo=False):
+        self.ativo = ativo
+        self.secoes = []  # (nome, segundos, elementos, widgets, bytes)
+        self._atual = None
+        self._inicio = None
+        self._contagem = [0, 0, 0]  # elementos, widgets, bytes
+        self._marca = (0, 0, 0)
+        self._contexto = None
+        if ativo:
+            self._instalar()
+
+    def _instalar(self):
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        contexto = get_script_run_ctx()
+        if contexto is None:
+            return
+        # Se uma execução anterior foi interrompida, reaproveita o envio original
+        original = getattr(contexto._enqueue, "original", contexto._enqueue)
+
+        def enviar(mensagem):
+            self._contar(mensagem)
+            original(mensagem)
+
+        enviar.original = original
+        contexto._enqueue = enviar
+        self._contexto = contexto
+
+    def _contar(self, mensagem):
+        if mensagem.WhichOneof("type") != "delta":
+            return
+        self._contagem[2] += mensagem.ByteSize()
+        delta = mensagem.delta
+        if delta.WhichOneof("type") == "new_element":
+            self._contagem[0] += 1
+            if delta.new_element.WhichOneof("type") in TIPOS_WIDGET:
+                self._contagem[1] += 1
+
+    def marco(self, nome):
+        """Encerra a seção em andamento e inicia ``nome``."""
+        if not self.ativo:
+            return
+        agora = time.perf_counter()
+        self._fechar(agora)
+        self._atual = nome
+        self._inicio = agora
+        self._marca = tuple(self._contagem)
+
+    def _fechar(self, agora):
+        if self._atual is None:
+            return
+        elementos, widgets, bytes_ = (atual - marca for atual, marca in zip(self._contagem, self._marca))
+        self.secoes.append((self._atual, agora - self._inicio, elementos, widgets, bytes_))
+        self._atual = None
+
+    def finalizar(self):
+        """Encerra a última seção e desfaz a interceptação das mensagens."""
+        if not self.ativo:
+            return []
+        self._fechar(time.perf_counter())
+        if self._contexto is not None:
+            self._contexto._enqueue = self._contexto._enqueue.original
+            self._contexto = None
+        return self.secoes
+
+
+def registrar(historico, secoes):
+    """Acrescenta a execução ao histórico (deque com as últimas execuções)."""
+    if historico is None:
+        historico = deque(maxlen=TAMANHO_HISTORICO)
+    tempos = {nome: segundos for nome, segundos, *_ in secoes}
+    tempos["Total"] = sum(tempos.values())
+    historico.append(tempos)
+    return historico
+
+
+def percentis(historico, q=(50, 95)):
+    """Percentis do tempo (ms) de cada seção ao longo do histórico."""
+    nomes = list(dict.fromkeys(nome for execucao in historico for nome in execucao))
+    return {
+        nome: [float(np.percentile([e[nome] for e in historico if nome in e], p) * 1000) for p in q]
+        for nome in nomes
+    }
@@ -0,0 +1,182 @@
+"""Carteira de lotes: o impacto das moléculas no rebanho inteiro.
+
+Cada linha da tabela é um lote com o número de cabeças (coluna ``cabecas``),
+as entradas de ``calculos.ENTRADAS`` que diferem do cenário padrão e colunas
+livres de agrupamento (baia, fornecedor, raça...). Os lotes são avaliados de
+uma vez e os valores por cabeça viram totais do rebanho (``CAMPOS_TOTAIS``,
+em R$ e @) ou médias por cabeça (``CAMPOS_MEDIAS``). Os grupos recebem um
+código inteiro e as somas saem de ``np.bincount``, sem laço por grupo.
+
+As somas de blocos da mesma tabela se combinam com ``reagrupar``, então um
+arquivo grande é lido e somado bloco a bloco::
+
+    python rebanho.py lotes.csv --por baia fornecedor --de "FOSBOVI CONF. PLUS" --para "FOSBOVI CONF. PRIME"
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import calculos
+import catalogo
+import lotes
+
+COLUNA_CABECAS = "cabecas"
+
+# Valores por cabeça que somam no rebanho (R$/cab e @/cab)
+CAMPOS_TOTAIS = [
+    "arrobas", "arrobas_adicionais", "custo_animal_magro", "custeio_periodo", "custo_adicional",
+    "valor_arrobas", "receita_adicional", "resultado", "resultado_agio", "incremento_lucro_adicional",
+]
+
+# Indicadores que entram como média ponderada pelas cabeças
+CAMPOS_MEDIAS = [
+    "gmd", "peso_final", "dias", "rendimento", "rentabilidade_mensal", "rentabilidade_mensal_agio",
+    "margem_diaria_agio",
+]
+
+# Totais comparados entre duas moléculas (os incrementais já são diferenças para a referência)
+CAMPOS_IMPACTO = [campo for campo in CAMPOS_TOTAIS if campo not in calculos.CAMPOS_INCREMENTAIS]
+
+
+def _codigos(tabela, por):
+    # Código de grupo de cada lote (0..n_grupos-1, na ordem das chaves) e as chaves
+    if not por:
+        return np.zeros(len(tabela), dtype=np.intp), pd.DataFrame(index=range(1))
+    codigos, unicos = [], []
+    for coluna in por:
+        codigo, valores = pd.factorize(tabela[coluna], sort=True, use_na_sentinel=False)
+        codigos.append(codigo)
+        unicos.append(np.asarray(valores, dtype=object))
+    tamanhos = [len(valores) for valores in unicos]
+    if not len(tabela):
+        return np.zeros(0, dtype=np.intp), pd.DataFrame({coluna: [] for coluna in por})
+    # Combinações presentes, sem criar o produto cartesiano das colunas
+    presentes, codigo = np.unique(np.ravel_multi_index(codigos, tamanhos), return_inverse=True)
+    indices = np.unravel_index(presentes, tamanhos)
+    return codigo.ravel(), pd.DataFrame({coluna: valores[i] for coluna, valores, i in zip(por, unicos, indices)})
+
+
+def somar(tabela, por=(), padroes=None, custos=calculos.CUSTOS_PADRAO, moleculas=calculos.MOLECULAS, fatores=None):
+    """Somas ponderadas pelas cabeças; uma linha por grupo de ``por`` × molécula.
+
+    ``padroes`` completa as entradas sem coluna na tabela. O resultado guarda
+    somas (não médias) para poder ser combinado com ``reagrupar``; ``finalizar``
+    converte em totais e médias.
+    """
+    por = list(por)
+    if COLUNA_CABECAS not in tabela.columns:
+        raise ValueError(f"A tabela de lotes precisa da coluna '{COLUNA_CABECAS}'")
+    ausentes = [coluna for coluna in por if coluna not in tabela.columns]
+    if ausentes:
+        raise ValueError(f"Colunas de agrupamento ausentes: {', '.join(ausentes)}")
+    cabecas = tabela[COLUNA_CABECAS].to_numpy(dtype=float)
+    if not np.all(cabecas >= 0):
+        raise ValueError("O número de cabeças de cada lote deve ser maior ou igual a zero")
+
+    saida = calculos.avaliar({**lotes.entradas_da_tabela(tabela, padroes), "custos": custos, **(fatores or {})},
+                             CAMPOS_TOTAIS + CAMPOS_MEDIAS)
+    codigos, chaves = _codigos(tabela, por)
+    n, n_grupos, n_moleculas = len(tabela), len(chaves), len(moleculas)
+
+    colunas = {coluna: np.repeat(chaves[coluna].to_numpy(), n_moleculas) for coluna in por}
+    colunas["molecula"] = pd.Categorical.from_codes(np.tile(np.arange(n_moleculas), n_grupos), moleculas)
+    colunas["lotes"] = np.repeat(np.bincount(codigos, minlength=n_grupos), n_moleculas)
+    colunas[COLUNA_CABECAS] = np.repeat(np.bincount(codigos, cabecas, n_grupos), n_moleculas)
+    for campo in CAMPOS_TOTAIS + CAMPOS_MEDIAS:
+        ponderado = np.broadcast_to(saida[campo], (n, n_moleculas)) * cabecas[:, np.newaxis]
+        soma = np.empty((n_grupos, n_moleculas))
+        for i in range(n_moleculas):
+            soma[:, i] = np.bincount(codigos, ponderado[:, i], n_grupos)
+        colunas[campo] = soma.ravel()
+    return pd.DataFrame(colunas)
+
+
+def reagrupar(partes, por=()):
+    """Combina somas de blocos e/ou as reagrupa por menos colunas (``por=()``: rebanho todo)."""
+    partes = list(partes)
+    colunas = [*por, "molecula", "lotes", COLUNA_CABECAS, *CAMPOS_TOTAIS, *CAMPOS_MEDIAS]
+    somas = pd.concat([parte[colunas] for parte in partes], ignore_index=True)
+    return somas.groupby([*por, "molecula"], sort=True, observed=True, dropna=False).sum().reset_index()
+
+
+def finalizar(somas):
+    """Converte somas em totais e médias por cabeça; acrescenta o custo da arroba do grupo."""
+    tabela = somas.copy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cabecas = tabela[COLUNA_CABECAS].to_numpy()
+        for campo in CAMPOS_MEDIAS:
+            tabela[campo] = tabela[campo].to_numpy() / cabecas
+        tabela["custo_arroba"] = tabela["custeio_periodo"].to_numpy() / tabela["arrobas"].to_numpy()
+    return tabela
+
+
+def agregar(tabela, por=(), padroes=None, custos=calculos.CUSTOS_PADRAO, moleculas=calculos.MOLECULAS, fatores=None):
+    """Totais e médias do rebanho (ou de cada grupo de ``por``) por molécula."""
+    return finalizar(somar(tabela, por, padroes, custos, moleculas, fatores))
+
+
+def impacto(agregado, de, para, por=()):
+    """Diferença dos totais ao trocar a molécula ``de`` pela ``para``, por grupo."""
+    moleculas = list(agregado["molecula"].cat.categories)
+    for molecula in (de, para):
+        if molecula not in moleculas:
+            raise ValueError(f"Molécula fora da carteira: {molecula}")
+    # Cada grupo tem uma linha por molécula, na mesma ordem
+    origem = agregado[agregado["molecula"] == de]
+    destino = agregado[agregado["molecula"] == para]
+    tabela = destino[[*por, "lotes", COLUNA_CABECAS]].reset_index(drop=True)
+    for campo in CAMPOS_IMPACTO:
+        tabela[campo] = destino[campo].to_numpy() - origem[campo].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        tabela["resultado_por_cabeca"] = tabela["resultado"].to_numpy() / tabela[COLUNA_CABECAS].to_numpy()
+    return tabela
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Totais do rebanho por molécula a partir de uma tabela de lotes.")
+    parser.add_argument("entrada", help="arquivo de lotes (.csv ou .parquet) com a coluna 'cabecas'")
+    parser.add_argument("--saida", help="arquivo com os totais por grupo × molécula (.csv ou .parquet)")
+    parser.add_argument("--por", nargs="+", default=[], help="colunas de agrupamento (baia, fornecedor, raça...)")
+    parser.add_argument("--de", help="molécula atual, para o impacto da troca")
+    parser.add_argument("--para", help="molécula proposta, para o impacto da troca")
+    parser.add_argument("--tamanho-bloco", type=int, default=100_000, help="lotes lidos por bloco")
+    parser.add_argument("--catalogo", help="catálogo de moléculas (CSV) no lugar do padrão")
+    parser.add_argument("--custos", nargs="+", type=float,
+                        help="custo (R$/cab/dia) de cada molécula (padrão: os do catálogo)")
+    for nome, valor in calculos.ENTRADAS_PADRAO.items():
+        parser.add_argument(f"--{nome.replace('_', '-')}", type=float, default=valor,
+                            help=f"{calculos.ENTRADAS[nome]} quando a coluna não existir (padrão: {valor})")
+    args = parser.parse_args(argv)
+
+    produtos = catalogo.carregar(args.catalogo) if args.catalogo else calculos.CATALOGO
+    custos = produtos["custo"] if args.custos is None else args.custos
+    if len(custos) != len(produtos["nome"]):
+        parser.error(f"--custos requer {len(produtos['nome'])} valores")
+    if (args.de is None) != (args.para is None):
+        parser.error("--de e --para são usados juntos")
+
+    padroes = {nome: getattr(args, nome) for nome in calculos.ENTRADAS_PADRAO}
+    inicio = time.perf_counter()
+    partes = [somar(bloco, args.por, padroes, custos, produtos["nome"], catalogo.fatores(produtos))
+              for bloco in lotes.ler_blocos(args.entrada, args.tamanho_bloco)]
+    agregado = finalizar(reagrupar(partes, args.por))
+    segundos = time.perf_counter() - inicio
+
+    if args.saida:
+        escritor = lotes.EscritorBlocos(args.saida)
+        try:
+            escritor.gravar(agregado)
+        finally:
+            escritor.fechar()
+    tabela = impacto(agregado, args.de, args.para, args.por) if args.de else agregado
+    print(tabela.to_string(index=False))
+    n_lotes = int(agregado["lotes"].sum() // len(produtos["nome"]))
+    print(f"{n_lotes} lotes agregados em {segundos:.2f} s ({n_lotes / max(segundos, 1e-9):,.0f} lotes/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,549 @@
+"""Relatórios em Excel e PDF gerados em segundo plano.
+
+Um relatório traz, para cada cenário (o atual ou os salvos em ``armazem``),
+as entradas, os cartões de "Indicadores de Performance", os indicadores
+principais e os três gráficos da "Análise Comparativa". A ``Fila`` executa os
+relatórios num pool de threads: a execução do script só enfileira o trabalho
+e depois consulta o progresso, sem esperar a geração.
+
+Os gráficos são desenhados com o Pillow a partir das próprias figuras do
+Plotly (barras, anotações e linhas no eixo secundário), sem navegador para
+exportar imagens. As imagens de um cenário ficam no cache compartilhado e são
+reaproveitadas enquanto as entradas não mudam.
+"""
+
+import concurrent.futures
+import datetime
+import io
+import math
+import os
+import importlib.util
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+
+import cache
+import calculos
+
+# Formatos de saída: rótulo e tipo MIME
+FORMATOS = {
+    "xlsx": ("Excel", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "pdf": ("PDF", "application/pdf"),
+}
+
+# Cartões da seção "Indicadores de Performance": título, campo e sufixo
+CARTOES = [
+    ("GMD (Kg/dia)", "gmd", " kg/dia"),
+    ("Rendimento de Carcaça", "rendimento", " %"),
+    ("GDC (Kg/dia)", "gdc", " kg/dia"),
+    ("Eficiência Biológica", "eficiencia_biologica", " kgMS/@"),
+    ("Arrobas Adicionais", "arrobas_adicionais", " @/cab"),
+]
+
+# Gráficos da "Análise Comparativa", na ordem do relatório
+GRAFICOS = ["incremento_lucro", "custo_receita", "performance"]
+
+TRABALHADORES_PADRAO = 2
+MAX_TRABALHOS = 64
+
+# Tamanho dos gráficos (px) e da página A4 a 150 dpi
+LARGURA_GRAFICO, ALTURA_GRAFICO = 1100, 520
+LARGURA_PAGINA, ALTURA_PAGINA, MARGEM_PAGINA, DPI = 1240, 1754, 70, 150
+
+# Fonte TrueType dos relatórios (padrão: a Source Sans que acompanha o Streamlit)
+FONTE = os.environ.get("ALAVANCAGEM_FONTE")
+
+_PALETA = ["rgb(71, 135, 198)", "rgb(35, 67, 98)", "orange", "rgb(47, 133, 90)"]
+
+# Fontes por thread: o mesmo objeto do FreeType não é usado por dois trabalhadores
+_fontes = threading.local()
+
+
+def _arquivo_fonte():
+    if FONTE:
+        return FONTE
+    especificacao = importlib.util.find_spec("streamlit")
+    if especificacao is None:
+        return None
+    midia = os.path.join(especificacao.submodule_search_locations[0], "static", "static", "media")
+    arquivos = sorted(f for f in os.listdir(midia) if f.startswith("SourceSansVF-Upright")) if os.path.isdir(midia) else []
+    return os.path.join(midia, arquivos[0]) if arquivos else None
+
+
+def _fonte(tamanho, peso=400):
+    from PIL import ImageFont
+
+    fontes = _fontes.__dict__.setdefault("fontes", {})
+    if (tamanho, peso) not in fontes:
+        arquivo = _arquivo_fonte()
+        if arquivo is None:
+            # Sem TrueType, a fonte embutida do Pillow (sem acentos)
+            fontes[tamanho, peso] = ImageFont.load_default(tamanho)
+        else:
+            fonte = ImageFont.truetype(arquivo, tamanho)
+            try:
+                # Fonte variável: o peso padrão da Source Sans é mais fino que o regular
+                fonte.set_variation_by_axes([peso])
+            except OSError:
+                pass
+            fontes[tamanho, peso] = fonte
+    return fontes[tamanho, peso]
+
+
+def _texto(texto):
+    # Quebras de linha do Plotly
+    return str(texto).replace("<br>", "\n")
+
+
+def _escala(minimo, maximo, marcas=5):
+    # Limites e marcas "redondas" (passos de 1, 2 ou 5 × 10^k) que incluem o zero
+    minimo, maximo = min(float(minimo), 0.0), max(float(maximo), 0.0)
+    if maximo - minimo <= 0:
+        maximo = minimo + 1.0
+    bruto = (maximo - minimo) / marcas
+    potencia = 10 ** math.floor(math.log10(bruto))
+    passo = next(fator * potencia for fator in (1, 2, 5, 10) if fator * potencia >= bruto)
+    inicio, fim = math.floor(minimo / passo) * passo, math.ceil(maximo / passo) * passo
+    return inicio, fim, np.arange(inicio, fim + passo / 2, passo)
+
+
+def _faixa(tracos, empilhar=False):
+    if not tracos:
+        return 0.0, 0.0
+    valores = np.nan_to_num(np.array([np.asarray(traco.y, dtype=float) for traco in tracos]))
+    if empilhar:
+        return np.clip(valores, None, 0).sum(axis=0).min(), np.clip(valores, 0, None).sum(axis=0).max()
+    return valores.min(), valores.max()
+
+
+def _quebrar(desenho, texto, fonte, largura):
+    # Quebra o texto em palavras para caber na largura
+    linhas = [""]
+    for palavra in str(texto).split():
+        tentativa = f"{linhas[-1]} {palavra}".strip()
+        if linhas[-1] and desenho.textlength(tentativa, font=fonte) > largura:
+            linhas.append(palavra)
+        else:
+            linhas[-1] = tentativa
+    return "\n".join(linhas)
+
+
+def _texto_vertical(imagem, texto, centro, fonte):
+    from PIL import Image, ImageDraw
+
+    largura = int(ImageDraw.Draw(imagem).textlength(texto, font=fonte)) + 4
+    rotulo = Image.new("RGB", (largura, fonte.size + 6), "white")
+    ImageDraw.Draw(rotulo).text((2, 2), texto, fill="#444444", font=fonte)
+    rotulo = rotulo.rotate(90, expand=True)
+    imagem.paste(rotulo, (int(centro[0] - rotulo.width / 2), int(centro[1] - rotulo.height / 2)))
+
+
+def desenhar_figura(figura, largura=LARGURA_GRAFICO, altura=ALTURA_GRAFICO):
+    """Desenha uma figura de barras do Plotly (com linhas no eixo secundário) numa imagem do Pillow."""
+    from PIL import Image, ImageDraw
+
+    imagem = Image.new("RGB", (largura, altura), "white")
+    desenho = ImageDraw.Draw(imagem)
+    layout = figura.layout
+    fonte, fonte_titulo = _fonte(18), _fonte(24, 600)
+
+    barras = [traco for traco in figura.data if traco.type == "bar"]
+    linhas = [traco for traco in figura.data if traco.type == "scatter"]
+    secundarias = [traco for traco in linhas if traco.yaxis == "y2"]
+    categorias = [str(x) for x in (barras or linhas)[0].x]
+    empilhar = layout.barmode == "stack"
+
+    esquerda, direita = 100, largura - (100 if secundarias else 30)
+    topo, base = 70, altura - 120
+    baixo, alto = _faixa(barras, empilhar)
+    baixo_linhas, alto_linhas = _faixa([traco for traco in linhas if traco.yaxis != "y2"])
+    escalas = {"y": _escala(min(baixo, baixo_linhas), max(alto, alto_linhas) * 1.1)}
+    if secundarias:
+        baixo, alto = _faixa(secundarias)
+        escalas["y2"] = _escala(baixo, alto * 1.15)
+
+    def y_pixel(valor, eixo="y"):
+        inicio, fim, _ = escalas[eixo]
+        return base - (valor - inicio) / (fim - inicio) * (base - topo)
+
+    # Título, grade e marcas dos eixos
+    desenho.text((esquerda, 20), _texto(layout.title.text or ""), fill="#2a3f5f", font=fonte_titulo)
+    for marca in escalas["y"][2]:
+        y = y_pixel(marca)
+        desenho.line([(esquerda, y), (direita, y)], fill="#444444" if marca == 0 else "#dde3ea", width=1)
+        desenho.text((esquerda - 8, y), f"{marca:g}", fill="#444444", font=fonte, anchor="rm")
+    if secundarias:
+        for marca in escalas["y2"][2]:
+            desenho.text((direita + 8, y_pixel(marca, "y2")), f"{marca:g}", fill="#444444", font=fonte, anchor="lm")
+        _texto_vertical(imagem, _texto(layout.yaxis2.title.text or ""), (largura - 20, (topo + base) / 2), fonte)
+    _texto_vertical(imagem, _texto(layout.yaxis.title.text or ""), (22, (topo + base) / 2), fonte)
+
+    # Categorias (moléculas)
+    faixa = (direita - esquerda) / len(categorias)
+    centros = [esquerda + faixa * (i + 0.5) for i in range(len(categorias))]
+    for centro, categoria in zip(centros, categorias):
+        desenho.multiline_text((centro, base + 10), _quebrar(desenho, categoria, fonte, faixa - 10),
+                               fill="#444444", font=fonte, anchor="ma", align="center")
+
+    # Barras (agrupadas ou empilhadas) com os textos internos
+    legenda = []
+    acumulado = {sinal: np.zeros(len(categorias)) for sinal in (1, -1)}
+    largura_barra = faixa * 0.6 if empilhar else faixa * 0.8 / max(len(barras), 1)
+    for j, traco in enumerate(barras):
+        cor = traco.marker.color or _PALETA[j % len(_PALETA)]
+        textos = list(traco.text) if traco.text is not None and not isinstance(traco.text, str) else []
+        for i, valor in enumerate(np.nan_to_num(np.asarray(traco.y, dtype=float))):
+            x0 = centros[i] - largura_barra / 2 if empilhar else centros[i] - faixa * 0.4 + j * largura_barra
+            if empilhar:
+                sinal = 1 if valor >= 0 else -1
+                inicio = acumulado[sinal][i]
+                acumulado[sinal][i] += valor
+                y_inicio, y_fim = y_pixel(inicio), y_pixel(inicio + valor)
+            else:
+                y_inicio, y_fim = y_pixel(0), y_pixel(valor)
+            if valor != 0:
+                desenho.rectangle([x0, min(y_inicio, y_fim), x0 + largura_barra, max(y_inicio, y_fim)], fill=cor)
+            if i < len(textos) and textos[i] and abs(y_fim - y_inicio) > fonte.size * 1.5:
+                desenho.multiline_text((x0 + largura_barra / 2, (y_inicio + y_fim) / 2), _texto(textos[i]),
+                                       fill=traco.textfont.color or "white", font=fonte, anchor="mm", align="center")
+        if traco.showlegend is not False and traco.name:
+            legenda.append((traco.name, cor))
+
+    # Anotações no eixo primário
+    for anotacao in layout.annotations:
+        if str(anotacao.x) in categorias:
+            desenho.multiline_text((centros[categorias.index(str(anotacao.x))], y_pixel(anotacao.y)),
+                                   _texto(anotacao.text), fill=anotacao.font.color or "#444444", font=fonte,
+                                   anchor="mm", align="center")
+
+    # Linhas com marcadores e textos acima dos pontos
+    for j, traco in enumerate(linhas, len(barras)):
+        eixo = "y2" if traco.yaxis == "y2" else "y"
+        cor = traco.line.color or _PALETA[j % len(_PALETA)]
+        pontos = [(centros[i], y_pixel(valor, eixo)) for i, valor in enumerate(np.nan_to_num(np.asarray(traco.y, dtype=float)))]
+        desenho.line(pontos, fill=cor, width=int(traco.line.width or 2))
+        raio = (traco.marker.size or 8) / 2
+        textos = list(traco.text) if traco.text is not None and not isinstance(traco.text, str) else []
+        for i, (x, y) in enumerate(pontos):
+            desenho.ellipse([x - raio, y - raio, x + raio, y + raio], fill=traco.marker.color or cor)
+            if i < len(textos) and textos[i]:
+                desenho.text((x, y - raio - 4), _texto(textos[i]), fill=traco.textfont.color or "#444444",
+                             font=fonte, anchor="md")
+        if traco.showlegend is not False and traco.name:
+            legenda.append((traco.name, cor))
+
+    # Legenda abaixo do gráfico
+    if layout.showlegend is not False and len(legenda) > 1:
+        x = esquerda
+        for nome, cor in legenda:
+            desenho.rectangle([x, altura - 32, x + 16, altura - 16], fill=cor)
+            desenho.text((x + 24, altura - 24), nome, fill="#444444", font=fonte, anchor="lm")
+            x += 24 + desenho.textlength(nome, font=fonte) + 30
+    return imagem
+
+
+def chave(cenario):
+    """Chave de cache das imagens de um cenário: entradas, custos, moléculas e opções."""
+    return cache.chave_cenario(cenario["entradas"], cenario["custos"], cenario["moleculas"], cenario.get("opcoes") or {})
+
+
+def imagens(cenario, memoria=None):
+    """PNGs dos gráficos da Análise Comparativa (``nome -> bytes``), do cache quando possível."""
+    def desenhar():
+        import graficos
+
+        figuras = graficos.figuras_comparativas(cenario["resultados"], cenario["moleculas"])
+        pngs = {}
+        for nome in GRAFICOS:
+            arquivo = io.BytesIO()
+            desenhar_figura(figuras[nome]).save(arquivo, format="PNG", optimize=True)
+            pngs[nome] = arquivo.getvalue()
+        return pngs
+
+    if memoria is None:
+        return desenhar()
+    return memoria.obter(("imagens_relatorio", chave(cenario)), desenhar)
+
+
+def _formatar(campo, valor):
+    if valor is None or not np.isfinite(valor):
+        return "-"
+    if "rentabilidade" in campo:
+        return f"{valor * 100:.2f}%"
+    return f"{valor:,.2f}"
+
+
+def _titulo(cenario):
+    partes = [parte for parte in (cenario.get("cliente"), cenario.get("nome")) if parte]
+    titulo = " · ".join(partes) or "Cenário atual"
+    return f"#{cenario['id']} {titulo}" if cenario.get("id") is not None else titulo
+
+
+def _tabelas(cenario):
+    # Linhas das tabelas do relatório: (título, [(rótulo, valores por molécula)])
+    resultados, moleculas = cenario["resultados"], cenario["moleculas"]
+    return [
+        ("Indicadores de Performance", [
+            (titulo if "(" in titulo else f"{titulo} ({sufixo.strip()})",
+             [resultados[molecula][campo] for molecula in moleculas], campo)
+            for titulo, campo, sufixo in CARTOES
+        ]),
+        ("Resultados", [
+            (rotulo, [resultados[molecula][campo] for molecula in moleculas], campo)
+            for campo, rotulo in calculos.INDICADORES.items()
+        ]),
+        ("Custos", [("Custo (R$/Cab/dia)", list(cenario["custos"]), "custo")]),
+    ]
+
+
+class _Paginas:
+    # Páginas A4 preenchidas de cima para baixo; uma nova começa quando o bloco não cabe
+
+    def __init__(self):
+        self.paginas = []
+        self.nova()
+
+    def nova(self):
+        from PIL import Image, ImageDraw
+
+        self.pagina = Image.new("RGB", (LARGURA_PAGINA, ALTURA_PAGINA), "white")
+        self.desenho = ImageDraw.Draw(self.pagina)
+        self.paginas.append(self.pagina)
+        self.y = MARGEM_PAGINA
+
+    def reservar(self, altura):
+        if self.y + altura > ALTURA_PAGINA - MARGEM_PAGINA and self.y > MARGEM_PAGINA:
+            self.nova()
+        y, self.y = self.y, self.y + altura
+        return y
+
+
+def _pagina_cenario(paginas, cenario, pngs):
+    from PIL import Image
+
+    fonte, fonte_negrito, fonte_secao, fonte_titulo = _fonte(20), _fonte(20, 600), _fonte(26, 600), _fonte(34, 600)
+    largura_util = LARGURA_PAGINA - 2 * MARGEM_PAGINA
+    x = MARGEM_PAGINA
+
+    if paginas.y > MARGEM_PAGINA:
+        paginas.nova()
+    y = paginas.reservar(90)
+    paginas.desenho.text((x, y), _titulo(cenario), fill="#2c5282", font=fonte_titulo)
+    paginas.desenho.text((x, y + 48), f"Data: {str(cenario.get('data') or '')[:16].replace('T', ' ')}",
+                         fill="#666666", font=fonte)
+
+    # Entradas em duas colunas
+    y = paginas.reservar(40)
+    paginas.desenho.text((x, y), "Entradas", fill="#234e52", font=fonte_secao)
+    entradas = list(cenario["entradas"].items())
+    metade = math.ceil(len(entradas) / 2)
+    for i, (nome, valor) in enumerate(entradas):
+        coluna, linha = divmod(i, metade)
+        if linha == 0 and coluna == 0:
+            y = paginas.reservar(32 * metade + 20)
+        paginas.desenho.text((x + coluna * largura_util / 2, y + linha * 32),
+                             f"{calculos.ENTRADAS[nome]}: {valor:,.2f}", fill="#333333", font=fonte)
+
+    # Tabelas por molécula
+    moleculas = cenario["moleculas"]
+    largura_rotulo = largura_util * 0.4
+    largura_coluna = (largura_util - largura_rotulo) / len(moleculas)
+    for titulo, linhas in _tabelas(cenario):
+        y = paginas.reservar(50)
+        paginas.desenho.text((x, y + 10), titulo, fill="#234e52", font=fonte_secao)
+        y = paginas.reservar(56)
+        for j, molecula in enumerate(moleculas):
+            paginas.desenho.multiline_text((x + largura_rotulo + (j + 1) * largura_coluna - 8, y + 2),
+                                           _quebrar(paginas.desenho, molecula, fonte_negrito, largura_coluna - 16),
+                                           fill="#2c5282", font=fonte_negrito, anchor="ra", align="right")
+        for i, (rotulo, valores, campo) in enumerate(linhas):
+            y = paginas.reservar(32)
+            if i % 2 == 0:
+                paginas.desenho.rectangle([x, y, x + largura_util, y + 32], fill="#f0f9ff")
+            paginas.desenho.text((x + 8, y + 5), rotulo, fill="#333333", font=fonte)
+            for j, valor in enumerate(valores):
+                paginas.desenho.text((x + largura_rotulo + (j + 1) * largura_coluna - 8, y + 5), _formatar(campo, valor),
+                                     fill="#2f855a", font=fonte, anchor="ra")
+
+    # Gráficos em largura total
+    y = paginas.reservar(50)
+    paginas.desenho.text((x, y + 10), "Análise Comparativa", fill="#234e52", font=fonte_secao)
+    for nome in GRAFICOS:
+        grafico = Image.open(io.BytesIO(pngs[nome]))
+        altura = round(grafico.height * largura_util / grafico.width)
+        y = paginas.reservar(altura + 20)
+        paginas.pagina.paste(grafico.resize((largura_util, altura), Image.LANCZOS), (x, y + 10))
+
+
+def gerar_pdf(cenarios, progresso=None, memoria=None):
+    """PDF com uma seção (uma ou mais páginas) por cenário."""
+    paginas = _Paginas()
+    total = 2 * len(cenarios) + 1
+    for i, cenario in enumerate(cenarios):
+        pngs = imagens(cenario, memoria)
+        if progresso is not None:
+            progresso(2 * i + 1, total, f"Gráficos de {_titulo(cenario)}")
+        _pagina_cenario(paginas, cenario, pngs)
+        if progresso is not None:
+            progresso(2 * i + 2, total, f"Páginas de {_titulo(cenario)}")
+    arquivo = io.BytesIO()
+    primeira, *demais = paginas.paginas
+    primeira.save(arquivo, format="PDF", save_all=True, append_images=demais, resolution=DPI)
+    return arquivo.getvalue()
+
+
+def _nome_planilha(cenario, usados):
+    # Até 31 caracteres, sem os proibidos pelo Excel e sem repetir
+    base = "".join(c for c in _titulo(cenario) if c not in "[]:*?/\\")[:28] or "Cenário"
+    nome, n = base, 2
+    while nome in usados:
+        nome, n = f"{base[:26]} {n}", n + 1
+    usados.add(nome)
+    return nome
+
+
+def gerar_excel(cenarios, progresso=None, memoria=None):
+    """Planilha com um resumo dos cenários e uma aba por cenário (tabelas e gráficos)."""
+    from openpyxl import Workbook
+    from openpyxl.drawing.image import Image
+    from openpyxl.styles import Font
+
+    def cabecalho(planilha, valores):
+        planilha.append(valores)
+        for celula in planilha[planilha.max_row]:
+            celula.font = Font(bold=True)
+
+    livro = Workbook()
+    resumo = livro.active
+    resumo.title = "Resumo"
+    cabecalho(resumo, ["Cenário", "Cliente", "Nome", "Data", "Molécula", *calculos.INDICADORES.values()])
+    total = 2 * len(cenarios) + 1
+    usados = {"Resumo"}
+    for i, cenario in enumerate(cenarios):
+        for molecula in cenario["moleculas"]:
+            resumo.append([_titulo(cenario), cenario.get("cliente"), cenario.get("nome"), cenario.get("data"), molecula,
+                           *(cenario["resultados"][molecula][campo] for campo in calculos.INDICADORES)])
+
+        planilha = livro.create_sheet(_nome_planilha(cenario, usados))
+        planilha.append([_titulo(cenario)])
+        planilha["A1"].font = Font(bold=True, size=14)
+        planilha.append(["Data", cenario.get("data")])
+        planilha.append([])
+        cabecalho(planilha, ["Entradas"])
+        for nome, valor in cenario["entradas"].items():
+            planilha.append([calculos.ENTRADAS[nome], valor])
+        for titulo, linhas in _tabelas(cenario):
+            planilha.append([])
+            cabecalho(planilha, [titulo, *cenario["moleculas"]])
+            for rotulo, valores, _ in linhas:
+                planilha.append([rotulo, *valores])
+        planilha.append([])
+        cabecalho(planilha, ["Todos os campos", *cenario["moleculas"]])
+        for campo in calculos.CAMPOS:
+            planilha.append([campo, *(cenario["resultados"][molecula][campo] for molecula in cenario["moleculas"])])
+        planilha.column_dimensions["A"].width = 42
+        if progresso is not None:
+            progresso(2 * i + 1, total, f"Tabelas de {_titulo(cenario)}")
+
+        # Gráficos à direita das tabelas, um abaixo do outro
+        for j, (nome, png) in enumerate(imagens(cenario, memoria).items()):
+            grafico = Image(io.BytesIO(png))
+            grafico.width, grafico.height = grafico.width // 2, grafico.height // 2
+            planilha.add_image(grafico, f"G{2 + j * 14}")
+        if progresso is not None:
+            progresso(2 * i + 2, total, f"Gráficos de {_titulo(cenario)}")
+
+    arquivo = io.BytesIO()
+    livro.save(arquivo)
+    return arquivo.getvalue()
+
+
+def gerar(cenarios, formato, progresso=None, memoria=None):
+    """Bytes do relatório de ``cenarios`` (dicionários como os de ``Armazem.carregar``)."""
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de relatório desconhecido: {formato}")
+    if not cenarios:
+        raise ValueError("Nenhum cenário para o relatório")
+    gerador = gerar_pdf if formato == "pdf" else gerar_excel
+    dados = gerador(cenarios, progresso, memoria)
+    if progresso is not None:
+        progresso(1, 1, "Pronto")
+    return dados
+
+
+class Fila:
+    """Fila de relatórios executados por um pool de threads, fora da execução do script."""
+
+    def __init__(self, trabalhadores=TRABALHADORES_PADRAO, memoria=None, max_trabalhos=MAX_TRABALHOS):
+        self.memoria = memoria
+        self.max_trabalhos = max_trabalhos
+        self._pool = concurrent.futures.ThreadPoolExecutor(trabalhadores, thread_name_prefix="relatorio")
+        self._trabalhos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def enviar(self, cenarios, formato):
+        """Enfileira o relatório e retorna o identificador do trabalho."""
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de relatório desconhecido: {formato}")
+        if not cenarios:
+            raise ValueError("Nenhum cenário para o relatório")
+        # Importado na thread de quem enfileira, com o sys.path do app (o trabalhador pode não tê-lo)
+        import graficos
+
+        trabalho_id = uuid.uuid4().hex
+        momento = datetime.datetime.now()
+        with self._lock:
+            self._trabalhos[trabalho_id] = {
+                "id": trabalho_id,
+                "formato": formato,
+                "nome": f"relatorio_{momento:%Y%m%d_%H%M%S}.{formato}",
+                "cenarios": len(cenarios),
+                "estado": "na_fila",
+                "progresso": 0.0,
+                "mensagem": "Na fila",
+                "dados": None,
+                "erro": None,
+            }
+            self._descartar()
+        self._pool.submit(self._executar, trabalho_id, list(cenarios), formato)
+        return trabalho_id
+
+    def _descartar(self):
+        # Os trabalhos concluídos mais antigos saem primeiro (com a trava já tomada)
+        excesso = len(self._trabalhos) - self.max_trabalhos
+        for trabalho_id in [t for t, trabalho in self._trabalhos.items() if trabalho["estado"] in ("pronto", "erro")]:
+            if excesso <= 0:
+                break
+            del self._trabalhos[trabalho_id]
+            excesso -= 1
+
+    def _atualizar(self, trabalho_id, **campos):
+        with self._lock:
+            if trabalho_id in self._trabalhos:
+                self._trabalhos[trabalho_id].update(campos)
+
+    def _executar(self, trabalho_id, cenarios, formato):
+        self._atualizar(trabalho_id, estado="gerando", mensagem="Gerando")
+
+        def progresso(feitas, total, mensagem):
+            self._atualizar(trabalho_id, progresso=feitas / total, mensagem=mensagem)
+
+        try:
+            dados = gerar(cenarios, formato, progresso, self.memoria)
+        except Exception as erro:
+            # O erro fica no trabalho e é mostrado na interface
+            self._atualizar(trabalho_id, estado="erro", erro=str(erro), mensagem="Erro")
+        else:
+            self._atualizar(trabalho_id, estado="pronto", progresso=1.0, dados=dados)
+
+    def estado(self, trabalho_id):
+        """Cópia do estado do trabalho (``None`` se não existe ou já foi descartado)."""
+        with self._lock:
+            trabalho = self._trabalhos.get(trabalho_id)
+            return dict(trabalho) if trabalho is not None else None
+
+    def pendentes(self, ids):
+        """Se algum dos trabalhos ainda está na fila ou sendo gerado."""
+        return any((self.estado(trabalho_id) or {}).get("estado") in ("na_fila", "gerando") for trabalho_id in ids)
@@ -0,0 +1,100 @@
+"""Varreduras de sensibilidade sobre o motor de cálculo."""
+
+import numpy as np
+
+import calculos
+import paralelo
+
+
+def faixa(valor, variacao=0.2, pontos=200):
+    """Valores igualmente espaçados em ``valor ± variacao`` (fração do valor)."""
+    return np.linspace(valor * (1 - variacao), valor * (1 + variacao), int(pontos))
+
+
+def varredura(entradas, eixo_x, valores_x, eixo_y, valores_y, custos=calculos.CUSTOS_PADRAO, fatores=None,
+              processos=1, progresso=None, cancelar=None):
+    """Avalia a grade ``valores_y × valores_x`` numa única chamada ao motor.
+
+    ``entradas`` traz o cenário base (nome da entrada -> valor escalar). Os
+    arrays retornados têm forma ``(len(valores_y), len(valores_x), n_moleculas)``.
+    Com ``processos > 1`` as linhas da grade são divididas entre processos
+    (ver ``paralelo.em_partes``, que também descreve ``progresso`` e ``cancelar``).
+    """
+    if eixo_x == eixo_y:
+        raise ValueError("Os eixos da varredura devem ser entradas diferentes")
+    for eixo in (eixo_x, eixo_y):
+        if eixo not in calculos.ENTRADAS:
+            raise ValueError(f"Entrada desconhecida: {eixo}")
+
+    if processos > 1:
+        valores_x = np.asarray(valores_x, dtype=float)
+        n_moleculas = np.shape(custos)[-1]
+        return paralelo.em_partes(
+            _varredura_linhas, len(valores_y), {"valores_y": np.asarray(valores_y, dtype=float)},
+            {campo: ((len(valores_x), n_moleculas), float) for campo in calculos.CAMPOS},
+            fixos={"entradas": entradas, "eixo_x": eixo_x, "valores_x": valores_x, "eixo_y": eixo_y,
+                   "custos": custos, "fatores": fatores},
+            processos=processos, progresso=progresso, cancelar=cancelar,
+        )
+
+    argumentos = dict(entradas)
+    argumentos[eixo_x] = np.asarray(valores_x, dtype=float)[np.newaxis, :]
+    argumentos[eixo_y] = np.asarray(valores_y, dtype=float)[:, np.newaxis]
+    return calculos.calcular(**argumentos, custos=custos, fatores=fatores)
+
+
+def _varredura_linhas(valores_y, entradas, eixo_x, valores_x, eixo_y, custos, fatores):
+    # Parte da varredura em paralelo: algumas linhas da grade
+    return varredura(entradas, eixo_x, valores_x, eixo_y, valores_y, custos, fatores)
+
+
+# Saídas oferecidas na análise local (tornado)
+CAMPOS_TORNADO = ["incremento_lucro_adicional", "resultado", "rentabilidade_mensal"]
+
+
+def tornado(entradas, variacao=0.1, campos=CAMPOS_TORNADO, custos=calculos.CUSTOS_PADRAO, fatores=None):
+    """Variação de ``campos`` com cada variável a ``±variacao`` (fração) do cenário base.
+
+    As variáveis (``nomes``) são as entradas de ``calculos.ENTRADAS`` e, por
+    molécula, ``("custos", i)``, como em ``meta``; o preço da molécula entra no
+    custo diário por proporção, então a barra do preço é a mesma do custo.
+    Os ``2 × len(nomes)`` cenários (uma variável deslocada por vez) vão numa
+    única chamada ao motor. Para cada campo retorna ``base`` (n_moleculas),
+    ``baixo`` e ``alto`` (n_variaveis × n_moleculas, na ordem de ``nomes``) e,
+    por diferença central, a ``semielasticidade`` (variação do campo, nas
+    unidades dele, por unidade de variação relativa da variável; divida por 100
+    para "por 1%") e a ``elasticidade`` (variação relativa do campo por
+    variação relativa da variável). A elasticidade é NaN onde o campo base é
+    zero; ali vale a semielasticidade, que não depende do valor base. Sobre
+    um base negativo a elasticidade é relativa a ``|base|``.
+    """
+    if not 0 < variacao < 1:
+        raise ValueError("A variação deve estar entre 0 e 1 (fração do valor)")
+    custos = np.asarray(custos, dtype=float)
+    n_entradas, n_moleculas = len(calculos.ENTRADAS), custos.shape[-1]
+    nomes = list(calculos.ENTRADAS) + [("custos", i) for i in range(n_moleculas)]
+    n = len(nomes)
+
+    # Linha 0: cenário base; depois as variáveis para baixo e para cima
+    base = np.array([entradas[nome] for nome in calculos.ENTRADAS], dtype=float)
+    deslocados = np.tile(base, (2 * n + 1, 1))
+    custos_deslocados = np.tile(custos, (2 * n + 1, 1))
+    indices = np.arange(n_entradas)
+    deslocados[1 + indices, indices] *= 1 - variacao
+    deslocados[1 + n + indices, indices] *= 1 + variacao
+    moleculas = np.arange(n_moleculas)
+    custos_deslocados[1 + n_entradas + moleculas, moleculas] *= 1 - variacao
+    custos_deslocados[1 + n + n_entradas + moleculas, moleculas] *= 1 + variacao
+    saida = calculos.calcular(**{nome: deslocados[:, j] for j, nome in enumerate(calculos.ENTRADAS)},
+                              custos=custos_deslocados, fatores=fatores)
+
+    resultado = {"nomes": nomes, "variacao": variacao}
+    for campo in campos:
+        valores = saida[campo]
+        centro, baixo, alto = valores[0], valores[1:1 + n], valores[1 + n:]
+        semielasticidade = (alto - baixo) / (2 * variacao)
+        com_base = centro != 0
+        elasticidade = np.where(com_base, semielasticidade / np.where(com_base, np.abs(centro), 1.0), np.nan)
+        resultado[campo] = {"base": centro, "baixo": baixo, "alto": alto,
+                            "semielasticidade": semielasticidade, "elasticidade": elasticidade}
+    return resultado
@@ -0,0 +1,325 @@
+"""Superfícies de resposta pré-calculadas, gravadas como arrays ``.npy``.
+
+Nas faixas usuais (peso inicial, peso final, GMD e valor da arroba) os
+indicadores principais variam suavemente. O construtor tabula ``CAMPOS`` de
+todas as moléculas numa grade regular dessas quatro entradas, com as demais
+fixas, e grava um ``.npy`` por campo::
+
+    python superficies.py superficies/ --processos 4
+
+As consultas abrem os arrays com ``mmap_mode="r"`` (o sistema carrega só as
+páginas tocadas, compartilhadas entre processos) e interpolam linearmente em
+cada eixo. Cenários fora da grade, com outras entradas fixas, outros custos ou
+outros produtos são calculados pelo motor exato. Cada valor interpolado vem
+com uma estimativa do erro da sua célula da grade (ver ``_limite_erro``). É
+uma estimativa, não um limite garantido: as derivadas vêm da própria tabela,
+e a construção calibra a estimativa contra o motor exato, aplica a margem
+``MARGEM_ERRO`` e grava a cobertura medida em pontos novos.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import calculos
+import paralelo
+
+# Entradas tabuladas, na ordem dos eixos dos arrays
+EIXOS = ["pv_inicial", "pv_final", "gmd", "valor_venda_arroba"]
+
+# Faixas usuais e pontos de cada eixo
+FAIXAS_PADRAO = {
+    "pv_inicial": (300.0, 450.0),
+    "pv_final": (480.0, 620.0),
+    "gmd": (1.0, 2.0),
+    "valor_venda_arroba": (250.0, 400.0),
+}
+PONTOS_PADRAO = {"pv_inicial": 31, "pv_final": 29, "gmd": 41, "valor_venda_arroba": 31}
+
+CAMPOS = ["resultado", "rentabilidade_mensal", "incremento_lucro_adicional"]
+
+# Pontos sorteados na validação das estimativas de erro
+PONTOS_VALIDACAO = 20_000
+
+# Margem sobre o fator calibrado: sem ela alguns pontos novos em 100 mil passavam da estimativa
+MARGEM_ERRO = 1.5
+
+DESCRICAO = "superficie.json"
+
+
+def _tabular(pv_inicial, eixos, entradas, custos, fatores, campos):
+    # Parte da grade: alguns valores de pv_inicial contra os demais eixos inteiros
+    argumentos = dict(entradas)
+    for posicao, nome in enumerate(EIXOS):
+        forma = [1] * len(EIXOS)
+        forma[posicao] = -1
+        argumentos[nome] = (pv_inicial if posicao == 0 else np.asarray(eixos[nome])).reshape(forma)
+    return calculos.avaliar({**argumentos, "custos": custos, **(fatores or {})}, campos)
+
+
+def _maximo_celula(nos):
+    # Máximo entre os 2^4 vértices de cada célula (um eixo a menos de ponto por eixo)
+    for eixo in range(len(EIXOS)):
+        n = nos.shape[eixo]
+        nos = np.maximum(nos.take(range(n - 1), axis=eixo), nos.take(range(1, n), axis=eixo))
+    return nos
+
+
+def _limite_erro(valores):
+    """Estimativa do erro da interpolação em cada célula da grade.
+
+    Para a interpolação multilinear, o erro numa célula é no máximo
+    ``1/8 Σ h_k² max|∂²f/∂x_k²|``. As derivadas segundas são estimadas pelas
+    diferenças segundas da própria tabela (já em unidades da grade, ``h_k²``
+    incluído), tomando o maior valor entre os vértices da célula; entre os
+    nós a curvatura pode ser maior, então o resultado não é um limite rigoroso.
+    """
+    limite = 0.0
+    for eixo in range(len(EIXOS)):
+        segunda = np.abs(np.diff(valores, 2, axis=eixo))
+        # Nós das pontas repetem a diferença do vizinho interior
+        segunda = np.concatenate([segunda.take([0], axis=eixo), segunda, segunda.take([-1], axis=eixo)], axis=eixo)
+        limite = limite + _maximo_celula(segunda)
+    return (limite / 8).astype(np.float32)
+
+
+def _mesmos_valores(a, b):
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    return a.shape == b.shape and bool(np.allclose(a, b, rtol=1e-12, atol=0.0))
+
+
+class Superficie:
+    """Superfícies gravadas em ``diretorio`` por ``construir``, abertas sem carregar os arrays."""
+
+    def __init__(self, diretorio):
+        with open(os.path.join(diretorio, DESCRICAO), encoding="utf-8") as arquivo:
+            descricao = json.load(arquivo)
+        self.diretorio = diretorio
+        self.moleculas = descricao["moleculas"]
+        self.campos = descricao["campos"]
+        self.entradas = descricao["entradas"]
+        self.custos = np.array(descricao["custos"])
+        self.fatores = {nome: np.array(valores) for nome, valores in descricao["fatores"].items()}
+        self.eixos = {nome: np.linspace(*descricao["eixos"][nome]) for nome in EIXOS}
+        self.validacao = descricao["validacao"]
+        self.valores = {campo: np.load(os.path.join(diretorio, f"{campo}.npy"), mmap_mode="r") for campo in self.campos}
+        self.erros = {campo: np.load(os.path.join(diretorio, f"{campo}.erro.npy"), mmap_mode="r")
+                      for campo in self.campos}
+
+    def mesmo_produto(self, custos, fatores=None):
+        """Se custos e fatores são os usados na construção."""
+        fatores = calculos.FATORES_PADRAO if fatores is None else fatores
+        return _mesmos_valores(custos, self.custos) and all(
+            _mesmos_valores(fatores[nome], valores) for nome, valores in self.fatores.items())
+
+    def cobre(self, valores):
+        """Máscara dos cenários dentro da grade (``valores``: entrada -> array 1-D)."""
+        dentro = np.ones(len(valores[EIXOS[0]]), dtype=bool)
+        for nome, fixo in self.entradas.items():
+            dentro &= np.isclose(valores[nome], fixo, rtol=1e-12, atol=0.0)
+        for nome, eixo in self.eixos.items():
+            dentro &= (valores[nome] >= eixo[0]) & (valores[nome] <= eixo[-1])
+        return dentro
+
+    def interpolar(self, valores, campos=None):
+        """Valores e estimativas de erro de cenários dentro da grade: ``(campo -> array, campo -> array)``."""
+        campos = self.campos if campos is None else campos
+        pontos = [len(eixo) for eixo in self.eixos.values()]
+        # Passo de cada eixo no índice linear dos nós e das células
+        passos_nos = np.cumprod([1] + pontos[:0:-1])[::-1]
+        passos_celulas = np.cumprod([1] + [n - 1 for n in pontos[:0:-1]])[::-1]
+        no, celula_linear, pesos = 0, 0, []
+        for (nome, eixo), passo_no, passo_celula in zip(self.eixos.items(), passos_nos, passos_celulas):
+            posicao = (np.asarray(valores[nome], dtype=float) - eixo[0]) / (eixo[1] - eixo[0])
+            celula = np.clip(np.floor(posicao).astype(np.intp), 0, len(eixo) - 2)
+            no = no + celula * passo_no
+            celula_linear = celula_linear + celula * passo_celula
+            pesos.append(posicao - celula)
+
+        # Os 16 vértices da célula: deslocamento no índice linear e peso (produto dos pesos por eixo)
+        vertices = []
+        for vertice in range(2 ** len(EIXOS)):
+            deslocamento, peso = 0, 1.0
+            for eixo, (w, passo_no) in enumerate(zip(pesos, passos_nos)):
+                lado = (vertice >> eixo) & 1
+                deslocamento += lado * passo_no
+                peso = peso * (w if lado else 1 - w)
+            vertices.append((no + deslocamento, peso[:, np.newaxis]))
+
+        resultados, erros = {}, {}
+        for campo in campos:
+            # np.take no array base: bem mais rápido que indexar o np.memmap
+            tabela = np.asarray(self.valores[campo]).reshape(-1, self.valores[campo].shape[-1])
+            total = 0.0
+            for indice, peso in vertices:
+                total = total + peso * np.take(tabela, indice, axis=0)
+            resultados[campo] = total
+            limite = np.take(np.asarray(self.erros[campo]).reshape(-1, self.erros[campo].shape[-1]), celula_linear, axis=0)
+            erros[campo] = limite * self.validacao["fator"] + self.validacao["folga"][campo]
+        return resultados, erros
+
+    def consultar(self, entradas, custos=calculos.CUSTOS_PADRAO, fatores=None, campos=None):
+        """Avalia cenários pela superfície quando possível e pelo motor exato nos demais.
+
+        ``entradas`` mapeia nomes para escalares ou arrays (com broadcasting);
+        as ausentes assumem os valores fixos da construção. Retorna um
+        dicionário com ``resultados`` e ``erro`` (campo -> array com forma
+        ``(*cenarios, n_moleculas)``; erro zero nos cenários exatos) e
+        ``interpolado`` (máscara dos cenários respondidos pela superfície).
+        """
+        campos = self.campos if campos is None else list(campos)
+        fora = [campo for campo in campos if campo not in self.campos]
+        if fora:
+            raise ValueError(f"Campos sem superfície: {', '.join(fora)}")
+        desconhecidas = [nome for nome in entradas if nome not in calculos.ENTRADAS]
+        if desconhecidas:
+            raise ValueError(f"Entradas desconhecidas: {', '.join(desconhecidas)}")
+
+        valores = {nome: np.asarray(entradas.get(nome, padrao), dtype=float)
+                   for nome, padrao in {**calculos.ENTRADAS_PADRAO, **self.entradas}.items()}
+        forma = np.broadcast_shapes(*(valor.shape for valor in valores.values()))
+        valores = {nome: np.broadcast_to(valor, forma).ravel() for nome, valor in valores.items()}
+        n, n_moleculas = valores[EIXOS[0]].size, np.shape(custos)[-1]
+
+        resultados = {campo: np.empty((n, n_moleculas)) for campo in campos}
+        erros = {campo: np.zeros((n, n_moleculas)) for campo in campos}
+        interpolado = np.zeros(n, dtype=bool)
+        if self.mesmo_produto(custos, fatores):
+            interpolado = self.cobre(valores)
+            internos, limites = self.interpolar({nome: valor[interpolado] for nome, valor in valores.items()}, campos)
+            # NaN/inf na tabela (ou no limite) também vão para o motor exato
+            validos = np.ones(int(interpolado.sum()), dtype=bool)
+            for campo in campos:
+                validos &= np.isfinite(internos[campo]).all(axis=-1) & np.isfinite(limites[campo]).all(axis=-1)
+            for campo in campos:
+                resultados[campo][interpolado] = np.where(validos[:, np.newaxis], internos[campo], np.nan)
+                erros[campo][interpolado] = limites[campo]
+            interpolado[interpolado] = validos
+
+        exatos = ~interpolado
+        if exatos.any():
+            saida = calculos.avaliar({**{nome: valor[exatos] for nome, valor in valores.items()},
+                                      "custos": custos, **(fatores or {})}, campos)
+            for campo in campos:
+                resultados[campo][exatos] = saida[campo]
+                erros[campo][exatos] = 0.0
+
+        return {
+            "resultados": {campo: valor.reshape(*forma, n_moleculas) for campo, valor in resultados.items()},
+            "erro": {campo: valor.reshape(*forma, n_moleculas) for campo, valor in erros.items()},
+            "interpolado": interpolado.reshape(forma),
+        }
+
+
+def _validar(superficie, campos, entradas, custos, fatores, pontos, semente=0):
+    # Compara a interpolação com o motor exato em pontos sorteados dentro da grade
+    rng = np.random.default_rng(semente)
+    valores = {nome: rng.uniform(eixo[0], eixo[-1], pontos) for nome, eixo in superficie.eixos.items()}
+    interpolados, limites = superficie.interpolar(valores, campos)
+    exatos = calculos.avaliar({**entradas, **valores, "custos": custos, **(fatores or {})}, campos)
+    resumo = {}
+    for campo in campos:
+        erro = np.abs(interpolados[campo] - exatos[campo])
+        finitos = np.isfinite(erro) & np.isfinite(limites[campo])
+        resumo[campo] = {
+            "cobertura": float(np.mean(erro[finitos] <= limites[campo][finitos])) if finitos.any() else 1.0,
+            "erro_maximo": np.where(finitos, erro, 0.0).max(axis=0).tolist(),
+            "limite_maximo": np.where(finitos, limites[campo], 0.0).max(axis=0).tolist(),
+            "razao_maxima": float(np.where(finitos, erro / np.maximum(limites[campo], 1e-300), 0.0).max()),
+        }
+    return resumo
+
+
+def construir(diretorio, faixas=None, pontos=None, entradas=None, custos=calculos.CUSTOS_PADRAO, fatores=None,
+              campos=CAMPOS, processos=1, pontos_validacao=PONTOS_VALIDACAO):
+    """Tabula ``campos`` na grade e grava arrays e descrição em ``diretorio``.
+
+    ``entradas`` fixa as entradas fora dos eixos (padrão: ``calculos.ENTRADAS_PADRAO``).
+    As estimativas de erro são calibradas contra o motor exato em pontos
+    sorteados: todas são multiplicadas pela maior razão erro/estimativa
+    encontrada (ao menos 1) vezes ``MARGEM_ERRO``. Uma segunda amostra, com
+    outra semente, mede a ``cobertura`` (fração dos erros dentro da
+    estimativa) gravada em ``validacao``. Retorna a ``Superficie`` gravada.
+    """
+    faixas = {**FAIXAS_PADRAO, **(faixas or {})}
+    pontos = {**PONTOS_PADRAO, **(pontos or {})}
+    if any(pontos[nome] < 3 for nome in EIXOS):
+        raise ValueError("Cada eixo precisa de pelo menos 3 pontos")
+    entradas = {nome: float(valor) for nome, valor in {**calculos.ENTRADAS_PADRAO, **(entradas or {})}.items()
+                if nome not in EIXOS}
+    eixos = {nome: np.linspace(*faixas[nome], pontos[nome]) for nome in EIXOS}
+    fatores_grade = {**calculos.FATORES_PADRAO, **(fatores or {})}
+    n_moleculas = np.shape(custos)[-1]
+
+    tabelas = paralelo.em_partes(
+        _tabular, pontos["pv_inicial"], {"pv_inicial": eixos["pv_inicial"]},
+        {campo: (tuple(pontos[nome] for nome in EIXOS[1:]) + (n_moleculas,), float) for campo in campos},
+        fixos={"eixos": eixos, "entradas": entradas, "custos": custos, "fatores": fatores, "campos": campos},
+        processos=processos,
+    )
+
+    os.makedirs(diretorio, exist_ok=True)
+    for campo in campos:
+        np.save(os.path.join(diretorio, f"{campo}.npy"), tabelas[campo])
+        np.save(os.path.join(diretorio, f"{campo}.erro.npy"), _limite_erro(tabelas[campo]))
+
+    # Folga absoluta: arredondamento onde a superfície é plana (limite estimado ~0)
+    folga = {campo: float(np.nanmax(np.abs(tabelas[campo]), initial=0.0)) * 1e-12 for campo in campos}
+    descricao = {
+        "moleculas": list(calculos.MOLECULAS) if fatores is None else None,
+        "campos": list(campos),
+        "entradas": entradas,
+        "custos": np.asarray(custos, dtype=float).tolist(),
+        "fatores": {nome: np.asarray(valores, dtype=float).tolist() for nome, valores in fatores_grade.items()},
+        "eixos": {nome: [faixas[nome][0], faixas[nome][1], pontos[nome]] for nome in EIXOS},
+        "validacao": {"fator": 1.0, "folga": folga},
+    }
+    caminho = os.path.join(diretorio, DESCRICAO)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(descricao, arquivo, indent=2, ensure_ascii=False)
+
+    superficie = Superficie(diretorio)
+    resumo = _validar(superficie, campos, entradas, custos, fatores, pontos_validacao)
+    descricao["validacao"].update({
+        "pontos": pontos_validacao,
+        "fator": MARGEM_ERRO * max(1.0, max(item["razao_maxima"] for item in resumo.values())),
+    })
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(descricao, arquivo, indent=2, ensure_ascii=False)
+
+    # Cobertura com o fator final, em pontos que não entraram na calibração
+    superficie = Superficie(diretorio)
+    descricao["validacao"]["campos"] = _validar(superficie, campos, entradas, custos, fatores, pontos_validacao,
+                                                semente=1)
+    with open(caminho, "w", encoding="utf-8") as arquivo:
+        json.dump(descricao, arquivo, indent=2, ensure_ascii=False)
+    return Superficie(diretorio)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Constrói as superfícies de resposta pré-calculadas.")
+    parser.add_argument("diretorio", help="diretório de saída (um .npy por campo)")
+    parser.add_argument("--pontos", type=int, nargs=len(EIXOS), metavar="N",
+                        help=f"pontos por eixo ({', '.join(EIXOS)})")
+    parser.add_argument("--processos", type=int, default=paralelo.PROCESSOS_PADRAO,
+                        help="processos para tabular a grade (padrão: ALAVANCAGEM_PROCESSOS ou número de CPUs)")
+    args = parser.parse_args(argv)
+
+    pontos = dict(zip(EIXOS, args.pontos)) if args.pontos else None
+    inicio = time.perf_counter()
+    superficie = construir(args.diretorio, pontos=pontos, processos=args.processos)
+    segundos = time.perf_counter() - inicio
+    n = int(np.prod([len(eixo) for eixo in superficie.eixos.values()]))
+    print(f"{n:,} pontos × {len(superficie.campos)} campos em {segundos:.1f} s", file=sys.stderr)
+    for campo, item in superficie.validacao["campos"].items():
+        erro = ", ".join(f"{valor:.3g}" for valor in item["erro_maximo"])
+        print(f"{campo}: erro máximo observado {erro} (razão erro/estimativa {item['razao_maxima']:.2f}, "
+              f"cobertura {item['cobertura']:.4%})", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
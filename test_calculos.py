@@ -0,0 +1,89 @@
+"""Testes do motor no cenário padrão e da execução em paralelo.
+
+    python -m pytest -q
+"""
+
+import numpy as np
+import pytest
+
+import calculos
+import monte_carlo
+import sensibilidade
+
+# Cenário padrão da página
+ENTRADAS = {
+    "pv_inicial": 390.0, "pv_final": 560.0, "gmd": 1.551, "rendimento_carcaca": 54.89,
+    "consumo_pv_percentual": 2.31, "custeio": 15.0, "valor_venda_arroba": 340.0, "agio_percentual": 5.0,
+}
+
+# Resultado com ágio (R$/cab) do cenário padrão, por molécula, na planilha de referência
+RESULTADO_AGIO_PADRAO = [682.27, 779.75, 940.89]
+
+# Mais de um processo, com partes em ordem diferente da serial
+PROCESSOS = 3
+
+DISTRIBUICOES = {
+    "gmd": {"tipo": "normal", "media": 1.551, "desvio": 0.08},
+    "valor_venda_arroba": {"tipo": "triangular", "minimo": 300, "moda": 340, "maximo": 360},
+}
+
+
+def test_cenario_padrao():
+    saida = calculos.calcular(**ENTRADAS)
+    np.testing.assert_allclose(saida["resultado_agio"], RESULTADO_AGIO_PADRAO, atol=0.005)
+
+
+def test_cenarios_vetorizados():
+    # Uma chamada com arrays de cenários dá o mesmo que uma chamada por cenário (campos
+    # que não dependem de uma das entradas saem sem o eixo dela)
+    gmd = np.array([1.2, 1.551, 1.9])
+    arroba = np.array([[300.0], [340.0]])
+    vetorizado = calculos.calcular(**dict(ENTRADAS, gmd=gmd, valor_venda_arroba=arroba))
+    for i, valor_arroba in enumerate(arroba[:, 0]):
+        for j, valor_gmd in enumerate(gmd):
+            escalar = calculos.calcular(**dict(ENTRADAS, gmd=valor_gmd, valor_venda_arroba=valor_arroba))
+            for campo in calculos.CAMPOS:
+                valores = np.broadcast_to(vetorizado[campo], (len(arroba), len(gmd)) + escalar[campo].shape)
+                np.testing.assert_allclose(valores[i, j], escalar[campo], rtol=1e-12)
+
+
+def test_avaliacao_incremental():
+    # Depois de uma edição, só os nós afetados são recalculados; o resultado é o de um cálculo completo
+    avaliador = calculos.AvaliadorIncremental()
+    avaliador.calcular(**ENTRADAS)
+    for edicao in ({"valor_venda_arroba": 350.0}, {"gmd": 1.6}, {"custeio": 16.0, "pv_final": 580.0}):
+        entradas = dict(ENTRADAS, **edicao)
+        incremental = avaliador.calcular(**entradas)
+        completo = calculos.calcular(**entradas)
+        for campo in calculos.CAMPOS:
+            np.testing.assert_array_equal(incremental[campo], completo[campo])
+
+
+def test_varredura_paralela_identica():
+    argumentos = (ENTRADAS, "gmd", sensibilidade.faixa(1.551, pontos=40),
+                  "valor_venda_arroba", sensibilidade.faixa(340.0, pontos=30))
+    serial = sensibilidade.varredura(*argumentos, processos=1)
+    paralela = sensibilidade.varredura(*argumentos, processos=PROCESSOS)
+    assert serial.keys() == paralela.keys()
+    for campo in serial:
+        np.testing.assert_array_equal(paralela[campo], serial[campo])
+
+
+def test_monte_carlo_paralelo_identico():
+    argumentos = dict(n_sorteios=150_000, semente=3, tamanho_bloco=1000)
+    serial = monte_carlo.simular(ENTRADAS, DISTRIBUICOES, processos=1, **argumentos)
+    paralelo = monte_carlo.simular(ENTRADAS, DISTRIBUICOES, processos=PROCESSOS, **argumentos)
+    for estatistica in monte_carlo.ESTATISTICAS_HISTOGRAMA:
+        np.testing.assert_array_equal(getattr(paralelo["histograma"], estatistica),
+                                      getattr(serial["histograma"], estatistica))
+    for chave in ("media", "prob_prejuizo", "prob_supera_referencia"):
+        np.testing.assert_array_equal(paralelo[chave], serial[chave])
+    for q in monte_carlo.PERCENTIS:
+        np.testing.assert_array_equal(paralelo["percentis"][q], serial["percentis"][q])
+
+
+@pytest.mark.parametrize("minimo, moda, maximo", [(360, 340, 380), (300, 370, 360), (0, 0, 0)])
+def test_triangular_invalida(minimo, moda, maximo):
+    distribuicoes = {"valor_venda_arroba": {"tipo": "triangular", "minimo": minimo, "moda": moda, "maximo": maximo}}
+    with pytest.raises(ValueError, match="Triangular"):
+        monte_carlo.simular(ENTRADAS, distribuicoes, n_sorteios=1000, semente=3)
@@ -0,0 +1,32 @@
+"""Testes da meta (goal seek) com custo editado fora da tabela de preços.
+
+    python -m pytest -q
+"""
+
+import numpy as np
+
+import calculos
+import meta
+from test_calculos import ENTRADAS
+
+# Custo da molécula 1 editado à parte: diferente de preco * consumo / 1000 (6.48 * 290 / 1000)
+CUSTOS = [1.23, 2.10, 2.26]
+PRECOS = calculos.CATALOGO["preco"]
+
+
+def test_preco_atual_reproduz_custo_editado():
+    atual = meta.valor_atual(ENTRADAS, ("precos", 1), CUSTOS, calculos.CONSUMOS_PADRAO, PRECOS)
+    no_preco = meta.avaliar(ENTRADAS, ("precos", 1), atual, "resultado_agio", 1,
+                            CUSTOS, calculos.CONSUMOS_PADRAO, precos=PRECOS)
+    np.testing.assert_allclose(no_preco, calculos.calcular(**ENTRADAS, custos=CUSTOS)["resultado_agio"][1],
+                               rtol=1e-12)
+
+
+def test_preco_e_custo_na_mesma_base():
+    # A solução em preço corresponde à solução em custo na proporção do valor atual de cada um
+    argumentos = dict(campo="resultado_agio", alvo=700.0, molecula=1, custos=CUSTOS,
+                      consumos=calculos.CONSUMOS_PADRAO, precos=PRECOS)
+    por_preco = meta.resolver(ENTRADAS, ("precos", 1), **argumentos)
+    por_custo = meta.resolver(ENTRADAS, ("custos", 1), **argumentos)
+    assert por_preco["convergiu"] and por_custo["convergiu"]
+    np.testing.assert_allclose(por_preco["valor"] / PRECOS[1], por_custo["valor"] / CUSTOS[1], rtol=1e-6)